@@ -8,7 +8,7 @@ Setup Instructions:
 3. Open browser: http://localhost:5000
 
 Architecture:
-- Storage: models.py (data models only, no database)
+- Storage: models.py (data models), database.py (SQLite documents / chunks)
 - Services: document_service.py, chunking_service.py
 - Routes: routes.py
 - Templates: templates/index.html
@@ -16,9 +16,10 @@ Architecture:
 
 from flask import Flask
 from routes import register_routes
+from database import init_db
 import logging
 from pathlib import Path
-from config import DATA_DIR
+from config import DATA_DIR, MAX_CONTENT_LENGTH_MB
 
 # Setup logging - console only
 logging.basicConfig(
@@ -35,7 +36,7 @@ def create_app():
     """Factory function to create Flask app"""
     app = Flask(__name__)
     app.config['SECRET_KEY'] = 'dev-secret-key-change-in-production'
-    app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+    app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH_MB * 1024 * 1024  # Max request size (uploads, embedding payloads)
     
     # Register routes
     register_routes(app)
@@ -43,6 +44,9 @@ def create_app():
     # Ensure data directory exists
     DATA_DIR.mkdir(exist_ok=True)
     
+    # Documents / chunks tables for persisted chunking runs
+    init_db()
+    
     logger.info("RAG Tool application initialized")
     return app
 
@@ -27,6 +27,26 @@ if DATABASE_PATH_STR:
 else:
     DATABASE_PATH = BASE_DIR / "rag_tool.db"
 
+# SQLite connections (app database and vector store sidecars)
+# Idle connections kept open per database file
+SQLITE_POOL_SIZE = int(os.getenv('SQLITE_POOL_SIZE', '8'))
+# Memory-mapped I/O per connection (0 disables)
+SQLITE_MMAP_SIZE_MB = int(os.getenv('SQLITE_MMAP_SIZE_MB', '256'))
+# Prepared statements cached per connection
+SQLITE_CACHED_STATEMENTS = int(os.getenv('SQLITE_CACHED_STATEMENTS', '256'))
+# How long a writer waits for another writer's lock
+SQLITE_BUSY_TIMEOUT_SECONDS = float(os.getenv('SQLITE_BUSY_TIMEOUT_SECONDS', '30'))
+
+# Vector store directory - memory-mapped embedding stores (.f32 + SQLite sidecar)
+VECTOR_STORE_DIR_STR = os.getenv('VECTOR_STORE_DIR', '').strip()
+if VECTOR_STORE_DIR_STR:
+    VECTOR_STORE_DIR = Path(VECTOR_STORE_DIR_STR).resolve()
+else:
+    VECTOR_STORE_DIR = BASE_DIR / "vector_store"
+
+# Maximum request body size in MB (file uploads and embedding payloads)
+MAX_CONTENT_LENGTH_MB = int(os.getenv('MAX_CONTENT_LENGTH_MB', '16'))
+
 # Allowed file extensions
 ALLOWED_EXTENSIONS = {'.md', '.txt'}
 
@@ -36,9 +56,101 @@ DEFAULT_CHUNK_OVERLAP = int(os.getenv('DEFAULT_CHUNK_OVERLAP', '50'))
 
 # Ollama configuration
 # Read from .env or use default values
+# OLLAMA_BASE_URL may list several servers (comma or space separated); requests are load balanced
 OLLAMA_BASE_URL = os.getenv('OLLAMA_BASE_URL', 'http://localhost:11434')
 OLLAMA_EMBEDDING_MODEL = os.getenv('OLLAMA_EMBEDDING_MODEL', 'nomic-embed-text')
 OLLAMA_LLM_MODEL = os.getenv('OLLAMA_LLM_MODEL', 'llama3.2:3b')
 
+# Ollama load balancing (several servers in OLLAMA_BASE_URL)
+# Seconds between health probes (GET /api/tags) of every server
+OLLAMA_HEALTH_INTERVAL_SECONDS = float(os.getenv('OLLAMA_HEALTH_INTERVAL_SECONDS', '10'))
+OLLAMA_HEALTH_TIMEOUT_SECONDS = float(os.getenv('OLLAMA_HEALTH_TIMEOUT_SECONDS', '2'))
+# Consecutive failed requests before a server is ejected until a probe succeeds again
+OLLAMA_EJECT_AFTER_FAILURES = int(os.getenv('OLLAMA_EJECT_AFTER_FAILURES', '3'))
+# Embedding calls one request sends at once (0 = one per server)
+OLLAMA_REQUEST_PARALLELISM = int(os.getenv('OLLAMA_REQUEST_PARALLELISM', '0'))
+
 # Backward compatibility
 OLLAMA_MODEL = OLLAMA_EMBEDDING_MODEL
+
+# Visualization
+# Number of fitted UMAP projections kept in memory for reuse / transform()
+VISUALIZATION_CACHE_SIZE = int(os.getenv('VISUALIZATION_CACHE_SIZE', '8'))
+# Randomized-PCA pre-projection before UMAP/t-SNE (0 disables)
+VISUALIZATION_PCA_COMPONENTS = int(os.getenv('VISUALIZATION_PCA_COMPONENTS', '50'))
+# Worker threads for the reducers' neighbor search (-1 = all cores)
+VISUALIZATION_N_JOBS = int(os.getenv('VISUALIZATION_N_JOBS', '-1'))
+
+# Embedding storage
+# Storage dtype for in-memory embedding sets: float32, float16 or int8
+EMBEDDING_STORAGE_DTYPE = os.getenv('EMBEDDING_STORAGE_DTYPE', 'float32').strip().lower()
+# Number of embedding sets (per matrix + dtype) kept in memory
+EMBEDDING_SET_CACHE_SIZE = int(os.getenv('EMBEDDING_SET_CACHE_SIZE', '4'))
+
+# Approximate nearest-neighbor search (HNSW)
+# Backend: auto (hnswlib if installed, else in-repo numpy graph), numpy or hnswlib
+ANN_BACKEND = os.getenv('ANN_BACKEND', 'auto').strip().lower()
+HNSW_M = int(os.getenv('HNSW_M', '16'))
+HNSW_EF_CONSTRUCTION = int(os.getenv('HNSW_EF_CONSTRUCTION', '100'))
+HNSW_EF_SEARCH = int(os.getenv('HNSW_EF_SEARCH', '64'))
+
+# Compressed approximate search (IVF-PQ)
+# Inverted lists (0 = ~sqrt(n_vectors)), PQ code bytes per vector, lists scanned per query
+IVFPQ_N_LISTS = int(os.getenv('IVFPQ_N_LISTS', '0'))
+IVFPQ_M = int(os.getenv('IVFPQ_M', '16'))
+IVFPQ_NPROBE = int(os.getenv('IVFPQ_NPROBE', '8'))
+# Candidates re-scored exactly from the stored vectors (0 disables)
+IVFPQ_RERANK = int(os.getenv('IVFPQ_RERANK', '100'))
+
+# Lexical / hybrid retrieval
+BM25_K1 = float(os.getenv('BM25_K1', '1.5'))
+BM25_B = float(os.getenv('BM25_B', '0.75'))
+# Reciprocal rank fusion offset and candidates taken from each ranking before fusion
+HYBRID_RRF_K = int(os.getenv('HYBRID_RRF_K', '60'))
+HYBRID_CANDIDATES = int(os.getenv('HYBRID_CANDIDATES', '100'))
+
+# Query caches (0 disables)
+# Query text -> query vector, per embedding method / model
+QUERY_VECTOR_CACHE_SIZE = int(os.getenv('QUERY_VECTOR_CACHE_SIZE', '1024'))
+# Query vector + index version + k + filters -> ranked results
+QUERY_RESULT_CACHE_SIZE = int(os.getenv('QUERY_RESULT_CACHE_SIZE', '1024'))
+
+# MMR diversification
+# Candidates re-ranked by maximal marginal relevance when mmr_lambda is given
+MMR_CANDIDATES = int(os.getenv('MMR_CANDIDATES', '50'))
+# Cosine similarity above which two results count as near-duplicates in diversity metrics
+MMR_DUPLICATE_THRESHOLD = float(os.getenv('MMR_DUPLICATE_THRESHOLD', '0.95'))
+
+# Sharded exact search (search_method "sharded")
+# Worker processes / row shards (0 = CPU count)
+SHARDED_WORKERS = int(os.getenv('SHARDED_WORKERS', '0'))
+# multiprocessing start method for the workers (spawn is safe in threaded servers)
+SHARDED_START_METHOD = os.getenv('SHARDED_START_METHOD', 'spawn')
+
+# Deterministic hashing embeddings (method "hashing", offline)
+HASHING_EMBEDDING_DIM = int(os.getenv('HASHING_EMBEDDING_DIM', '384'))
+HASHING_NGRAM_MIN = int(os.getenv('HASHING_NGRAM_MIN', '3'))
+HASHING_NGRAM_MAX = int(os.getenv('HASHING_NGRAM_MAX', '5'))
+
+# Background jobs (heavy endpoints with ?async=1 or "Prefer: respond-async")
+# Worker threads running jobs
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+# Jobs allowed to wait for a worker before new ones are rejected (503)
+JOB_MAX_QUEUED = int(os.getenv('JOB_MAX_QUEUED', '32'))
+# Finished jobs and their results are kept this long, at most JOB_MAX_RETAINED of them
+JOB_RESULT_TTL_SECONDS = int(os.getenv('JOB_RESULT_TTL_SECONDS', '3600'))
+JOB_MAX_RETAINED = int(os.getenv('JOB_MAX_RETAINED', '100'))
+
+# Streamed responses (NDJSON / SSE) of /api/embeddings/generate: texts embedded per event
+EMBEDDING_STREAM_BATCH_SIZE = int(os.getenv('EMBEDDING_STREAM_BATCH_SIZE', '32'))
+
+# Embedding batches: texts are sorted by length and grouped while longest text x count <= MAX_CHARS
+EMBEDDING_BATCH_MAX_CHARS = int(os.getenv('EMBEDDING_BATCH_MAX_CHARS', '32000'))
+EMBEDDING_BATCH_MAX_ITEMS = int(os.getenv('EMBEDDING_BATCH_MAX_ITEMS', '64'))
+
+# Embedding admission control: concurrent calls per backend (Ollama server / sentence-transformers)
+EMBEDDING_MAX_IN_FLIGHT = int(os.getenv('EMBEDDING_MAX_IN_FLIGHT', '4'))
+# Slots only interactive (query) calls may use, so queries never queue behind bulk embedding
+EMBEDDING_INTERACTIVE_RESERVED = int(os.getenv('EMBEDDING_INTERACTIVE_RESERVED', '1'))
+# Interactive calls admitted in a row before a waiting bulk call gets a slot
+EMBEDDING_INTERACTIVE_BURST = int(os.getenv('EMBEDDING_INTERACTIVE_BURST', '8'))
@@ -1,81 +1,292 @@
 """
 Database layer - SQLite with SQLAlchemy-style queries
 Uses sqlite3 stdlib to avoid additional dependencies
+
+Connections come from a ConnectionManager per database file (the app database
+and each vector store sidecar): a pool of connections opened once with WAL
+journaling (readers never block the writer), synchronous=NORMAL, memory-mapped
+I/O and a prepared-statement cache. Nested use within one thread shares a
+connection, so helpers can be composed inside a single transaction.
 """
 import sqlite3
 import json
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
-from config import DATABASE_PATH
+from typing import List, Dict, Any, Optional, Iterator, Sequence
+from config import (
+    DATABASE_PATH, SQLITE_POOL_SIZE, SQLITE_MMAP_SIZE_MB, SQLITE_CACHED_STATEMENTS, SQLITE_BUSY_TIMEOUT_SECONDS
+)
 import logging
 
 logger = logging.getLogger(__name__)
 
+class ConnectionManager:
+    """Pooled, tuned connections to one SQLite file, shared by all threads"""
+    
+    # Values per statement in fetch_in (SQLite's default variable limit is 32766, older builds 999)
+    MAX_VARIABLES = 900
+    
+    # resolved path -> manager
+    _managers: Dict[str, 'ConnectionManager'] = {}
+    _registry_lock = threading.Lock()
+    
+    def __init__(self, path, pool_size: int = 8, mmap_size_mb: int = 256, cached_statements: int = 256,
+                 busy_timeout: float = 30.0):
+        """
+        Args:
+            path: Database file
+            pool_size: Idle connections kept open
+            mmap_size_mb: Memory-mapped I/O per connection (0 disables)
+            cached_statements: Prepared statements cached per connection
+            busy_timeout: Seconds to wait for another writer's lock
+        """
+        self.path = str(path)
+        self.pool_size = max(0, int(pool_size))
+        self.mmap_size_mb = max(0, int(mmap_size_mb))
+        self.cached_statements = max(0, int(cached_statements))
+        self.busy_timeout = busy_timeout
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # (connection, generation); close() bumps the generation so checked-out connections are not pooled again
+        self._idle: List[tuple] = []
+        self._generation = 0
+        self._in_use = 0
+        self._stats = {'opened': 0, 'reused': 0, 'closed': 0, 'peak_in_use': 0}
+    
+    @staticmethod
+    def for_path(path) -> 'ConnectionManager':
+        """Shared manager of a database file, created with the configured settings"""
+        key = str(Path(path).resolve())
+        with ConnectionManager._registry_lock:
+            manager = ConnectionManager._managers.get(key)
+            if manager is None:
+                manager = ConnectionManager(
+                    key, SQLITE_POOL_SIZE, SQLITE_MMAP_SIZE_MB, SQLITE_CACHED_STATEMENTS, SQLITE_BUSY_TIMEOUT_SECONDS
+                )
+                ConnectionManager._managers[key] = manager
+            return manager
+    
+    def open_connection(self) -> sqlite3.Connection:
+        """
+        New tuned connection (not pooled; the caller closes it)
+        
+        Connections run in autocommit mode: reads hold no transaction, and
+        writes go through transaction() (or explicit BEGIN / commit()).
+        """
+        conn = sqlite3.connect(
+            self.path, timeout=self.busy_timeout, isolation_level=None,
+            check_same_thread=False, cached_statements=self.cached_statements
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA mmap_size={self.mmap_size_mb * 1024 * 1024}')
+        return conn
+    
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Hold a pooled connection for the block; nested blocks in the same thread get the same one"""
+        held = getattr(self._local, 'conn', None)
+        if held is not None:
+            yield held
+            return
+        
+        with self._lock:
+            conn, generation = self._idle.pop() if self._idle else (None, self._generation)
+            if conn is not None:
+                self._stats['reused'] += 1
+            self._in_use += 1
+            self._stats['peak_in_use'] = max(self._stats['peak_in_use'], self._in_use)
+        if conn is None:
+            try:
+                conn = self.open_connection()
+            except Exception:
+                with self._lock:
+                    self._in_use -= 1
+                raise
+            with self._lock:
+                self._stats['opened'] += 1
+        
+        self._local.conn = conn
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            if conn.in_transaction:
+                # The block ended mid-transaction (e.g. an abandoned explicit BEGIN)
+                conn.rollback()
+            with self._lock:
+                self._in_use -= 1
+                pooled = generation == self._generation and len(self._idle) < self.pool_size
+                if pooled:
+                    self._idle.append((conn, generation))
+                else:
+                    self._stats['closed'] += 1
+            if not pooled:
+                conn.close()
+    
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        Run the block in one write transaction, committed at the end and rolled
+        back on error. BEGIN IMMEDIATE takes the write lock up front, so reads
+        inside the block see no concurrent writes. Nested blocks join the
+        outer transaction.
+        """
+        with self.connection() as conn:
+            if conn.in_transaction:
+                yield conn
+                return
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
+    
+    def execute(self, query: str, params: Sequence = ()) -> int:
+        """Run one write statement in its own transaction; returns lastrowid"""
+        with self.transaction() as conn:
+            return conn.execute(query, params).lastrowid
+    
+    def execute_many(self, query: str, rows) -> int:
+        """Run a statement for every parameter row in one transaction; returns the affected row count"""
+        with self.transaction() as conn:
+            return conn.executemany(query, rows).rowcount
+    
+    def fetch_one(self, query: str, params: Sequence = ()) -> Optional[sqlite3.Row]:
+        with self.connection() as conn:
+            return conn.execute(query, params).fetchone()
+    
+    def fetch_all(self, query: str, params: Sequence = ()) -> List[sqlite3.Row]:
+        with self.connection() as conn:
+            return conn.execute(query, params).fetchall()
+    
+    def fetch_batches(self, query: str, params: Sequence = (), batch_size: int = 1000) -> Iterator[List[sqlite3.Row]]:
+        """Yield the result rows in lists of up to batch_size (the connection is held until exhausted)"""
+        with self.connection() as conn:
+            cursor = conn.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+    
+    def fetch_in(self, query: str, values: Sequence, params: Sequence = ()) -> List[sqlite3.Row]:
+        """
+        Rows of a query with an IN list of any length
+        
+        Args:
+            query: Statement with a '{placeholders}' slot for the IN list
+            values: Values of the IN list, sent in batches of MAX_VARIABLES
+            params: Parameters bound before the IN list values
+        """
+        values = list(values)
+        rows = []
+        with self.connection() as conn:
+            for start in range(0, len(values), ConnectionManager.MAX_VARIABLES):
+                batch = values[start:start + ConnectionManager.MAX_VARIABLES]
+                placeholders = ','.join('?' * len(batch))
+                rows.extend(conn.execute(query.format(placeholders=placeholders), list(params) + batch).fetchall())
+        return rows
+    
+    def close(self):
+        """Close idle connections; connections in use are closed when released (e.g. before deleting the file)"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+            self._generation += 1
+            self._stats['closed'] += len(idle)
+        for conn, _ in idle:
+            conn.close()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Pool size, idle / in-use connections and open / reuse counters"""
+        with self._lock:
+            return {
+                'path': self.path,
+                'pool_size': self.pool_size,
+                'idle': len(self._idle),
+                'in_use': self._in_use,
+                **self._stats
+            }
+    
+    @staticmethod
+    def get_all_stats() -> Dict[str, Any]:
+        with ConnectionManager._registry_lock:
+            managers = list(ConnectionManager._managers.values())
+        return {manager.path: manager.stats() for manager in managers}
+
+def get_manager() -> ConnectionManager:
+    """Connection manager of the app database (DATABASE_PATH)"""
+    return ConnectionManager.for_path(DATABASE_PATH)
+
 def get_db_connection():
-    """Create connection to SQLite database"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Create connection to SQLite database (tuned, not pooled; the caller closes it)"""
+    return get_manager().open_connection()
 
 def init_db():
     """Initialize database and create necessary tables"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Documents table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS documents (
-            doc_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            filename TEXT NOT NULL UNIQUE,
-            filepath TEXT NOT NULL,
-            num_lines INTEGER DEFAULT 0,
-            num_chars INTEGER DEFAULT 0,
-            file_size INTEGER DEFAULT 0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Chunks table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS chunks (
-            chunk_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            doc_id INTEGER NOT NULL,
-            strategy TEXT NOT NULL,
-            params_json TEXT,
-            position INTEGER NOT NULL,
-            text TEXT NOT NULL,
-            len_chars INTEGER DEFAULT 0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (doc_id) REFERENCES documents(doc_id)
-        )
-    ''')
-    
-    # Indexes to improve query performance
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_chunks_doc_id ON chunks(doc_id)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_chunks_strategy ON chunks(strategy)')
+    with get_manager().transaction() as conn:
+        cursor = conn.cursor()
+        
+        # Documents table
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS documents (
+                doc_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                filename TEXT NOT NULL UNIQUE,
+                filepath TEXT NOT NULL,
+                num_lines INTEGER DEFAULT 0,
+                num_chars INTEGER DEFAULT 0,
+                file_size INTEGER DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        # Chunks table
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS chunks (
+                chunk_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                doc_id INTEGER NOT NULL,
+                strategy TEXT NOT NULL,
+                params_json TEXT,
+                position INTEGER NOT NULL,
+                text TEXT NOT NULL,
+                len_chars INTEGER DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (doc_id) REFERENCES documents(doc_id)
+            )
+        ''')
+        
+        # Indexes to improve query performance
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_chunks_doc_id ON chunks(doc_id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_chunks_strategy ON chunks(strategy)')
+        # Keyset pagination: one chunk per (document, strategy, position), in both browse orders
+        cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_chunks_doc_strategy_position ON chunks(doc_id, strategy, position)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_chunks_strategy_doc_position ON chunks(strategy, doc_id, position)')
     
-    conn.commit()
-    conn.close()
     logger.info("Database initialized successfully")
 
 def execute_query(query, params=(), fetch_one=False, fetch_all=False):
     """Helper function to execute queries"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    manager = get_manager()
     try:
-        cursor.execute(query, params)
         if fetch_one:
-            result = cursor.fetchone()
-        elif fetch_all:
-            result = cursor.fetchall()
-        else:
-            result = cursor.lastrowid
-        conn.commit()
-        return result
+            return manager.fetch_one(query, params)
+        if fetch_all:
+            return manager.fetch_all(query, params)
+        return manager.execute(query, params)
+    except Exception as e:
+        logger.error(f"Database error: {e}")
+        raise
+
+def execute_many(query, rows):
+    """Helper function to run one statement for many parameter rows in a single transaction"""
+    try:
+        return get_manager().execute_many(query, rows)
     except Exception as e:
-        conn.rollback()
         logger.error(f"Database error: {e}")
         raise
-    finally:
-        conn.close()
@@ -1,12 +1,17 @@
 """
 Flask Routes - API endpoints for RAG Tool
 """
-from flask import Flask, request, jsonify, render_template, send_from_directory
+from flask import Flask, Response, current_app, request, jsonify, render_template, send_from_directory, stream_with_context
 from werkzeug.exceptions import BadRequest
+import base64
+import functools
+import io
+import json
 import logging
+import time
 from pathlib import Path
 
-from config import DATA_DIR, ALLOWED_EXTENSIONS
+from config import DATA_DIR, ALLOWED_EXTENSIONS, EMBEDDING_STORAGE_DTYPE, EMBEDDING_STREAM_BATCH_SIZE
 from services.document_service import DocumentService
 from services.chunking_service import ChunkingService
 from services.embedding_service import EmbeddingService
@@ -16,9 +21,287 @@ from services.visualization_service import VisualizationService
 from services.retrieval_service import RetrievalService
 from services.ragas_service import RAGASService
 from services.visualization_service import VisualizationService
+from services.embedding_codec import EmbeddingCodec
+from services.embedding_set import EmbeddingSet
+from services.vector_store import VectorStore
+from services.chunk_store import ChunkStore
+from services.job_service import JobService, JobFailed, JobQueueFull
 
 logger = logging.getLogger(__name__)
 
+def _parse_query_arg(value: str):
+    """Parse a query-string value as JSON when possible (numbers, lists), else keep the string"""
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
+
+def get_request_payload():
+    """
+    Read request params and any binary embedding matrices
+    
+    - application/json: (json body, {})
+    - application/x-embedding-f32 / application/x-npy body: params from the query
+      string (optionally a JSON 'params' arg), matrix under 'embeddings'
+    - multipart/form-data: JSON 'params' field, each binary file part decoded by name
+    
+    Returns:
+        (params dict or None, dict of name -> float32 matrix)
+    """
+    if EmbeddingCodec.is_binary_mimetype(request.mimetype):
+        data = json.loads(request.args['params']) if 'params' in request.args else {}
+        for key, value in request.args.items():
+            if key != 'params':
+                data.setdefault(key, _parse_query_arg(value))
+        matrix = EmbeddingCodec.decode(
+            request.get_data(cache=False), request.mimetype, request.headers.get('Content-Encoding')
+        )
+        return data, {'embeddings': matrix}
+    
+    if request.mimetype == 'multipart/form-data':
+        data = json.loads(request.form.get('params') or '{}')
+        arrays = {}
+        for name, part in request.files.items():
+            arrays[name] = EmbeddingCodec.decode(
+                part.read(), part.mimetype or EmbeddingCodec.MIME_F32, part.headers.get('Content-Encoding')
+            )
+        return data, arrays
+    
+    return request.get_json(silent=True), {}
+
+def extract_embedding_vectors(items):
+    """Extract vectors from a list of raw vectors or embedding dicts; None if the format is invalid"""
+    embedding_vectors = []
+    for emb in items:
+        if isinstance(emb, list):
+            embedding_vectors.append(emb)
+        elif isinstance(emb, dict) and 'embedding' in emb:
+            embedding_vectors.append(emb['embedding'])
+        else:
+            return None
+    return embedding_vectors
+
+def get_document_embeddings(data, arrays):
+    """
+    Document embeddings from a binary part, a raw binary body, a named vector store or the JSON body
+    
+    Returns:
+        (document embeddings, VectorStore or None)
+    """
+    if 'document_embeddings' in arrays:
+        return arrays['document_embeddings'], None
+    if 'embeddings' in arrays:
+        # Raw application/x-embedding-f32 / x-npy body: the matrix is the document set
+        return arrays['embeddings'], None
+    if data.get('vector_store'):
+        store = VectorStore.open(data['vector_store'])
+        return store.embedding_set(), store
+    return data.get('document_embeddings', []), None
+
+def binary_embedding_response(matrix, mimetype: str):
+    """Encode embeddings in the negotiated binary format (gzip if the client accepts it)"""
+    compress = 'gzip' in (request.headers.get('Accept-Encoding') or '').lower()
+    body = EmbeddingCodec.encode(matrix, mimetype, compress=compress)
+    return Response(body, headers=EmbeddingCodec.response_headers(matrix, mimetype, compress))
+
+STREAM_MIMETYPES = {'application/x-ndjson': 'ndjson', 'text/event-stream': 'sse'}
+
+def stream_format(data):
+    """'ndjson' / 'sse' when the client asked for a streamed response (body 'stream' or Accept), else None"""
+    requested = (data or {}).get('stream')
+    if requested in ('ndjson', 'sse'):
+        return requested
+    if requested is True:
+        return 'ndjson'
+    for part in (request.headers.get('Accept') or '').split(','):
+        fmt = STREAM_MIMETYPES.get(part.split(';')[0].strip().lower())
+        if fmt:
+            return fmt
+    return None
+
+def format_event(event: str, payload: dict, fmt: str) -> str:
+    """One NDJSON line ({"event": ..., ...}) or one Server-Sent Event"""
+    if fmt == 'sse':
+        return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+    return json.dumps({'event': event, **payload}) + '\n'
+
+def stream_response(events, fmt: str) -> Response:
+    """
+    Stream (event, payload) pairs as they are produced
+    
+    Errors raised mid-stream (after the 200 status was sent) become a final 'error' event.
+    """
+    def generate():
+        try:
+            for event, payload in events:
+                yield format_event(event, payload, fmt)
+        except Exception as e:
+            logger.error(f"Error while streaming: {e}")
+            yield format_event('error', {'success': False, 'error': str(e)}, fmt)
+    
+    mimetype = 'text/event-stream' if fmt == 'sse' else 'application/x-ndjson'
+    return Response(stream_with_context(generate()), mimetype=mimetype,
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def stream_chunking_events(filenames, strategy: str, params: dict, persist: bool = True):
+    """
+    Events of a streamed chunking run: start, one 'chunks' per document, done
+    
+    With persist, each document's chunks are saved (one transaction per
+    document) before its event is sent, so they can be browsed via /api/chunks
+    while later documents are still being chunked.
+    """
+    lengths = []
+    yield 'start', {'total_documents': len(filenames), 'strategy': strategy}
+    for done, (filename, chunks) in enumerate(ChunkingService.iter_document_chunks(filenames, strategy, params), start=1):
+        lengths.extend(chunk['len_chars'] for chunk in chunks)
+        if persist:
+            ChunkStore.save_run(chunks, strategy, params)
+        yield 'chunks', {
+            'filename': filename,
+            'documents_done': done,
+            'total_documents': len(filenames),
+            'chunks': chunks
+        }
+    yield 'done', {
+        'success': True,
+        'message': f'Created {len(lengths)} chunks',
+        'statistics': ChunkingService.get_length_statistics(lengths),
+        'persisted': persist
+    }
+
+def vector_store_rows(chunks, texts):
+    """Vector store metadata rows for embedded chunks (rows keep chunk order)"""
+    return [
+        {
+            'filename': chunk.get('filename', ''),
+            'strategy': chunk.get('strategy'),
+            'position': chunk.get('position', 0),
+            'text': text
+        }
+        for chunk, text in zip(chunks, texts)
+    ]
+
+def stream_embedding_events(chunks, texts, method: str, data: dict):
+    """
+    Events of a streamed embedding run: start, one 'embeddings' per batch, done (or error)
+    
+    With embedding_encoding 'f32' each batch carries a base64 x-embedding-f32 'matrix'
+    instead of JSON vectors.
+    """
+    batch_size = int(data.get('batch_size') or EMBEDDING_STREAM_BATCH_SIZE)
+    binary = data.get('embedding_encoding') == 'f32'
+    store = VectorStore.open(data['vector_store'], create=True) if data.get('vector_store') else None
+    store_info = None
+    dim = None
+    
+    started = time.perf_counter()
+    yield 'start', {'total': len(texts), 'batch_size': batch_size, 'method': method}
+    for start, embeddings in EmbeddingService.iter_embedding_batches(texts, method, batch_size):
+        if not embeddings:
+            yield 'error', {'success': False, 'error': 'Failed to generate embeddings', 'completed': start}
+            return
+        if dim is None:
+            dim = len(embeddings[0])
+        elif len(embeddings[0]) != dim:
+            # A batch fell back to another model
+            yield 'error', {'success': False, 'error': f'Embedding dimension changed mid-stream ({dim} -> {len(embeddings[0])})', 'completed': start}
+            return
+        
+        batch_chunks = chunks[start:start + len(embeddings)]
+        if store is not None:
+            store_info = store.append(embeddings, vector_store_rows(batch_chunks, texts[start:start + len(embeddings)]))
+        
+        event = {'start': start, 'count': len(embeddings), 'embedding_dim': dim}
+        if binary:
+            event['matrix'] = base64.b64encode(EmbeddingCodec.encode(embeddings, EmbeddingCodec.MIME_F32)).decode('ascii')
+        else:
+            event['embeddings'] = [
+                {
+                    'chunk_index': start + i,
+                    'chunk_id': chunk.get('chunk_id', start + i),
+                    'filename': chunk.get('filename', ''),
+                    'position': chunk.get('position', 0),
+                    'embedding': embedding,
+                    'embedding_dim': len(embedding)
+                }
+                for i, (chunk, embedding) in enumerate(zip(batch_chunks, embeddings))
+            ]
+        yield 'embeddings', event
+    
+    done = {
+        'success': True,
+        'total': len(texts),
+        'embedding_dim': dim or 0,
+        'throughput': EmbeddingService.get_throughput(texts, time.perf_counter() - started)
+    }
+    if store_info is not None:
+        done['vector_store'] = store_info
+    yield 'done', done
+
+def wants_async() -> bool:
+    """Client asked for a job handle (?async=1 or Prefer: respond-async) and this is not a job replay"""
+    if request.environ.get('ragtool.job_id'):
+        return False
+    if request.args.get('async', '').lower() in ('1', 'true', 'yes'):
+        return True
+    return 'respond-async' in (request.headers.get('Prefer') or '').lower()
+
+def _replay_as_job(app: Flask, view, view_args, environ, body: bytes):
+    """Run a view on a copy of the original request inside a job; returns the captured response"""
+    job = JobService.current_job()
+    environ = dict(environ)
+    environ.pop('werkzeug.request', None)
+    environ['wsgi.input'] = io.BytesIO(body)
+    environ['CONTENT_LENGTH'] = str(len(body))
+    environ['ragtool.job_id'] = job.job_id if job else ''
+    
+    with app.request_context(environ):
+        response = app.make_response(view(**view_args))
+        captured = {
+            'status_code': response.status_code,
+            'headers': {k: v for k, v in response.headers.items() if k.lower() != 'content-length'},
+            'body': response.get_data()
+        }
+    
+    if response.status_code >= 400:
+        error = (response.get_json(silent=True) or {}).get('error') or f'HTTP {response.status_code}'
+        raise JobFailed(error, captured)
+    return captured
+
+def background_job(kind: str):
+    """
+    Let a heavy endpoint run as a background job
+    
+    With ?async=1 (or Prefer: respond-async) the request is queued on JobService and
+    202 is returned at once with the job handle; the job replays the request through
+    the same view, and its response is served by /api/jobs/<job_id>/result.
+    Without it the endpoint runs synchronously as before.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(**view_args):
+            if not wants_async():
+                return view(**view_args)
+            
+            body = request.get_data(cache=True)
+            try:
+                job = JobService.submit(
+                    kind, _replay_as_job, current_app._get_current_object(), view, view_args, request.environ, body
+                )
+            except JobQueueFull as e:
+                return jsonify({'success': False, 'error': str(e)}), 503
+            
+            status_url = f'/api/jobs/{job.job_id}'
+            return jsonify({
+                'success': True,
+                'job': job.to_dict(),
+                'status_url': status_url,
+                'result_url': f'{status_url}/result'
+            }), 202, {'Location': status_url}
+        return wrapper
+    return decorator
+
 def register_routes(app: Flask):
     """Register all routes"""
     
@@ -187,7 +470,8 @@ def register_routes(app: Flask):
                     'model': {'type': 'select', 'default': 'ollama', 'label': 'Embedding Model', 
                              'options': [
                                  {'value': 'ollama', 'label': 'Ollama (default - localhost:11434)'},
-                                 {'value': 'sentence-transformers', 'label': 'Sentence Transformers (fallback)'}
+                                 {'value': 'sentence-transformers', 'label': 'Sentence Transformers (fallback)'},
+                                 {'value': 'hashing', 'label': 'Hashing (offline, deterministic)'}
                              ]},
                     'ollama_model': {'type': 'text', 'default': 'nomic-embed-text', 'label': 'Ollama Model Name (default: nomic-embed-text)'}
                 }
@@ -200,6 +484,7 @@ def register_routes(app: Flask):
         })
     
     @app.route('/api/chunking/run', methods=['POST'])
+    @background_job('chunking')
     def run_chunking():
         """API: Run chunking for selected documents"""
         try:
@@ -210,6 +495,7 @@ def register_routes(app: Flask):
             filenames = data.get('filenames', [])
             strategy = data.get('strategy', '')
             params = data.get('params', {})
+            persist = bool(data.get('persist', True))
             
             if not filenames:
                 return jsonify({'success': False, 'error': 'No documents selected'}), 400
@@ -222,18 +508,28 @@ def register_routes(app: Flask):
             if len(documents) != len(filenames):
                 return jsonify({'success': False, 'error': 'Some documents not found'}), 400
             
+            # Streaming: one event per chunked document
+            fmt = stream_format(data)
+            if fmt:
+                return stream_response(stream_chunking_events(filenames, strategy, params, persist), fmt)
+            
             # Run chunking
             chunks = ChunkingService.chunk_multiple_documents(filenames, strategy, params)
             
             # Get statistics
             stats = ChunkingService.get_chunk_statistics(chunks)
             
-            return jsonify({
+            result = {
                 'success': True,
                 'message': f'Created {len(chunks)} chunks',
-                'statistics': stats,
-                'chunks': chunks  # Return all chunks (no database, so return all)
-            })
+                'statistics': stats
+            }
+            if persist:
+                # One transaction for the whole run; chunks get their doc_id / chunk_id
+                result['run'] = ChunkStore.save_run(chunks, strategy, params)
+            if data.get('include_chunks', True) or not persist:
+                result['chunks'] = chunks
+            return jsonify(result)
         except Exception as e:
             logger.error(f"Error running chunking: {e}")
             return jsonify({'success': False, 'error': str(e)}), 500
@@ -267,17 +563,38 @@ def register_routes(app: Flask):
     
     @app.route('/api/chunks', methods=['GET'])
     def get_chunks():
-        """API: Get chunks with pagination (stored in session/memory - not implemented)"""
-        # This endpoint is not needed without database
-        # Chunks are returned directly from /api/chunking/run
-        return jsonify({
-            'success': False,
-            'error': 'Chunks are returned directly from /api/chunking/run endpoint'
-        }), 400
+        """
+        API: Browse persisted chunks, one page at a time
+        
+        Query params: filename, doc_id, strategy, limit, cursor (next_cursor of
+        the previous page). Pages are ordered by (doc_id, strategy, position).
+        """
+        try:
+            doc_id = request.args.get('doc_id', type=int)
+            limit = request.args.get('limit', ChunkStore.DEFAULT_PAGE_SIZE, type=int)
+            page = ChunkStore.list_chunks(
+                filename=request.args.get('filename') or None,
+                doc_id=doc_id,
+                strategy=request.args.get('strategy') or None,
+                cursor=request.args.get('cursor') or None,
+                limit=limit
+            )
+            return jsonify({'success': True, **page})
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        except Exception as e:
+            logger.error(f"Error listing chunks: {e}")
+            return jsonify({'success': False, 'error': str(e)}), 500
     
     @app.route('/api/embeddings/generate', methods=['POST'])
+    @background_job('embeddings')
     def generate_embeddings():
-        """API: Generate embeddings for chunks"""
+        """
+        API: Generate embeddings for chunks
+        
+        Responds with JSON by default, or a binary float32 matrix when the
+        Accept header asks for application/x-embedding-f32 / application/x-npy.
+        """
         try:
             data = request.get_json()
             if not data:
@@ -288,30 +605,38 @@ def register_routes(app: Flask):
                 return jsonify({'success': False, 'error': 'No chunks provided'}), 400
             
             # Get embedding method
-            method = data.get('method', 'ollama')  # 'ollama' or 'sentence-transformers'
+            method = data.get('method', 'ollama')  # 'ollama', 'sentence-transformers' or 'hashing'
             
             # Extract text from chunks
             texts = [chunk.get('text', '') for chunk in chunks]
             if not any(texts):
                 return jsonify({'success': False, 'error': 'No text found in chunks'}), 400
             
-            # Generate embeddings based on method
-            embeddings = None
-            if method == 'ollama':
-                embeddings = EmbeddingService.get_embeddings_ollama(texts)
-                if embeddings:
-                    logger.info(f"Generated {len(embeddings)} embeddings using Ollama")
-            elif method == 'sentence-transformers':
-                embeddings = EmbeddingService.get_embeddings_sentence_transformers(texts)
-                if embeddings:
-                    logger.info(f"Generated {len(embeddings)} embeddings using sentence-transformers")
-            
-            # Fallback to default if method-specific failed
-            if not embeddings:
-                embeddings = EmbeddingService.get_embeddings(texts)
+            # Streaming: one event per embedded batch
+            fmt = stream_format(data)
+            if fmt:
+                return stream_response(stream_embedding_events(chunks, texts, method, data), fmt)
+            
+            # Generate embeddings based on method (falls back to the default chain)
+            started = time.perf_counter()
+            embeddings = EmbeddingService.embed_texts(texts, method)
             
             if not embeddings:
                 return jsonify({'success': False, 'error': 'Failed to generate embeddings'}), 500
+            throughput = EmbeddingService.get_throughput(texts, time.perf_counter() - started)
+            logger.info(f"Embedded {throughput['chunks']} chunks: {throughput['chunks_per_second']} chunks/s, "
+                        f"{throughput['chars_per_second']} chars/s")
+            
+            # Optionally persist to a named vector store (rows keep chunk order)
+            store_info = None
+            if data.get('vector_store'):
+                store = VectorStore.open(data['vector_store'], create=True)
+                store_info = store.append(embeddings, vector_store_rows(chunks, texts))
+            
+            # Binary transport: rows are in chunk order, chunk info stays with the client
+            binary_mimetype = EmbeddingCodec.negotiate(request.headers.get('Accept'))
+            if binary_mimetype:
+                return binary_embedding_response(embeddings, binary_mimetype)
             
             # Return embeddings with chunk info
             result = []
@@ -325,17 +650,36 @@ def register_routes(app: Flask):
                     'embedding_dim': len(embedding)
                 })
             
-            return jsonify({
+            response = {
                 'success': True,
                 'embeddings': result,
                 'total': len(result),
-                'embedding_dim': len(embeddings[0]) if embeddings else 0
-            })
+                'embedding_dim': len(embeddings[0]) if embeddings else 0,
+                'throughput': throughput
+            }
+            if store_info is not None:
+                response['vector_store'] = store_info
+            
+            return jsonify(response)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
         except Exception as e:
             logger.error(f"Error generating embeddings: {e}")
             return jsonify({'success': False, 'error': str(e)}), 500
     
+    @app.route('/api/embeddings/stats', methods=['GET'])
+    def embedding_stats():
+        """API: Embedding backend counters (request coalescing, admission scheduler, Ollama servers, query vector cache)"""
+        return jsonify({
+            'success': True,
+            'coalescing': EmbeddingService.get_coalescing_info(),
+            'scheduler': EmbeddingService.get_scheduler_info(),
+            'ollama_servers': EmbeddingService.get_balancer_info(),
+            'query_vectors': EmbeddingService.get_query_cache_info()
+        })
+    
     @app.route('/api/embeddings/evaluate', methods=['POST'])
+    @background_job('embedding_evaluation')
     def evaluate_embeddings():
         """
         API: Evaluate embeddings using specified metric or comprehensive evaluation
@@ -345,22 +689,21 @@ def register_routes(app: Flask):
         - Comprehensive evaluation: metric=None or 'comprehensive'
         """
         try:
-            data = request.get_json()
-            if not data:
+            data, arrays = get_request_payload()
+            if data is None:
                 return jsonify({'success': False, 'error': 'No data provided'}), 400
             
-            embeddings = data.get('embeddings', [])
-            if not embeddings:
-                return jsonify({'success': False, 'error': 'No embeddings provided'}), 400
-            
-            # Extract embedding vectors (handle both formats)
-            embedding_vectors = []
-            for emb in embeddings:
-                if isinstance(emb, list):
-                    embedding_vectors.append(emb)
-                elif isinstance(emb, dict) and 'embedding' in emb:
-                    embedding_vectors.append(emb['embedding'])
-                else:
+            if 'embeddings' in arrays:
+                # Binary transport: already a float32 matrix
+                embedding_vectors = arrays['embeddings']
+            else:
+                embeddings = data.get('embeddings', [])
+                if not embeddings:
+                    return jsonify({'success': False, 'error': 'No embeddings provided'}), 400
+                
+                # Extract embedding vectors (handle both formats)
+                embedding_vectors = extract_embedding_vectors(embeddings)
+                if embedding_vectors is None:
                     return jsonify({'success': False, 'error': 'Invalid embedding format'}), 400
             
             if len(embedding_vectors) < 2:
@@ -440,6 +783,9 @@ def register_routes(app: Flask):
                 'error': result.get('error'),
                 'quality_level': result.get('quality_level')
             })
+        except ValueError as e:
+            # Malformed binary payload
+            return jsonify({'success': False, 'error': str(e)}), 400
         except Exception as e:
             logger.error(f"Error evaluating embeddings: {e}")
             return jsonify({'success': False, 'error': str(e)}), 500
@@ -449,24 +795,105 @@ def register_routes(app: Flask):
         """
         API: Evaluate retrieval quality (Layer 3)
         
-        Supports single query or multiple queries evaluation
+        Supports single query or multiple queries evaluation, with dense, BM25
+        ('retrieval_mode': 'bm25') or hybrid ('hybrid') retrieval; lexical modes
+        need 'query_text' and 'document_texts' aligned with the document embeddings.
+        'filters' (filename, strategy, position_min, position_max) restrict the search
+        to matching chunks, described by 'document_metadata' or the vector store sidecar.
+        Without 'query_embedding', dense modes embed 'query_text' server-side
+        ('embedding_method'), reusing cached query vectors. 'mmr_lambda' re-ranks
+        the top 'mmr_candidates' with maximal marginal relevance.
+        Embeddings can be sent as JSON or, via multipart/form-data, as binary
+        parts named query_embedding / query_embeddings / document_embeddings
+        with the remaining fields in a JSON 'params' part. A raw binary body is
+        taken as the document embeddings (other fields in the query string).
         """
         try:
-            data = request.get_json()
-            if not data:
+            data, arrays = get_request_payload()
+            if data is None:
                 return jsonify({'success': False, 'error': 'No data provided'}), 400
             
+            document_embeddings, store = get_document_embeddings(data, arrays)
+            
+            if 'query_embedding' in arrays:
+                data['query_embedding'] = arrays['query_embedding'][0]
+            if 'query_embeddings' in arrays and 'test_queries' in data:
+                for query_data, query_embedding in zip(data['test_queries'], arrays['query_embeddings']):
+                    query_data['query_embedding'] = query_embedding
+            
+            storage_dtype = data.get('storage_dtype', EMBEDDING_STORAGE_DTYPE)
+            if storage_dtype not in EmbeddingSet.SUPPORTED_DTYPES:
+                return jsonify({'success': False, 'error': f'Unsupported storage_dtype: {storage_dtype}'}), 400
+            
+            search_method = data.get('search_method', 'exact')
+            if search_method not in RetrievalService.SEARCH_METHODS:
+                return jsonify({'success': False, 'error': f'Unsupported search_method: {search_method}'}), 400
+            search_params = {
+                name: int(data[name])
+                for name in RetrievalService.SEARCH_PARAMS.get(search_method, ())
+                if data.get(name) is not None
+            } or None
+            
+            # Lexical / hybrid retrieval over chunk texts
+            retrieval_mode = data.get('retrieval_mode', 'dense')
+            if retrieval_mode not in RetrievalService.RETRIEVAL_MODES:
+                return jsonify({'success': False, 'error': f'Unsupported retrieval_mode: {retrieval_mode}'}), 400
+            fusion = data.get('fusion', 'rrf')
+            if fusion not in RetrievalService.FUSION_METHODS:
+                return jsonify({'success': False, 'error': f'Unsupported fusion: {fusion}'}), 400
+            alpha = float(data.get('alpha', 0.5))
+            document_texts = data.get('document_texts')
+            
+            uses_dense = retrieval_mode != 'bm25'
+            uses_lexical = retrieval_mode != 'dense'
+            if uses_lexical and not document_texts:
+                return jsonify({'success': False, 'error': 'document_texts are required for bm25 / hybrid retrieval'}), 400
+            if uses_dense and len(document_embeddings) == 0:
+                return jsonify({'success': False, 'error': 'Missing required fields'}), 400
+            
+            # Metadata pre-filtering
+            filters = data.get('filters') or None
+            document_metadata = data.get('document_metadata')
+            if filters:
+                if not isinstance(filters, dict):
+                    return jsonify({'success': False, 'error': 'filters must be an object'}), 400
+                if document_metadata is None and store is not None:
+                    document_metadata = store.metadata_index()
+                if document_metadata is None:
+                    return jsonify({'success': False, 'error': 'document_metadata is required with filters'}), 400
+            
+            embedding_method = data.get('embedding_method', 'ollama')
+            
+            # Optional MMR diversification of the top-k
+            mmr_lambda = data.get('mmr_lambda')
+            if mmr_lambda is not None:
+                mmr_lambda = float(mmr_lambda)
+                if not 0.0 <= mmr_lambda <= 1.0:
+                    return jsonify({'success': False, 'error': 'mmr_lambda must be between 0 and 1'}), 400
+            mmr_candidates = int(data['mmr_candidates']) if data.get('mmr_candidates') else None
+            
             # Check if single query or multiple queries
-            if 'query_embedding' in data:
+            if 'query_embedding' in data or 'query_text' in data:
                 # Single query evaluation
                 query_embedding = data.get('query_embedding')
-                document_embeddings = data.get('document_embeddings', [])
+                query_text = data.get('query_text')
                 relevant_doc_indices = data.get('relevant_doc_indices', [])
                 k_values = data.get('k_values', [5, 10])
                 relevance_scores = data.get('relevance_scores')  # Optional
+                if relevance_scores:
+                    # JSON object keys are strings; metrics look up integer indices
+                    relevance_scores = {int(idx): score for idx, score in relevance_scores.items()}
+                
+                query_vector_cached = None
+                if uses_dense and query_embedding is None and query_text:
+                    query_embedding, query_vector_cached = EmbeddingService.embed_query(query_text, embedding_method)
+                    if query_embedding is None:
+                        return jsonify({'success': False, 'error': 'Failed to generate query embedding'}), 500
                 
-                if not query_embedding or not document_embeddings:
+                if uses_dense and (query_embedding is None or len(query_embedding) == 0):
                     return jsonify({'success': False, 'error': 'Missing required fields'}), 400
+                if uses_lexical and not query_text:
+                    return jsonify({'success': False, 'error': 'query_text is required for bm25 / hybrid retrieval'}), 400
                 
                 if isinstance(relevant_doc_indices, list):
                     relevant_doc_indices = set(relevant_doc_indices)
@@ -476,34 +903,195 @@ def register_routes(app: Flask):
                     document_embeddings,
                     relevant_doc_indices,
                     k_values,
-                    relevance_scores
+                    relevance_scores,
+                    storage_dtype=storage_dtype,
+                    search_method=search_method,
+                    search_params=search_params,
+                    retrieval_mode=retrieval_mode,
+                    query_text=query_text,
+                    document_texts=document_texts,
+                    fusion=fusion,
+                    alpha=alpha,
+                    filters=filters,
+                    document_metadata=document_metadata,
+                    mmr_lambda=mmr_lambda,
+                    mmr_candidates=mmr_candidates
                 )
                 
+                # Attach persisted chunk info for store-backed searches
+                if store is not None and result.get('success'):
+                    retrieved = result['results']['retrieved_documents']
+                    rows = store.get_rows([doc['index'] for doc in retrieved])
+                    for doc in retrieved:
+                        row = rows.get(doc['index'])
+                        if row:
+                            doc.update(filename=row['filename'], strategy=row['strategy'],
+                                       position=row['position'], text_hash=row['text_hash'])
+                
+                if query_vector_cached is not None:
+                    result['query_vector_cached'] = query_vector_cached
+                
                 return jsonify(result)
             
             elif 'test_queries' in data:
                 # Multiple queries evaluation
                 test_queries = data.get('test_queries', [])
-                document_embeddings = data.get('document_embeddings', [])
                 k_values = data.get('k_values', [5, 10])
                 
-                if not test_queries or not document_embeddings:
+                if not test_queries:
                     return jsonify({'success': False, 'error': 'Missing required fields'}), 400
                 
+                if uses_dense:
+                    for query_data in test_queries:
+                        if query_data.get('query_embedding') is None and query_data.get('query_text'):
+                            query_data['query_embedding'], _ = EmbeddingService.embed_query(
+                                query_data['query_text'], embedding_method
+                            )
+                
                 result = RetrievalService.evaluate_multiple_queries(
                     test_queries,
                     document_embeddings,
-                    k_values
+                    k_values,
+                    storage_dtype=storage_dtype,
+                    search_method=search_method,
+                    search_params=search_params,
+                    retrieval_mode=retrieval_mode,
+                    document_texts=document_texts,
+                    fusion=fusion,
+                    alpha=alpha,
+                    filters=filters,
+                    document_metadata=document_metadata,
+                    mmr_lambda=mmr_lambda,
+                    mmr_candidates=mmr_candidates
                 )
                 
                 return jsonify(result)
             else:
                 return jsonify({'success': False, 'error': 'Must provide either query_embedding or test_queries'}), 400
-                
+        
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
         except Exception as e:
             logger.error(f"Error evaluating retrieval: {e}")
             return jsonify({'success': False, 'error': str(e)}), 500
     
+    @app.route('/api/retrieval/cache', methods=['GET', 'DELETE'])
+    def retrieval_cache():
+        """API: Hit rates of (GET) or clear (DELETE) the query vector and query result caches"""
+        if request.method == 'DELETE':
+            EmbeddingService.clear_query_cache()
+            RetrievalService.clear_result_cache()
+            return jsonify({'success': True, 'message': 'Query caches cleared'})
+        return jsonify({
+            'success': True,
+            'caches': {
+                'query_vectors': EmbeddingService.get_query_cache_info(),
+                'query_results': RetrievalService.get_result_cache_info()
+            }
+        })
+    
+    @app.route('/api/retrieval/quantization-report', methods=['POST'])
+    def quantization_report():
+        """
+        API: Compare embedding storage dtypes (float32 / float16 / int8)
+        
+        Reports memory per vector, search latency and recall@k against float32.
+        Accepts the same JSON / multipart payloads as /api/retrieval/evaluate;
+        without query embeddings a sample of the documents is used as queries.
+        """
+        try:
+            data, arrays = get_request_payload()
+            if data is None:
+                return jsonify({'success': False, 'error': 'No data provided'}), 400
+            
+            document_embeddings, _ = get_document_embeddings(data, arrays)
+            
+            query_embeddings = arrays.get('query_embeddings')
+            if query_embeddings is None:
+                query_embeddings = data.get('query_embeddings')
+            
+            if len(document_embeddings) == 0:
+                return jsonify({'success': False, 'error': 'Missing document_embeddings'}), 400
+            
+            dtypes = data.get('dtypes')
+            if dtypes is not None:
+                unsupported = [d for d in dtypes if d not in EmbeddingSet.SUPPORTED_DTYPES]
+                if unsupported:
+                    return jsonify({'success': False, 'error': f'Unsupported dtypes: {unsupported}'}), 400
+            
+            result = RetrievalService.quantization_report(
+                document_embeddings,
+                query_embeddings,
+                k=int(data.get('k', 10)),
+                dtypes=dtypes
+            )
+            
+            return jsonify(result)
+        
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        except Exception as e:
+            logger.error(f"Error building quantization report: {e}")
+            return jsonify({'success': False, 'error': str(e)}), 500
+    
+    @app.route('/api/vector-stores', methods=['GET'])
+    def list_vector_stores():
+        """
+        API: List persistent vector stores
+        """
+        try:
+            return jsonify({'success': True, 'stores': VectorStore.list_stores()})
+        except Exception as e:
+            logger.error(f"Error listing vector stores: {e}")
+            return jsonify({'success': False, 'error': str(e)}), 500
+    
+    @app.route('/api/vector-stores/<name>', methods=['GET', 'DELETE'])
+    def vector_store_info(name):
+        """
+        API: Get info for (GET) or delete (DELETE) a vector store
+        """
+        try:
+            store = VectorStore.open(name)
+            if request.method == 'DELETE':
+                store.delete()
+                return jsonify({'success': True, 'deleted': name})
+            return jsonify({'success': True, 'store': store.info()})
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 404
+        except Exception as e:
+            logger.error(f"Error accessing vector store: {e}")
+            return jsonify({'success': False, 'error': str(e)}), 500
+    
+    @app.route('/api/vector-stores/<name>/append', methods=['POST'])
+    def append_vector_store(name):
+        """
+        API: Append embeddings to a vector store (created on first append)
+        
+        Embeddings as JSON ('embeddings') or binary (body / multipart part 'embeddings');
+        optional 'rows' list of {filename, position, text | text_hash} in the same order.
+        """
+        try:
+            data, arrays = get_request_payload()
+            if data is None:
+                return jsonify({'success': False, 'error': 'No data provided'}), 400
+            
+            if 'embeddings' in arrays:
+                embedding_vectors = arrays['embeddings']
+            else:
+                embedding_vectors = extract_embedding_vectors(data.get('embeddings', []))
+                if not embedding_vectors:
+                    return jsonify({'success': False, 'error': 'No valid embeddings provided'}), 400
+            
+            store = VectorStore.open(name, create=True)
+            info = store.append(embedding_vectors, data.get('rows'))
+            
+            return jsonify({'success': True, 'store': info})
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        except Exception as e:
+            logger.error(f"Error appending to vector store: {e}")
+            return jsonify({'success': False, 'error': str(e)}), 500
+    
     @app.route('/api/ragas/evaluate', methods=['POST'])
     def evaluate_ragas():
         """
@@ -559,39 +1147,51 @@ def register_routes(app: Flask):
                 )
                 
                 return jsonify(result)
-                
+        
         except Exception as e:
             logger.error(f"Error evaluating RAGAS: {e}")
             return jsonify({'success': False, 'error': str(e)}), 500
     
     @app.route('/api/visualization/reduce', methods=['POST'])
+    @background_job('visualization')
     def reduce_dimensions():
         """
         API: Reduce embedding dimensions for visualization (UMAP or t-SNE)
+        
+        Embeddings can be sent as JSON or as a binary matrix (body or multipart part 'embeddings').
         """
         try:
-            data = request.get_json()
-            if not data:
+            data, arrays = get_request_payload()
+            if data is None:
                 return jsonify({'success': False, 'error': 'No data provided'}), 400
             
-            embeddings = data.get('embeddings', [])
-            if not embeddings:
-                return jsonify({'success': False, 'error': 'No embeddings provided'}), 400
-            
-            # Extract embedding vectors
-            embedding_vectors = []
-            for emb in embeddings:
-                if isinstance(emb, list):
-                    embedding_vectors.append(emb)
-                elif isinstance(emb, dict) and 'embedding' in emb:
-                    embedding_vectors.append(emb['embedding'])
-                else:
+            if 'embeddings' in arrays:
+                embedding_vectors = arrays['embeddings']
+            else:
+                embeddings = data.get('embeddings', [])
+                if not embeddings:
+                    return jsonify({'success': False, 'error': 'No embeddings provided'}), 400
+                
+                # Extract embedding vectors
+                embedding_vectors = extract_embedding_vectors(embeddings)
+                if embedding_vectors is None:
                     return jsonify({'success': False, 'error': 'Invalid embedding format'}), 400
             
-            method = data.get('method', 'umap').lower()  # Always 'umap' now
+            if len(embedding_vectors) == 0:
+                return jsonify({'success': False, 'error': 'No embeddings provided'}), 400
+            
+            method = data.get('method', 'umap').lower()  # 'umap' or 'tsne'
             n_components = data.get('n_components', 2)  # 2 or 3
             labels = data.get('labels')  # Optional
             chunks = data.get('chunks')  # Optional
+            pca_components = data.get('pca_components')  # Optional, 0 disables PCA
+            n_jobs = data.get('n_jobs')  # Optional
+            random_state = data.get('random_state', 42)  # null = unseeded, lets UMAP use n_jobs threads
+            if random_state is not None and (isinstance(random_state, bool) or not isinstance(random_state, int)):
+                return jsonify({'success': False, 'error': 'random_state must be an integer or null'}), 400
+            output_format = data.get('format', 'points')  # 'points' or 'columnar'
+            max_points = data.get('max_points')  # Optional level-of-detail limit
+            viewport = data.get('viewport')  # Optional {x_min, x_max, y_min, y_max}
             
             # Prepare visualization data
             result = VisualizationService.prepare_visualization_data(
@@ -599,15 +1199,138 @@ def register_routes(app: Flask):
                 labels,
                 chunks,
                 method,
-                n_components=n_components
+                n_components=n_components,
+                pca_components=pca_components,
+                n_jobs=n_jobs,
+                random_state=random_state,
+                output_format=output_format,
+                max_points=max_points,
+                viewport=viewport
             )
             
             return jsonify(result)
-                
+        
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
         except Exception as e:
             logger.error(f"Error reducing dimensions: {e}")
             return jsonify({'success': False, 'error': str(e)}), 500
     
+    @app.route('/api/visualization/transform', methods=['POST'])
+    def transform_visualization_points():
+        """
+        API: Place new points (e.g. queries) into a previously fitted UMAP projection
+        """
+        try:
+            data, arrays = get_request_payload()
+            if data is None:
+                return jsonify({'success': False, 'error': 'No data provided'}), 400
+            
+            projection_id = data.get('projection_id')
+            if 'embeddings' in arrays:
+                embedding_vectors = arrays['embeddings']
+            else:
+                embedding_vectors = extract_embedding_vectors(data.get('embeddings', []))
+                if embedding_vectors is None:
+                    return jsonify({'success': False, 'error': 'Invalid embedding format'}), 400
+            
+            if not projection_id or len(embedding_vectors) == 0:
+                return jsonify({'success': False, 'error': 'Missing required fields: projection_id, embeddings'}), 400
+            
+            result = VisualizationService.transform_points(projection_id, embedding_vectors)
+            if not result.get('success'):
+                if 'expected_dim' in result:
+                    return jsonify(result), 400
+                not_found = 'not found' in (result.get('error') or '') or not VisualizationService.caching_enabled()
+                return jsonify(result), 404 if not_found else 500
+            
+            return jsonify(result)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        except Exception as e:
+            logger.error(f"Error transforming visualization points: {e}")
+            return jsonify({'success': False, 'error': str(e)}), 500
+    
+    @app.route('/api/visualization/view', methods=['POST'])
+    def visualization_view():
+        """
+        API: Re-sample a cached projection for a zoom level / viewport (level of detail)
+        """
+        try:
+            data = request.get_json()
+            if not data or not data.get('projection_id'):
+                return jsonify({'success': False, 'error': 'Missing required field: projection_id'}), 400
+            
+            result = VisualizationService.get_projection_view(
+                data['projection_id'],
+                max_points=data.get('max_points'),
+                viewport=data.get('viewport'),
+                output_format=data.get('format', 'columnar')
+            )
+            if not result.get('success'):
+                return jsonify(result), 404
+            
+            return jsonify(result)
+        except Exception as e:
+            logger.error(f"Error building visualization view: {e}")
+            return jsonify({'success': False, 'error': str(e)}), 500
+    
+    @app.route('/api/visualization/points/<projection_id>/<int:index>', methods=['GET'])
+    def visualization_point(projection_id, index):
+        """API: Get chunk text for one visualization point (on-demand tooltip)"""
+        result = VisualizationService.get_point_details(projection_id, index)
+        if not result.get('success'):
+            return jsonify(result), 404
+        return jsonify(result)
+    
+    @app.route('/api/visualization/cache', methods=['GET', 'DELETE'])
+    def visualization_cache():
+        """API: Inspect (GET) or clear (DELETE) cached projections"""
+        if request.method == 'DELETE':
+            VisualizationService.clear_projection_cache()
+            return jsonify({'success': True, 'message': 'Projection cache cleared'})
+        return jsonify({'success': True, 'cache': VisualizationService.get_projection_cache_info()})
+    
+    @app.route('/api/jobs', methods=['GET'])
+    def list_jobs():
+        """API: Background jobs (newest first), optionally filtered by status / kind"""
+        jobs = JobService.list_jobs(status=request.args.get('status'), kind=request.args.get('kind'))
+        return jsonify({
+            'success': True,
+            'jobs': [job.to_dict() for job in jobs],
+            'info': JobService.get_info()
+        })
+    
+    @app.route('/api/jobs/<job_id>', methods=['GET', 'DELETE'])
+    def job_status(job_id):
+        """API: Job status and progress (GET), or cancel a pending job / drop a finished one (DELETE)"""
+        job = JobService.get(job_id)
+        if job is None:
+            return jsonify({'success': False, 'error': f'Job not found: {job_id}'}), 404
+        
+        if request.method == 'DELETE':
+            if job.finished:
+                JobService.delete(job_id)
+                return jsonify({'success': True, 'message': f'Job {job_id} deleted', 'job': job.to_dict()})
+            job = JobService.cancel(job_id)
+            return jsonify({'success': True, 'message': f'Cancellation requested for job {job_id}', 'job': job.to_dict()})
+        
+        return jsonify({'success': True, 'job': job.to_dict()})
+    
+    @app.route('/api/jobs/<job_id>/result', methods=['GET'])
+    def job_result(job_id):
+        """API: Response of a finished job, as the endpoint would have returned it"""
+        job = JobService.get(job_id)
+        if job is None:
+            return jsonify({'success': False, 'error': f'Job not found (or expired): {job_id}'}), 404
+        if not job.finished:
+            return jsonify({'success': False, 'error': f'Job is {job.status}', 'job': job.to_dict()}), 409
+        if not isinstance(job.result, dict) or 'body' not in job.result:
+            error = job.error or f'Job {job.status}'
+            return jsonify({'success': False, 'error': error, 'job': job.to_dict()}), 409 if job.status == 'cancelled' else 500
+        
+        return Response(job.result['body'], status=job.result['status_code'], headers=job.result['headers'])
+    
     @app.errorhandler(404)
     def not_found(error):
         return jsonify({'success': False, 'error': 'Not found'}), 404
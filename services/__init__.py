@@ -5,6 +5,21 @@ from .embedding_service import EmbeddingService
 from .retrieval_service import RetrievalService
 from .ragas_service import RAGASService
 from .visualization_service import VisualizationService
+from .embedding_set import EmbeddingSet
+from .hnsw_index import HNSWIndex
+from .ivfpq_index import IVFPQIndex
+from .vector_store import VectorStore
+from .bm25_index import BM25Index
+from .metadata_index import MetadataIndex
+from .query_cache import QueryCache
+from .sharded_search import ShardedSearcher
+from .hashing_embedder import HashingEmbedder
+from .job_service import JobService
+from .singleflight import SingleFlight
+from .embedding_scheduler import EmbeddingScheduler
+from .ollama_balancer import OllamaBalancer
+from .vector_math import VectorMath
+from .chunk_store import ChunkStore
 
 __all__ = [
     'DocumentService',
@@ -12,5 +27,20 @@ __all__ = [
     'EmbeddingService',
     'RetrievalService',
     'RAGASService',
-    'VisualizationService'
+    'VisualizationService',
+    'EmbeddingSet',
+    'HNSWIndex',
+    'IVFPQIndex',
+    'VectorStore',
+    'BM25Index',
+    'MetadataIndex',
+    'QueryCache',
+    'ShardedSearcher',
+    'HashingEmbedder',
+    'JobService',
+    'SingleFlight',
+    'EmbeddingScheduler',
+    'OllamaBalancer',
+    'VectorMath',
+    'ChunkStore'
 ]
\ No newline at end of file
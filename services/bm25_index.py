@@ -0,0 +1,161 @@
+"""
+BM25 Index - Lexical retrieval over chunk texts
+
+Okapi BM25 on an inverted index with array-backed (CSR) posting lists:
+- term_offsets[t]:term_offsets[t + 1] slices the postings of term t
+- posting_docs / posting_tfs hold document ids and term frequencies
+
+Queries score only the postings of their terms with vectorized numpy updates,
+so cost grows with posting length, not corpus size.
+"""
+import hashlib
+import logging
+import re
+import time
+from array import array
+from collections import Counter
+from typing import List, Dict, Any, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Optional dependencies
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+    logger.warning("numpy not available, BM25 index will not work")
+
+
+class BM25Index:
+    """Inverted-index BM25 engine returning (index, score) pairs like RetrievalService.search_similar"""
+    
+    # Words, keeping codes such as "E-1042", "v2.1" or "COVID-19" as one token
+    TOKEN_PATTERN = re.compile(r'\w+(?:[-.]\w+)*')
+    
+    def __init__(self, texts: List[str], k1: float = 1.5, b: float = 0.75):
+        """
+        Args:
+            texts: Chunk texts; document ids are their list positions
+            k1: Term-frequency saturation
+            b: Document-length normalization
+        """
+        self.k1 = float(k1)
+        self.b = float(b)
+        self.n_docs = len(texts)
+        self.fingerprint = BM25Index.compute_fingerprint(texts)
+        
+        start = time.perf_counter()
+        self._build(texts)
+        self.build_seconds = round(time.perf_counter() - start, 3)
+        
+        logger.info(f"Built BM25 index over {self.n_docs} chunks ({len(self.vocabulary)} terms) in {self.build_seconds}s")
+    
+    @staticmethod
+    def tokenize(text: str) -> List[str]:
+        """Lowercase word tokens"""
+        return BM25Index.TOKEN_PATTERN.findall((text or '').lower())
+    
+    @staticmethod
+    def compute_fingerprint(texts: List[str]) -> str:
+        """Stable fingerprint of a list of texts"""
+        digest = hashlib.sha1()
+        for text in texts:
+            encoded = (text or '').encode('utf-8')
+            digest.update(len(encoded).to_bytes(8, 'little'))
+            digest.update(encoded)
+        return digest.hexdigest()
+    
+    def _build(self, texts: List[str]):
+        self.vocabulary: Dict[str, int] = {}
+        term_ids = array('i')
+        doc_ids = array('i')
+        tfs = array('i')
+        doc_lengths = np.zeros(self.n_docs, dtype=np.int32)
+        
+        for doc_id, text in enumerate(texts):
+            tokens = BM25Index.tokenize(text)
+            doc_lengths[doc_id] = len(tokens)
+            for term, tf in Counter(tokens).items():
+                term_id = self.vocabulary.setdefault(term, len(self.vocabulary))
+                term_ids.append(term_id)
+                doc_ids.append(doc_id)
+                tfs.append(tf)
+        
+        term_ids = np.frombuffer(term_ids, dtype=np.int32)
+        order = np.argsort(term_ids, kind='stable')  # keeps postings sorted by doc id
+        
+        self.posting_docs = np.frombuffer(doc_ids, dtype=np.int32)[order].copy()
+        self.posting_tfs = np.frombuffer(tfs, dtype=np.int32)[order].astype(np.float32)
+        doc_freqs = np.bincount(term_ids, minlength=len(self.vocabulary))
+        self.term_offsets = np.zeros(len(self.vocabulary) + 1, dtype=np.int64)
+        np.cumsum(doc_freqs, out=self.term_offsets[1:])
+        
+        # Non-negative BM25 idf (Lucene variant)
+        self.idf = np.log1p((self.n_docs - doc_freqs + 0.5) / (doc_freqs + 0.5)).astype(np.float32)
+        
+        self.doc_lengths = doc_lengths
+        self.avg_doc_length = float(doc_lengths.mean()) if self.n_docs else 0.0
+        # Per-document denominator term k1 * (1 - b + b * dl / avgdl)
+        self._length_norm = (self.k1 * (1.0 - self.b + self.b * doc_lengths / max(self.avg_doc_length, 1e-9))).astype(np.float32)
+    
+    def __len__(self) -> int:
+        return self.n_docs
+    
+    def scores(self, query_text: str):
+        """BM25 score of every document for a query (0 for documents sharing no term)"""
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        for term, query_tf in Counter(BM25Index.tokenize(query_text)).items():
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                continue
+            start, end = self.term_offsets[term_id], self.term_offsets[term_id + 1]
+            docs = self.posting_docs[start:end]
+            tf = self.posting_tfs[start:end]
+            # Postings hold each document once per term, so fancy-index += is safe
+            scores[docs] += query_tf * self.idf[term_id] * tf * (self.k1 + 1.0) / (tf + self._length_norm[docs])
+        return scores
+    
+    def search(self, query_text: str, top_k: int = 5, rows=None) -> List[Tuple[int, float]]:
+        """
+        Top-k documents by BM25 score (documents with score 0 are never returned)
+        
+        Args:
+            query_text: Query text
+            top_k: Number of results
+            rows: Optional row ids to restrict the results to (pre-filtering)
+        
+        Returns:
+            List of (index, bm25_score) tuples, sorted by score descending
+        """
+        scores = self.scores(query_text)
+        if rows is not None:
+            rows = np.asarray(rows, dtype=np.int64)
+            matched = rows[scores[rows] > 0]
+        else:
+            matched = np.flatnonzero(scores > 0)
+        top_k = min(int(top_k), len(matched))
+        if top_k <= 0:
+            return []
+        candidates = matched[np.argpartition(-scores[matched], top_k - 1)[:top_k]]
+        order = candidates[np.argsort(-scores[candidates], kind='stable')]
+        return [(int(i), float(scores[i])) for i in order]
+    
+    def memory_bytes(self) -> int:
+        """Bytes held by posting lists and per-term / per-document arrays"""
+        return int(self.posting_docs.nbytes + self.posting_tfs.nbytes + self.term_offsets.nbytes
+                   + self.idf.nbytes + self.doc_lengths.nbytes + self._length_norm.nbytes)
+    
+    def info(self) -> Dict[str, Any]:
+        """Describe the index"""
+        return {
+            'method': 'bm25',
+            'n_docs': self.n_docs,
+            'n_terms': len(self.vocabulary),
+            'n_postings': int(len(self.posting_docs)),
+            'avg_doc_length': round(self.avg_doc_length, 2),
+            'k1': self.k1,
+            'b': self.b,
+            'build_seconds': self.build_seconds,
+            'memory_bytes': self.memory_bytes()
+        }
@@ -0,0 +1,201 @@
+"""
+Chunk Store - Persist chunking runs to the SQLite documents / chunks tables
+
+A run is written in one transaction: documents are upserted by filename, the
+earlier chunks of each document for the same strategy are replaced, and the new
+chunks are inserted with executemany. Chunks are browsed with keyset pagination
+over (doc_id, strategy, position), so a page costs the same at any depth.
+"""
+import base64
+import json
+import logging
+import threading
+from typing import List, Dict, Any, Optional
+
+from database import get_manager, init_db
+from models import Chunk
+from services.document_service import DocumentService
+
+logger = logging.getLogger(__name__)
+
+
+class ChunkStore:
+    """Bulk writes and keyset-paginated reads of persisted chunks"""
+    
+    DEFAULT_PAGE_SIZE = 50
+    MAX_PAGE_SIZE = 1000
+    
+    _schema_ready = False
+    _schema_lock = threading.Lock()
+    
+    @staticmethod
+    def _ensure_schema():
+        """Create the tables and indexes once per process"""
+        if ChunkStore._schema_ready:
+            return
+        with ChunkStore._schema_lock:
+            if not ChunkStore._schema_ready:
+                init_db()
+                ChunkStore._schema_ready = True
+    
+    @staticmethod
+    def save_run(chunks: List[Dict[str, Any]], strategy: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Persist the chunks of one chunking run in a single transaction
+        
+        Each document's earlier chunks for this strategy are replaced. The
+        chunk dicts get their doc_id / chunk_id filled in.
+        
+        Args:
+            chunks: Chunk dicts from ChunkingService (filename, position, text, len_chars)
+            strategy: Strategy name
+            params: Strategy params (stored as params_json)
+        
+        Returns:
+            Dict with the number of documents / chunks written and filename -> doc_id
+        """
+        ChunkStore._ensure_schema()
+        filenames = list(dict.fromkeys(chunk['filename'] for chunk in chunks))
+        if not filenames:
+            return {'strategy': strategy, 'documents': 0, 'chunks': 0, 'doc_ids': {}}
+        
+        # A document listed twice in one run is chunked twice: keep one chunk per position
+        unique_chunks = {}
+        for chunk in chunks:
+            unique_chunks.setdefault((chunk['filename'], chunk['position']), chunk)
+        
+        documents = {doc.filename: doc for doc in DocumentService.get_documents_by_filenames(filenames)}
+        params_json = json.dumps(params)
+        
+        document_rows = []
+        for filename in filenames:
+            doc = documents.get(filename)
+            document_rows.append(
+                (filename, doc.filepath, doc.num_lines, doc.num_chars, doc.file_size) if doc else (filename, '', 0, 0, 0)
+            )
+        
+        manager = get_manager()
+        with manager.transaction() as conn:
+            conn.executemany(
+                '''
+                INSERT INTO documents (filename, filepath, num_lines, num_chars, file_size)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(filename) DO UPDATE SET
+                    filepath = excluded.filepath,
+                    num_lines = excluded.num_lines,
+                    num_chars = excluded.num_chars,
+                    file_size = excluded.file_size,
+                    updated_at = CURRENT_TIMESTAMP
+                ''',
+                document_rows
+            )
+            # Same connection: fetch_in joins the open transaction
+            doc_ids = {
+                row['filename']: row['doc_id']
+                for row in manager.fetch_in('SELECT doc_id, filename FROM documents WHERE filename IN ({placeholders})', filenames)
+            }
+            
+            conn.executemany(
+                'DELETE FROM chunks WHERE doc_id = ? AND strategy = ?',
+                [(doc_ids[filename], strategy) for filename in filenames]
+            )
+            conn.executemany(
+                'INSERT INTO chunks (doc_id, strategy, params_json, position, text, len_chars) VALUES (?, ?, ?, ?, ?, ?)',
+                [
+                    (doc_ids[chunk['filename']], strategy, params_json, chunk['position'], chunk['text'], chunk['len_chars'])
+                    for chunk in unique_chunks.values()
+                ]
+            )
+            
+            # Read back the assigned ids through the (doc_id, strategy, position) index
+            chunk_ids = {}
+            for filename in filenames:
+                for row in conn.execute('SELECT chunk_id, position FROM chunks WHERE doc_id = ? AND strategy = ?',
+                                        (doc_ids[filename], strategy)):
+                    chunk_ids[(filename, row['position'])] = row['chunk_id']
+        
+        for chunk in chunks:
+            chunk['doc_id'] = doc_ids[chunk['filename']]
+            chunk['chunk_id'] = chunk_ids.get((chunk['filename'], chunk['position']))
+        
+        logger.info(f"Persisted {len(unique_chunks)} chunks of {len(filenames)} documents (strategy {strategy})")
+        return {'strategy': strategy, 'documents': len(filenames), 'chunks': len(unique_chunks), 'doc_ids': doc_ids}
+    
+    @staticmethod
+    def encode_cursor(doc_id: int, strategy: str, position: int) -> str:
+        """Opaque page cursor for the last row of a page"""
+        raw = json.dumps([doc_id, strategy, position], separators=(',', ':')).encode('utf-8')
+        return base64.urlsafe_b64encode(raw).decode('ascii')
+    
+    @staticmethod
+    def decode_cursor(cursor: str):
+        """(doc_id, strategy, position) from a page cursor"""
+        try:
+            doc_id, strategy, position = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+            return int(doc_id), str(strategy), int(position)
+        except (ValueError, TypeError) as e:
+            raise ValueError(f'Invalid cursor: {cursor}') from e
+    
+    @staticmethod
+    def list_chunks(filename: Optional[str] = None, doc_id: Optional[int] = None, strategy: Optional[str] = None,
+                    cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE) -> Dict[str, Any]:
+        """
+        One page of persisted chunks, ordered by (doc_id, strategy, position)
+        
+        Args:
+            filename: Only chunks of this document
+            doc_id: Only chunks of this document id
+            strategy: Only chunks of this strategy
+            cursor: next_cursor of the previous page
+            limit: Page size (capped at MAX_PAGE_SIZE)
+        
+        Returns:
+            Dict with chunks and next_cursor (None on the last page)
+        """
+        ChunkStore._ensure_schema()
+        limit = max(1, min(int(limit), ChunkStore.MAX_PAGE_SIZE))
+        
+        conditions = []
+        args: List[Any] = []
+        if filename is not None:
+            conditions.append('d.filename = ?')
+            args.append(filename)
+        if doc_id is not None:
+            conditions.append('c.doc_id = ?')
+            args.append(int(doc_id))
+        if strategy is not None:
+            # Equality on strategy: seek (strategy, doc_id, position)
+            conditions.append('c.strategy = ?')
+            args.append(strategy)
+        if cursor:
+            last_doc_id, last_strategy, last_position = ChunkStore.decode_cursor(cursor)
+            if strategy is not None:
+                conditions.append('(c.doc_id, c.position) > (?, ?)')
+                args.extend([last_doc_id, last_position])
+            else:
+                conditions.append('(c.doc_id, c.strategy, c.position) > (?, ?, ?)')
+                args.extend([last_doc_id, last_strategy, last_position])
+        
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        order = 'c.doc_id, c.position' if strategy is not None else 'c.doc_id, c.strategy, c.position'
+        query = f'''
+            SELECT c.chunk_id, c.doc_id, d.filename, c.strategy, c.params_json, c.position, c.text, c.len_chars, c.created_at
+            FROM chunks c JOIN documents d ON d.doc_id = c.doc_id
+            {where}
+            ORDER BY {order}
+            LIMIT ?
+        '''
+        
+        rows = get_manager().fetch_all(query, args + [limit + 1])
+        
+        chunks = []
+        for row in rows[:limit]:
+            chunk = Chunk.from_row(row).to_dict()
+            chunk['filename'] = row['filename']
+            chunks.append(chunk)
+        
+        next_cursor = None
+        if len(rows) > limit:
+            last = chunks[-1]
+            next_cursor = ChunkStore.encode_cursor(last['doc_id'], last['strategy'], last['position'])
+        return {'chunks': chunks, 'limit': limit, 'next_cursor': next_cursor}
@@ -2,9 +2,10 @@
 Chunking Service - Handle chunking with multiple strategies
 Works without database - returns chunks directly
 """
+import os
 import re
 import json
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterator, Tuple
 import logging
 
 import sys
@@ -15,6 +16,8 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from models import Chunk
 from services.document_service import DocumentService
+from services.job_service import JobService
+from services.vector_math import VectorMath
 from config import (
     OLLAMA_BASE_URL, OLLAMA_MODEL, OLLAMA_EMBEDDING_MODEL, OLLAMA_LLM_MODEL
 )
@@ -204,50 +207,9 @@ class ChunkingService:
     @staticmethod
     def _get_embeddings_ollama(texts: List[str], model: Optional[str] = None, base_url: Optional[str] = None) -> Optional[List[List[float]]]:
         """Get embeddings from Ollama API (local server at localhost:11434)"""
-        if not HAS_REQUESTS:
-            return None
-        
-        # Use default config if not provided
-        if model is None:
-            model = OLLAMA_EMBEDDING_MODEL
-        if base_url is None:
-            base_url = OLLAMA_BASE_URL
-        
-        try:
-            # Ollama local API endpoint
-            url = f"{base_url.rstrip('/')}/api/embeddings"
-            
-            embeddings = []
-            
-            for i, text in enumerate(texts):
-                try:
-                    # Ollama local API format
-                    payload = {
-                        "model": model,
-                        "prompt": text
-                    }
-                    
-                    response = requests.post(url, json=payload, timeout=60)
-                    if response.status_code == 200:
-                        data = response.json()
-                        embedding = data.get("embedding", [])
-                        
-                        if embedding:
-                            embeddings.append(embedding)
-                        else:
-                            logger.warning(f"Ollama returned empty embedding for text {i}")
-                            return None
-                    else:
-                        logger.warning(f"Ollama API error: {response.status_code} - {response.text}")
-                        return None
-                except requests.exceptions.RequestException as e:
-                    logger.warning(f"Ollama request error: {e}")
-                    return None
-            
-            return embeddings if len(embeddings) == len(texts) else None
-        except Exception as e:
-            logger.warning(f"Ollama API not available: {e}")
-            return None
+        # Shares EmbeddingService's request coalescing: repeated sentences are embedded once
+        from services.embedding_service import EmbeddingService
+        return EmbeddingService.get_embeddings_ollama(texts, model=model, base_url=base_url)
     
     @staticmethod
     def _get_embeddings_sentence_transformers(texts: List[str]) -> Optional[List[List[float]]]:
@@ -265,27 +227,6 @@ class ChunkingService:
             logger.warning(f"Sentence transformers not available: {e}")
             return None
     
-    @staticmethod
-    def _cosine_similarity(vec1: List[float], vec2: List[float]) -> float:
-        """Calculate cosine similarity between 2 vectors"""
-        if not HAS_NUMPY:
-            # Fallback calculation without numpy
-            dot_product = sum(a * b for a, b in zip(vec1, vec2))
-            magnitude1 = sum(a * a for a in vec1) ** 0.5
-            magnitude2 = sum(b * b for b in vec2) ** 0.5
-            if magnitude1 == 0 or magnitude2 == 0:
-                return 0.0
-            return dot_product / (magnitude1 * magnitude2)
-        else:
-            vec1_np = np.array(vec1)
-            vec2_np = np.array(vec2)
-            dot_product = np.dot(vec1_np, vec2_np)
-            magnitude1 = np.linalg.norm(vec1_np)
-            magnitude2 = np.linalg.norm(vec2_np)
-            if magnitude1 == 0 or magnitude2 == 0:
-                return 0.0
-            return float(dot_product / (magnitude1 * magnitude2))
-    
     @staticmethod
     def semantic_chunk(text: str, chunk_size: int = 500, model: str = "ollama", ollama_model: Optional[str] = None) -> List[str]:
         """
@@ -294,7 +235,7 @@ class ChunkingService:
         Args:
             text: Text to chunk
             chunk_size: Desired chunk size (characters)
-            model: "ollama" (default) or "sentence-transformers" (fallback)
+            model: "ollama" (default), "sentence-transformers" (fallback) or "hashing" (offline)
             ollama_model: Specific model name (if not using default from config)
         
         Returns:
@@ -322,14 +263,19 @@ class ChunkingService:
             # Get embeddings - prioritize Ollama (default)
             embeddings = None
             
+            # Deterministic local embeddings, no server or model download
+            if model.lower() == "hashing":
+                from services.embedding_service import EmbeddingService
+                embeddings = EmbeddingService.get_embeddings_hashing(proper_sentences)
+            
             # If ollama selected (default), try connecting to Ollama server
-            if model.lower() == "ollama" or model.lower() != "sentence-transformers":
-                logger.info(f"Using Ollama at {OLLAMA_BASE_URL}")
-                use_model = ollama_model or OLLAMA_EMBEDDING_MODEL
+            elif model.lower() == "ollama" or model.lower() != "sentence-transformers":
+                base_url = os.getenv('OLLAMA_BASE_URL', OLLAMA_BASE_URL)
+                logger.info(f"Using Ollama at {base_url}")
                 embeddings = ChunkingService._get_embeddings_ollama(
                     proper_sentences, 
-                    model=use_model,
-                    base_url=OLLAMA_BASE_URL
+                    model=ollama_model,
+                    base_url=base_url
                 )
                 
                 # If ollama fails, fallback to sentence-transformers
@@ -351,11 +297,15 @@ class ChunkingService:
                 logger.info("No embeddings available, using simple semantic chunking")
                 return ChunkingService._semantic_chunk_simple(text, chunk_size)
             
-            # Calculate similarity between consecutive sentences
-            similarities = []
-            for i in range(len(embeddings) - 1):
-                sim = ChunkingService._cosine_similarity(embeddings[i], embeddings[i + 1])
-                similarities.append(sim)
+            # Calculate similarity between consecutive sentences (normalized once, then dot products)
+            if HAS_NUMPY:
+                unit_embeddings, _ = VectorMath.normalize_rows(embeddings)
+                similarities = VectorMath.adjacent_similarities(unit_embeddings)
+            else:
+                similarities = [
+                    VectorMath.cosine(embeddings[i], embeddings[i + 1])
+                    for i in range(len(embeddings) - 1)
+                ]
             
             # Split chunks based on similarity and size
             chunks = []
@@ -530,12 +480,18 @@ class ChunkingService:
         logger.info(f"Created {len(chunks)} chunks for {filename} with strategy {strategy}")
         return chunks
     
+    @staticmethod
+    def iter_document_chunks(filenames: List[str], strategy: str, params: Dict[str, Any]) -> Iterator[Tuple[str, List[Dict[str, Any]]]]:
+        """Chunk documents one at a time - yields (filename, chunks) as each document is done"""
+        for i, filename in enumerate(filenames):
+            JobService.report_progress(i, len(filenames), f'Chunking {filename}')
+            yield filename, ChunkingService.chunk_document(filename, strategy, params)
+    
     @staticmethod
     def chunk_multiple_documents(filenames: List[str], strategy: str, params: Dict[str, Any]) -> List[Dict[str, Any]]:
         """Chunk multiple documents - returns chunks as dicts (no database)"""
         all_chunks = []
-        for filename in filenames:
-            chunks = ChunkingService.chunk_document(filename, strategy, params)
+        for _, chunks in ChunkingService.iter_document_chunks(filenames, strategy, params):
             all_chunks.extend(chunks)
         return all_chunks
     
@@ -546,7 +502,13 @@ class ChunkingService:
         
         Based on the guide: "Evaluating Embedding Quality Before Ingesting into Vector Database"
         """
-        if not chunks:
+        lengths = [chunk.get('len_chars', len(chunk.get('text', ''))) for chunk in chunks]
+        return ChunkingService.get_length_statistics(lengths)
+    
+    @staticmethod
+    def get_length_statistics(lengths: List[int]) -> Dict[str, Any]:
+        """Chunk statistics from chunk lengths alone (streamed runs keep only the lengths)"""
+        if not lengths:
             return {
                 'total_chunks': 0,
                 'avg_len': 0,
@@ -556,12 +518,10 @@ class ChunkingService:
                 'std_len': 0
             }
         
-        lengths = [chunk.get('len_chars', len(chunk.get('text', ''))) for chunk in chunks]
-        
-        if HAS_NUMPY and lengths:
+        if HAS_NUMPY:
             lengths_array = np.array(lengths)
             return {
-                'total_chunks': len(chunks),
+                'total_chunks': len(lengths),
                 'avg_len': round(float(np.mean(lengths_array)), 2),
                 'min_len': int(np.min(lengths_array)),
                 'max_len': int(np.max(lengths_array)),
@@ -570,9 +530,9 @@ class ChunkingService:
             }
         else:
             # Fallback without numpy
-            sorted_lengths = sorted(lengths) if lengths else []
+            sorted_lengths = sorted(lengths)
             return {
-                'total_chunks': len(chunks),
+                'total_chunks': len(lengths),
                 'avg_len': round(sum(lengths) / len(lengths), 2) if lengths else 0,
                 'min_len': min(lengths) if lengths else 0,
                 'max_len': max(lengths) if lengths else 0,
@@ -613,4 +573,4 @@ class ChunkingService:
                 'score': None,
                 'error': str(e)
             }
-    
+
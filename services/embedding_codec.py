@@ -0,0 +1,192 @@
+"""
+Embedding Codec - Compact binary transport for embedding matrices
+
+Formats (negotiated via Content-Type / Accept):
+- application/x-embedding-f32: 12-byte header ('EMB1' magic, uint32 rows, uint32 dim,
+  little-endian) followed by rows * dim little-endian float32 values
+- application/x-npy: NumPy .npy file
+
+Either format may be gzip-compressed (Content-Encoding: gzip); compressed bodies
+are inflated through a capped stream, so they cannot expand past the request
+size limit. Uncompressed payloads are decoded zero-copy with np.frombuffer.
+"""
+import gzip
+import io
+import logging
+import struct
+import zlib
+from typing import Optional, Dict, Any
+
+logger = logging.getLogger(__name__)
+
+# Optional dependencies
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+    logger.warning("numpy not available, binary embedding transport will not work")
+
+
+class EmbeddingCodec:
+    """Encode / decode embedding matrices for the HTTP API"""
+    
+    MIME_F32 = 'application/x-embedding-f32'
+    MIME_NPY = 'application/x-npy'
+    BINARY_MIMETYPES = (MIME_F32, MIME_NPY)
+    
+    MAGIC = b'EMB1'
+    HEADER = struct.Struct('<4sII')  # magic, rows, dim
+    
+    @staticmethod
+    def is_binary_mimetype(mimetype: Optional[str]) -> bool:
+        """Check whether a (parameter-free) mimetype is one of the binary formats"""
+        return (mimetype or '').split(';')[0].strip().lower() in EmbeddingCodec.BINARY_MIMETYPES
+    
+    @staticmethod
+    def negotiate(accept_header: Optional[str]) -> Optional[str]:
+        """
+        Pick a binary response format from an Accept header
+        
+        Returns:
+            MIME_F32, MIME_NPY or None (client wants JSON)
+        """
+        if not accept_header:
+            return None
+        
+        for part in accept_header.split(','):
+            mimetype = part.split(';')[0].strip().lower()
+            if mimetype in EmbeddingCodec.BINARY_MIMETYPES:
+                return mimetype
+        return None
+    
+    @staticmethod
+    def gunzip(body: bytes, max_size: int) -> bytes:
+        """
+        Decompress a gzip body, reading at most max_size bytes of output
+        
+        Raises:
+            ValueError: If the body is not valid gzip or inflates past max_size
+        """
+        try:
+            with gzip.GzipFile(fileobj=io.BytesIO(body)) as stream:
+                data = stream.read(max_size + 1)
+        except (OSError, EOFError, zlib.error) as e:
+            raise ValueError(f'Invalid gzip payload: {e}') from e
+        
+        if len(data) > max_size:
+            raise ValueError(f'Decompressed embedding payload exceeds {max_size} bytes')
+        return data
+    
+    @staticmethod
+    def decode(body: bytes, mimetype: str, content_encoding: Optional[str] = None,
+               max_size: Optional[int] = None):
+        """
+        Decode a binary payload into a float32 matrix of shape (rows, dim)
+        
+        Uncompressed payloads are wrapped without copying, so the result is
+        read-only; callers that need to mutate it must copy first.
+        
+        Args:
+            body: Request body or multipart part
+            mimetype: MIME_F32 or MIME_NPY
+            content_encoding: 'gzip' for compressed bodies
+            max_size: Largest decompressed size in bytes (default: MAX_CONTENT_LENGTH_MB)
+        
+        Raises:
+            ValueError: If the payload is malformed or the format is unknown
+        """
+        from config import MAX_CONTENT_LENGTH_MB
+        
+        if not HAS_NUMPY:
+            raise ValueError('numpy not available')
+        
+        if content_encoding and content_encoding.strip().lower() == 'gzip':
+            body = EmbeddingCodec.gunzip(body, max_size or MAX_CONTENT_LENGTH_MB * 1024 * 1024)
+        
+        mimetype = (mimetype or '').split(';')[0].strip().lower()
+        
+        if mimetype == EmbeddingCodec.MIME_F32:
+            if len(body) < EmbeddingCodec.HEADER.size:
+                raise ValueError('Embedding payload too short for header')
+            
+            magic, rows, dim = EmbeddingCodec.HEADER.unpack_from(body, 0)
+            if magic != EmbeddingCodec.MAGIC:
+                raise ValueError('Invalid embedding payload magic')
+            
+            expected = EmbeddingCodec.HEADER.size + rows * dim * 4
+            if len(body) != expected:
+                raise ValueError(f'Embedding payload size mismatch: expected {expected} bytes, got {len(body)}')
+            
+            return np.frombuffer(body, dtype='<f4', count=rows * dim,
+                                 offset=EmbeddingCodec.HEADER.size).reshape(rows, dim)
+        
+        if mimetype == EmbeddingCodec.MIME_NPY:
+            stream = io.BytesIO(body)
+            version = np.lib.format.read_magic(stream)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(stream)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(stream)
+            
+            if dtype.hasobject:
+                raise ValueError('Object arrays are not allowed')
+            
+            count = int(np.prod(shape)) if shape else 1
+            matrix = np.frombuffer(body, dtype=dtype, count=count, offset=stream.tell())
+            matrix = matrix.reshape(shape, order='F' if fortran_order else 'C')
+            if matrix.ndim == 1:
+                matrix = matrix.reshape(1, -1)
+            if matrix.ndim != 2:
+                raise ValueError(f'Expected 2-D embedding matrix, got shape {shape}')
+            
+            # No copy when the sender already used little-endian float32
+            return matrix.astype('<f4', copy=False)
+        
+        raise ValueError(f'Unsupported embedding content type: {mimetype}')
+    
+    @staticmethod
+    def encode(matrix, mimetype: str = MIME_F32, compress: bool = False) -> bytes:
+        """
+        Encode a matrix (or list of vectors) as float32 in the given format
+        
+        Args:
+            matrix: 2-D array-like of embeddings
+            mimetype: MIME_F32 or MIME_NPY
+            compress: gzip the result (caller sets Content-Encoding: gzip)
+        """
+        if not HAS_NUMPY:
+            raise ValueError('numpy not available')
+        
+        matrix = np.asarray(matrix, dtype='<f4')
+        if matrix.ndim == 1:
+            matrix = matrix.reshape(1, -1)
+        matrix = np.ascontiguousarray(matrix)
+        
+        if mimetype == EmbeddingCodec.MIME_F32:
+            rows, dim = matrix.shape
+            body = EmbeddingCodec.HEADER.pack(EmbeddingCodec.MAGIC, rows, dim) + matrix.tobytes()
+        elif mimetype == EmbeddingCodec.MIME_NPY:
+            stream = io.BytesIO()
+            np.save(stream, matrix, allow_pickle=False)
+            body = stream.getvalue()
+        else:
+            raise ValueError(f'Unsupported embedding content type: {mimetype}')
+        
+        if compress:
+            body = gzip.compress(body, compresslevel=1)
+        
+        return body
+    
+    @staticmethod
+    def response_headers(matrix, mimetype: str, compress: bool = False) -> Dict[str, Any]:
+        """Headers describing an encoded embedding response"""
+        headers = {
+            'Content-Type': mimetype,
+            'X-Embedding-Count': str(len(matrix)),
+            'X-Embedding-Dim': str(len(matrix[0]) if len(matrix) else 0),
+            'X-Embedding-Dtype': 'float32'
+        }
+        if compress:
+            headers['Content-Encoding'] = 'gzip'
+        return headers
@@ -0,0 +1,241 @@
+"""
+Embedding Scheduler - Priority admission control in front of embedding backends
+
+Each backend (an Ollama server or load-balanced set of servers, the
+sentence-transformers model) gets one scheduler that allows at most
+`max_in_flight` backend calls at a time. Callers
+wait for a slot in one of two priority classes:
+- interactive: query embeddings (retrieval tab); may use every slot
+- bulk: chunk embedding / semantic chunking; may only use
+  max_in_flight - interactive_reserved slots, so an interactive call never waits
+  behind a full pipe of bulk calls
+
+Interactive waiters go first, but after `interactive_burst` consecutive
+interactive grants with bulk waiting, one bulk call is admitted. Within a
+class, waiters are served round-robin per flow (one flow per request / job), so
+one large bulk request cannot starve another.
+
+The priority and flow are taken from the calling thread (see priority()), so
+backend code only needs `with scheduler.slot(): ...`.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, Hashable
+
+from config import EMBEDDING_MAX_IN_FLIGHT, EMBEDDING_INTERACTIVE_RESERVED, EMBEDDING_INTERACTIVE_BURST
+from services.job_service import JobService
+
+logger = logging.getLogger(__name__)
+
+# Optional dependencies
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+
+class EmbeddingScheduler:
+    """Slot-based admission control with interactive / bulk priority classes"""
+    
+    PRIORITIES = ('interactive', 'bulk')
+    DEFAULT_PRIORITY = 'bulk'
+    
+    # Recent waits kept per class for percentiles
+    WAIT_SAMPLES = 2048
+    
+    # backend name -> scheduler
+    _schedulers: Dict[str, 'EmbeddingScheduler'] = {}
+    _registry_lock = threading.Lock()
+    # Priority / flow of the calling thread
+    _context = threading.local()
+    
+    def __init__(self, name: str, max_in_flight: int = 4, interactive_reserved: int = 1, interactive_burst: int = 8):
+        """
+        Args:
+            name: Backend name (for stats)
+            max_in_flight: Concurrent backend calls allowed
+            interactive_reserved: Slots bulk calls may not use
+            interactive_burst: Interactive grants in a row before a waiting bulk call is admitted
+        """
+        self.name = name
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.interactive_reserved = min(max(0, int(interactive_reserved)), self.max_in_flight - 1)
+        self.interactive_burst = max(1, int(interactive_burst))
+        
+        self._cond = threading.Condition()
+        # priority -> flow -> waiting tickets (flows in round-robin order)
+        self._queues = {priority: OrderedDict() for priority in EmbeddingScheduler.PRIORITIES}
+        self._waiting = {priority: 0 for priority in EmbeddingScheduler.PRIORITIES}
+        self._in_flight = {priority: 0 for priority in EmbeddingScheduler.PRIORITIES}
+        self._burst = 0
+        self._stats = {
+            priority: {'granted': 0, 'completed': 0, 'peak_waiting': 0}
+            for priority in EmbeddingScheduler.PRIORITIES
+        }
+        self._waits = {priority: deque(maxlen=EmbeddingScheduler.WAIT_SAMPLES) for priority in EmbeddingScheduler.PRIORITIES}
+        self._peak_in_flight = 0
+    
+    @staticmethod
+    def for_backend(name: str, max_in_flight: Optional[int] = None) -> 'EmbeddingScheduler':
+        """
+        Shared scheduler of a backend, created with the configured limits
+        
+        Args:
+            name: Backend name
+            max_in_flight: Slots when first created (default: EMBEDDING_MAX_IN_FLIGHT)
+        """
+        with EmbeddingScheduler._registry_lock:
+            scheduler = EmbeddingScheduler._schedulers.get(name)
+            if scheduler is None:
+                scheduler = EmbeddingScheduler(
+                    name, max_in_flight or EMBEDDING_MAX_IN_FLIGHT, EMBEDDING_INTERACTIVE_RESERVED, EMBEDDING_INTERACTIVE_BURST
+                )
+                EmbeddingScheduler._schedulers[name] = scheduler
+            return scheduler
+    
+    @staticmethod
+    @contextmanager
+    def priority(priority: str, flow: Optional[Hashable] = None):
+        """Run the block's backend calls in a priority class (and optionally a named flow)"""
+        if priority not in EmbeddingScheduler.PRIORITIES:
+            raise ValueError(f"Unknown priority: {priority}")
+        previous = (getattr(EmbeddingScheduler._context, 'priority', None), getattr(EmbeddingScheduler._context, 'flow', None))
+        EmbeddingScheduler._context.priority = priority
+        EmbeddingScheduler._context.flow = flow if flow is not None else previous[1]
+        try:
+            yield
+        finally:
+            EmbeddingScheduler._context.priority, EmbeddingScheduler._context.flow = previous
+    
+    @staticmethod
+    def current_priority() -> str:
+        return getattr(EmbeddingScheduler._context, 'priority', None) or EmbeddingScheduler.DEFAULT_PRIORITY
+    
+    @staticmethod
+    def current_flow() -> Hashable:
+        """Flow of the calling thread: explicit flow, else its job, else the thread (one request)"""
+        flow = getattr(EmbeddingScheduler._context, 'flow', None)
+        if flow is not None:
+            return flow
+        job = JobService.current_job()
+        return job.job_id if job is not None else threading.get_ident()
+    
+    def _bulk_capacity(self) -> int:
+        return self.max_in_flight - self.interactive_reserved
+    
+    def _select_locked(self):
+        """(priority, flow) whose head ticket should be admitted next, or None"""
+        if sum(self._in_flight.values()) >= self.max_in_flight:
+            return None
+        interactive = self._queues['interactive']
+        bulk_eligible = bool(self._queues['bulk']) and self._in_flight['bulk'] < self._bulk_capacity()
+        if interactive and not (bulk_eligible and self._burst >= self.interactive_burst):
+            return 'interactive', next(iter(interactive))
+        if bulk_eligible:
+            return 'bulk', next(iter(self._queues['bulk']))
+        return None
+    
+    def _grant_locked(self, priority: str, flow):
+        queue = self._queues[priority]
+        tickets = queue[flow]
+        tickets.popleft()
+        if tickets:
+            queue.move_to_end(flow)
+        else:
+            del queue[flow]
+        self._waiting[priority] -= 1
+        self._in_flight[priority] += 1
+        self._peak_in_flight = max(self._peak_in_flight, sum(self._in_flight.values()))
+        self._stats[priority]['granted'] += 1
+        if priority == 'interactive':
+            self._burst = self._burst + 1 if self._queues['bulk'] else 0
+        else:
+            self._burst = 0
+    
+    def _remove_locked(self, priority: str, flow, ticket):
+        tickets = self._queues[priority].get(flow)
+        if tickets and ticket in tickets:
+            tickets.remove(ticket)
+            self._waiting[priority] -= 1
+            if not tickets:
+                del self._queues[priority][flow]
+    
+    @contextmanager
+    def slot(self, priority: Optional[str] = None, flow: Optional[Hashable] = None):
+        """
+        Hold one backend slot for the duration of the block
+        
+        Args:
+            priority: 'interactive' or 'bulk' (default: the calling thread's priority)
+            flow: Fair-sharing group (default: the calling thread's request / job)
+        """
+        priority = priority or EmbeddingScheduler.current_priority()
+        flow = flow if flow is not None else EmbeddingScheduler.current_flow()
+        ticket = object()
+        enqueued = time.perf_counter()
+        
+        with self._cond:
+            self._queues[priority].setdefault(flow, deque()).append(ticket)
+            self._waiting[priority] += 1
+            stats = self._stats[priority]
+            stats['peak_waiting'] = max(stats['peak_waiting'], self._waiting[priority])
+            try:
+                while True:
+                    selected = self._select_locked()
+                    if selected == (priority, flow) and self._queues[priority][flow][0] is ticket:
+                        break
+                    self._cond.wait(0.5)
+                    JobService.check_cancelled()
+            except BaseException:
+                self._remove_locked(priority, flow, ticket)
+                self._cond.notify_all()
+                raise
+            self._grant_locked(priority, flow)
+            self._waits[priority].append(time.perf_counter() - enqueued)
+            # Another waiter may be admissible too
+            self._cond.notify_all()
+        
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._in_flight[priority] -= 1
+                self._stats[priority]['completed'] += 1
+                self._cond.notify_all()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Queue depths, in-flight calls and wait-time percentiles per priority class"""
+        with self._cond:
+            classes = {}
+            for priority in EmbeddingScheduler.PRIORITIES:
+                waits = list(self._waits[priority])
+                classes[priority] = dict(self._stats[priority])
+                classes[priority].update({
+                    'waiting': self._waiting[priority],
+                    'flows_waiting': len(self._queues[priority]),
+                    'in_flight': self._in_flight[priority]
+                })
+                for q in (50, 95, 99):
+                    if waits and HAS_NUMPY:
+                        classes[priority][f'wait_p{q}_ms'] = round(float(np.percentile(waits, q)) * 1000, 3)
+                    else:
+                        classes[priority][f'wait_p{q}_ms'] = None
+            return {
+                'backend': self.name,
+                'max_in_flight': self.max_in_flight,
+                'bulk_capacity': self._bulk_capacity(),
+                'interactive_burst': self.interactive_burst,
+                'in_flight': sum(self._in_flight.values()),
+                'peak_in_flight': self._peak_in_flight,
+                'classes': classes
+            }
+    
+    @staticmethod
+    def get_all_stats() -> Dict[str, Any]:
+        with EmbeddingScheduler._registry_lock:
+            schedulers = list(EmbeddingScheduler._schedulers.values())
+        return {scheduler.name: scheduler.stats() for scheduler in schedulers}
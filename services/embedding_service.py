@@ -2,7 +2,20 @@
 Embedding Service - Generate embeddings and evaluate embedding quality
 """
 import logging
-from typing import List, Dict, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Optional, Tuple, Iterator, Callable
+
+from config import (
+    QUERY_VECTOR_CACHE_SIZE, EMBEDDING_MAX_IN_FLIGHT, OLLAMA_REQUEST_PARALLELISM,
+    EMBEDDING_BATCH_MAX_CHARS, EMBEDDING_BATCH_MAX_ITEMS
+)
+from services.query_cache import QueryCache
+from services.hashing_embedder import HashingEmbedder
+from services.job_service import JobService
+from services.singleflight import SingleFlight
+from services.embedding_scheduler import EmbeddingScheduler
+from services.ollama_balancer import OllamaBalancer
+from services.vector_math import VectorMath
 
 logger = logging.getLogger(__name__)
 
@@ -23,7 +36,6 @@ except ImportError:
 
 try:
     from sklearn.metrics import silhouette_score, davies_bouldin_score, calinski_harabasz_score
-    from sklearn.metrics.pairwise import cosine_distances
     from sklearn.cluster import KMeans
     HAS_SKLEARN = True
 except ImportError:
@@ -41,75 +53,240 @@ except ImportError:
 class EmbeddingService:
     """Service for generating embeddings and evaluating embedding quality"""
     
+    # (method, model, query text) -> query vector, so repeated queries are not re-embedded
+    _query_vector_cache = QueryCache('query_vectors', QUERY_VECTOR_CACHE_SIZE)
+    
+    # (backend, model, text) -> in-flight embedding, shared by concurrent requests
+    _embedding_flight = SingleFlight('embeddings')
+    
+    # Ollama server sets answering 404 on /api/embed (served through /api/embeddings instead)
+    _ollama_legacy_servers = set()
+    
     @staticmethod
     def get_embeddings_ollama(texts: List[str], model: Optional[str] = None, base_url: Optional[str] = None) -> Optional[List[List[float]]]:
-        """Get embeddings from Ollama API"""
+        """
+        Get embeddings from Ollama API
+        
+        Identical texts are embedded once, and texts already being embedded by a
+        concurrent request (same model) are joined instead of sent again.
+        """
         if not HAS_REQUESTS:
             return None
         
+        import os
+        from config import OLLAMA_BASE_URL, OLLAMA_EMBEDDING_MODEL
+        
+        if base_url is None:
+            base_url = os.getenv('OLLAMA_BASE_URL', OLLAMA_BASE_URL)
+        if model is None:
+            model = os.getenv('OLLAMA_EMBEDDING_MODEL', OLLAMA_EMBEDDING_MODEL)
+        
+        return EmbeddingService._embedding_flight.run_batch(
+            [('ollama', model, text) for text in texts],
+            lambda keys: EmbeddingService._request_ollama_embeddings([key[2] for key in keys], model, base_url)
+        )
+    
+    @staticmethod
+    def plan_batches(texts: List[str], max_chars: Optional[int] = None, max_items: Optional[int] = None) -> List[List[int]]:
+        """
+        Group texts into length-sorted batches sized by a character budget
+        
+        Texts are sorted by length, so each batch holds texts of similar length
+        (little padding), and a batch grows while its padded size (longest text
+        x number of texts) stays within max_chars and it has at most max_items texts.
+        
+        Args:
+            texts: Texts to embed
+            max_chars: Padded characters per batch (default: EMBEDDING_BATCH_MAX_CHARS)
+            max_items: Texts per batch (default: EMBEDDING_BATCH_MAX_ITEMS)
+        
+        Returns:
+            Batches of indices into texts, shortest texts first
+        """
+        max_chars = max_chars or EMBEDDING_BATCH_MAX_CHARS
+        max_items = max(1, max_items or EMBEDDING_BATCH_MAX_ITEMS)
+        
+        batches = []
+        current = []
+        for i in sorted(range(len(texts)), key=lambda i: len(texts[i])):
+            # Sorted, so this text is the longest of the batch
+            length = max(len(texts[i]), 1)
+            if current and (len(current) >= max_items or length * (len(current) + 1) > max_chars):
+                batches.append(current)
+                current = []
+            current.append(i)
+        if current:
+            batches.append(current)
+        return batches
+    
+    @staticmethod
+    def _embed_in_batches(texts: List[str], embed_batch: Callable[[List[str]], Optional[List[List[float]]]],
+                          parallelism: int = 1, label: str = '') -> Optional[List[List[float]]]:
+        """
+        Embed texts batch by batch (see plan_batches) and return the vectors in input order
+        
+        Args:
+            texts: Texts to embed
+            embed_batch: Embeds one batch of texts, None on failure
+            parallelism: Batches embedded at once
+            label: Backend name for progress messages
+        
+        Returns:
+            One embedding per text, or None if any batch failed
+        """
+        batches = EmbeddingService.plan_batches(texts)
+        embeddings = [None] * len(texts)
+        
+        def run(batch: List[int]) -> Optional[List[List[float]]]:
+            vectors = embed_batch([texts[i] for i in batch])
+            if vectors is not None and len(vectors) != len(batch):
+                logger.warning(f"{label}: expected {len(batch)} embeddings, got {len(vectors)}")
+                return None
+            return vectors
+        
+        done = 0
+        if parallelism <= 1 or len(batches) == 1:
+            for batch in batches:
+                JobService.report_progress(done, len(texts), f'Embedding texts {done + 1}-{done + len(batch)}/{len(texts)} with {label}')
+                vectors = run(batch)
+                if vectors is None:
+                    return None
+                for i, vector in zip(batch, vectors):
+                    embeddings[i] = vector
+                done += len(batch)
+            return embeddings
+        
+        executor = ThreadPoolExecutor(max_workers=min(parallelism, len(batches)), thread_name_prefix='embed')
         try:
-            import os
-            from config import OLLAMA_BASE_URL, OLLAMA_EMBEDDING_MODEL
-            
-            if base_url is None:
-                base_url = os.getenv('OLLAMA_BASE_URL', OLLAMA_BASE_URL)
-            if model is None:
-                model = os.getenv('OLLAMA_EMBEDDING_MODEL', OLLAMA_EMBEDDING_MODEL)
-            
-            url = f"{base_url.rstrip('/')}/api/embeddings"
-            
-            embeddings = []
-            
-            for i, text in enumerate(texts):
-                try:
+            futures = {executor.submit(run, batch): batch for batch in batches}
+            for future in as_completed(futures):
+                vectors = future.result()
+                if vectors is None:
+                    return None
+                for i, vector in zip(futures[future], vectors):
+                    embeddings[i] = vector
+                done += len(futures[future])
+                JobService.report_progress(done, len(texts), f'Embedded {done}/{len(texts)} texts with {label}')
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+        return embeddings
+    
+    @staticmethod
+    def _request_ollama_embeddings(texts: List[str], model: str, base_url: str) -> Optional[List[List[float]]]:
+        """
+        Embed texts with Ollama in length-sorted batches (one /api/embed call per batch)
+        
+        Calls are admitted by the scheduler of the server set, load balanced over
+        its servers (OLLAMA_BASE_URL may list several), and up to
+        OLLAMA_REQUEST_PARALLELISM of them (default: one per server) run at once.
+        Servers without /api/embed (Ollama < 0.3) get one /api/embeddings call per text.
+        """
+        try:
+            balancer = OllamaBalancer.for_url(base_url)
+            scheduler = EmbeddingScheduler.for_backend(
+                f"ollama:{balancer.name}", EMBEDDING_MAX_IN_FLIGHT * len(balancer.endpoints)
+            )
+            # Worker threads do not inherit the caller's priority / flow
+            priority, flow = EmbeddingScheduler.current_priority(), EmbeddingScheduler.current_flow()
+            
+            def embed_legacy(batch: List[str]) -> Optional[List[List[float]]]:
+                embeddings = []
+                for text in batch:
                     # Ollama local API format
                     payload = {
                         "model": model,
                         "prompt": text
                     }
-                    
-                    response = requests.post(url, json=payload, timeout=60)
-                    if response.status_code == 200:
-                        data = response.json()
-                        embedding = data.get("embedding", [])
-                        
-                        if embedding:
-                            embeddings.append(embedding)
-                        else:
-                            logger.warning(f"Ollama returned empty embedding for text {i}")
-                            return None
-                    else:
+                    response = balancer.post('/api/embeddings', payload, timeout=60)
+                    if response.status_code != 200:
                         logger.error(f"Ollama API error: {response.status_code} - {response.text}")
                         return None
+                    embedding = response.json().get("embedding", [])
+                    if not embedding:
+                        logger.warning("Ollama returned empty embedding")
+                        return None
+                    embeddings.append(embedding)
+                return embeddings
+            
+            def embed_batch(batch: List[str]) -> Optional[List[List[float]]]:
+                try:
+                    with scheduler.slot(priority, flow):
+                        if balancer.name in EmbeddingService._ollama_legacy_servers:
+                            return embed_legacy(batch)
+                        
+                        response = balancer.post('/api/embed', {"model": model, "input": batch}, timeout=120)
+                        if response.status_code == 404:
+                            # Unknown endpoint on old servers (or unknown model): retry the old API
+                            embeddings = embed_legacy(batch)
+                            if embeddings is not None:
+                                logger.info(f"Ollama at {balancer.name} has no /api/embed, using /api/embeddings")
+                                EmbeddingService._ollama_legacy_servers.add(balancer.name)
+                            return embeddings
                 except requests.exceptions.RequestException as e:
                     logger.warning(f"Ollama request error: {e}")
                     return None
+                if response.status_code != 200:
+                    logger.error(f"Ollama API error: {response.status_code} - {response.text}")
+                    return None
+                return response.json().get("embeddings") or None
             
-            return embeddings if len(embeddings) == len(texts) else None
+            parallelism = OLLAMA_REQUEST_PARALLELISM or len(balancer.endpoints)
+            return EmbeddingService._embed_in_batches(texts, embed_batch, parallelism, 'Ollama')
         except Exception as e:
             logger.error(f"Error getting embeddings from Ollama: {e}")
             return None
     
     @staticmethod
     def get_embeddings_sentence_transformers(texts: List[str], model: Optional[str] = None) -> Optional[List[List[float]]]:
-        """Get embeddings using sentence-transformers"""
+        """Get embeddings using sentence-transformers (duplicate / in-flight texts coalesced)"""
         if not HAS_SENTENCE_TRANSFORMERS:
             return None
         
+        if model is None:
+            model = "all-MiniLM-L6-v2"  # Default lightweight model
+        
+        return EmbeddingService._embedding_flight.run_batch(
+            [('sentence-transformers', model, text) for text in texts],
+            lambda keys: EmbeddingService._encode_sentence_transformers([key[2] for key in keys], model)
+        )
+    
+    @staticmethod
+    def _encode_sentence_transformers(texts: List[str], model: str) -> Optional[List[List[float]]]:
         try:
-            if model is None:
-                model = "all-MiniLM-L6-v2"  # Default lightweight model
-            
             logger.info(f"Loading sentence-transformers model: {model}")
             encoder = SentenceTransformer(model)
-            embeddings = encoder.encode(texts, show_progress_bar=False)
+            scheduler = EmbeddingScheduler.for_backend('sentence-transformers')
+            
+            def embed_batch(batch: List[str]) -> List[List[float]]:
+                # One slot per batch, so query embeddings can run between batches
+                with scheduler.slot():
+                    embeddings = encoder.encode(batch, batch_size=len(batch), show_progress_bar=False)
+                # Convert numpy array to list of lists
+                return embeddings.tolist()
             
-            # Convert numpy array to list of lists
-            return embeddings.tolist()
+            return EmbeddingService._embed_in_batches(texts, embed_batch, 1, 'sentence-transformers')
         except Exception as e:
             logger.error(f"Error getting embeddings from sentence-transformers: {e}")
             return None
     
+    @staticmethod
+    def get_hashing_embedder() -> HashingEmbedder:
+        """Deterministic local embedder configured by HASHING_EMBEDDING_DIM / HASHING_NGRAM_*"""
+        from config import HASHING_EMBEDDING_DIM, HASHING_NGRAM_MIN, HASHING_NGRAM_MAX
+        return HashingEmbedder(dim=HASHING_EMBEDDING_DIM, ngram_min=HASHING_NGRAM_MIN, ngram_max=HASHING_NGRAM_MAX)
+    
+    @staticmethod
+    def get_embeddings_hashing(texts: List[str]) -> Optional[List[List[float]]]:
+        """Get deterministic character n-gram hashing embeddings (offline, no model download)"""
+        if not HAS_NUMPY:
+            return None
+        
+        try:
+            return EmbeddingService.get_hashing_embedder().embed(texts).tolist()
+        except Exception as e:
+            logger.error(f"Error getting hashing embeddings: {e}")
+            return None
+    
     @staticmethod
     def get_embeddings(texts: List[str], model: Optional[str] = None, base_url: Optional[str] = None) -> Optional[List[List[float]]]:
         """Get embeddings with fallback mechanism"""
@@ -128,6 +305,132 @@ class EmbeddingService:
         logger.error("Failed to generate embeddings using any method")
         return None
     
+    @staticmethod
+    def embed_texts(texts: List[str], method: str = 'ollama') -> Optional[List[List[float]]]:
+        """
+        Embed texts with the requested method, falling back to get_embeddings
+        
+        Args:
+            texts: Texts to embed
+            method: 'ollama', 'sentence-transformers' or 'hashing'
+        
+        Returns:
+            One embedding per text, or None if every method failed
+        """
+        embeddings = None
+        if method == 'ollama':
+            embeddings = EmbeddingService.get_embeddings_ollama(texts)
+        elif method == 'sentence-transformers':
+            embeddings = EmbeddingService.get_embeddings_sentence_transformers(texts)
+        elif method == 'hashing':
+            embeddings = EmbeddingService.get_embeddings_hashing(texts)
+        if embeddings:
+            logger.info(f"Generated {len(embeddings)} embeddings using {method}")
+            return embeddings
+        
+        # Fallback to default if method-specific failed
+        return EmbeddingService.get_embeddings(texts)
+    
+    @staticmethod
+    def get_throughput(texts: List[str], seconds: float) -> Dict:
+        """Chunks/s and chars/s of an embedding run over texts that took seconds"""
+        chars = sum(len(text) for text in texts)
+        return {
+            'chunks': len(texts),
+            'chars': chars,
+            'seconds': round(seconds, 3),
+            'chunks_per_second': round(len(texts) / seconds, 2) if seconds > 0 else None,
+            'chars_per_second': round(chars / seconds, 1) if seconds > 0 else None
+        }
+    
+    @staticmethod
+    def iter_embedding_batches(texts: List[str], method: str = 'ollama',
+                               batch_size: int = 32) -> Iterator[Tuple[int, Optional[List[List[float]]]]]:
+        """
+        Embed texts batch by batch, so results can be sent before the whole set is done
+        
+        Yields:
+            (index of the batch's first text, embeddings of the batch or None on failure)
+        """
+        batch_size = max(1, int(batch_size))
+        for start in range(0, len(texts), batch_size):
+            JobService.report_progress(start, len(texts), f'Embedding texts {start + 1}-{min(start + batch_size, len(texts))}')
+            yield start, EmbeddingService.embed_texts(texts[start:start + batch_size], method)
+    
+    @staticmethod
+    def embed_query(text: str, method: str = 'ollama', model: Optional[str] = None) -> Tuple[Optional[List[float]], bool]:
+        """
+        Embed a query text, served from the query vector cache when possible
+        
+        Only vectors produced by the requested method are cached; fallback
+        embeddings (another model) are returned but not stored. Backend calls
+        run in the scheduler's interactive class, ahead of bulk embedding.
+        
+        Args:
+            text: Query text
+            method: 'ollama', 'sentence-transformers' or 'hashing'
+            model: Model name (default: the method's configured model)
+        
+        Returns:
+            Tuple of (embedding or None, whether it came from the cache)
+        """
+        import os
+        from config import OLLAMA_EMBEDDING_MODEL
+        
+        if model is None:
+            if method == 'ollama':
+                model = os.getenv('OLLAMA_EMBEDDING_MODEL', OLLAMA_EMBEDDING_MODEL)
+            elif method == 'hashing':
+                model = EmbeddingService.get_hashing_embedder().model_name
+            else:
+                model = "all-MiniLM-L6-v2"
+        
+        key = (method, model, text)
+        embedding = EmbeddingService._query_vector_cache.get(key)
+        if embedding is not None:
+            return embedding, True
+        
+        with EmbeddingScheduler.priority('interactive'):
+            embeddings = None
+            if method == 'ollama':
+                embeddings = EmbeddingService.get_embeddings_ollama([text], model)
+            elif method == 'sentence-transformers':
+                embeddings = EmbeddingService.get_embeddings_sentence_transformers([text], model)
+            elif method == 'hashing':
+                embeddings = EmbeddingService.get_embeddings_hashing([text])
+            
+            if embeddings:
+                EmbeddingService._query_vector_cache.put(key, embeddings[0])
+                return embeddings[0], False
+            
+            embeddings = EmbeddingService.get_embeddings([text])
+            return (embeddings[0] if embeddings else None), False
+    
+    @staticmethod
+    def get_query_cache_info() -> Dict:
+        """Hit-rate statistics of the query vector cache"""
+        return EmbeddingService._query_vector_cache.stats()
+    
+    @staticmethod
+    def clear_query_cache() -> None:
+        """Drop all cached query vectors"""
+        EmbeddingService._query_vector_cache.clear()
+    
+    @staticmethod
+    def get_coalescing_info() -> Dict:
+        """Texts requested vs actually embedded (in-batch duplicates and joined in-flight work)"""
+        return EmbeddingService._embedding_flight.stats()
+    
+    @staticmethod
+    def get_scheduler_info() -> Dict:
+        """Queue depths, in-flight calls and wait times per backend and priority class"""
+        return EmbeddingScheduler.get_all_stats()
+    
+    @staticmethod
+    def get_balancer_info() -> Dict:
+        """Health, outstanding requests and latency of each Ollama server"""
+        return OllamaBalancer.get_all_stats()
+    
     @staticmethod
     def get_embedding_quality_level(metric: str, score: float) -> str:
         """Get quality level based on metric and score"""
@@ -185,7 +488,7 @@ class EmbeddingService:
             }
         
         try:
-            X = np.array(embeddings)
+            X = np.asarray(embeddings, dtype=np.float32)
             
             # Perform K-means clustering
             kmeans = KMeans(n_clusters=min(n_clusters, len(embeddings)), random_state=42, n_init=10)
@@ -226,7 +529,7 @@ class EmbeddingService:
             }
         
         try:
-            X = np.array(embeddings)
+            X = np.asarray(embeddings, dtype=np.float32)
             
             # Perform K-means clustering
             kmeans = KMeans(n_clusters=min(n_clusters, len(embeddings)), random_state=42, n_init=10)
@@ -277,9 +580,9 @@ class EmbeddingService:
             }
         
         try:
-            from sklearn.metrics.pairwise import cosine_distances
-            
-            X = np.array(embeddings)
+            X = np.asarray(embeddings, dtype=np.float32)
+            # Normalized once; cosine distances are then 1 - dot products
+            X_unit, _ = VectorMath.normalize_rows(X)
             
             # Perform K-means clustering
             kmeans = KMeans(n_clusters=min(n_clusters, len(embeddings)), random_state=42, n_init=10)
@@ -297,13 +600,14 @@ class EmbeddingService:
             
             for label in unique_labels:
                 cluster_points = X[cluster_labels == label]
+                unit_points = X_unit[cluster_labels == label]
                 
                 if method == 'centroid':
-                    centroid = np.mean(cluster_points, axis=0)
-                    dist = np.mean(cosine_distances(cluster_points, [centroid]))
+                    centroid = VectorMath.normalize(np.mean(cluster_points, axis=0))
+                    dist = np.mean(VectorMath.cosine_distances(unit_points, centroid[None, :]))
                 elif method == 'average':
                     if len(cluster_points) > 1:
-                        dist_matrix = cosine_distances(cluster_points)
+                        dist_matrix = VectorMath.cosine_distances(unit_points)
                         # Get upper triangle (exclude diagonal)
                         triu_indices = np.triu_indices(len(cluster_points), k=1)
                         dist = np.mean(dist_matrix[triu_indices])
@@ -355,9 +659,8 @@ class EmbeddingService:
             }
         
         try:
-            from sklearn.metrics.pairwise import cosine_distances
-            
-            X = np.array(embeddings)
+            X = np.asarray(embeddings, dtype=np.float32)
+            X_unit, _ = VectorMath.normalize_rows(X)
             
             n_samples = len(embeddings)
             
@@ -432,8 +735,8 @@ class EmbeddingService:
             for label in unique_labels:
                 cluster_points = X[cluster_labels == label]
                 if len(cluster_points) > 0:
-                    centroid = np.mean(cluster_points, axis=0)
-                    dist = np.mean(cosine_distances(cluster_points, [centroid]))
+                    centroid = VectorMath.normalize(np.mean(cluster_points, axis=0))
+                    dist = np.mean(VectorMath.cosine_distances(X_unit[cluster_labels == label], centroid[None, :]))
                     intra_distances[f"cluster_{int(label)}"] = float(dist)
             avg_intra_distance = float(np.mean(list(intra_distances.values()))) if intra_distances else 0.0
             
@@ -546,7 +849,7 @@ class EmbeddingService:
             }
         
         try:
-            X = np.array(embeddings)
+            X = np.asarray(embeddings, dtype=np.float32)
             
             # Perform K-means clustering
             kmeans = KMeans(n_clusters=min(n_clusters, len(embeddings)), random_state=42, n_init=10)
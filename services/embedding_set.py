@@ -0,0 +1,288 @@
+"""
+Embedding Set - In-memory embedding matrix with a storage dtype policy
+
+Storage dtypes:
+- float32 (default): 4 bytes per dimension
+- float16: 2 bytes per dimension
+- int8: 1 byte per dimension, scalar-quantized with a per-dimension scale and offset
+
+Vectors are L2-normalized once at ingest, so cosine search is a dot product with
+the normalized query (sets whose stored rows are not unit length, e.g. int8
+reconstructions or older vector stores, divide by their stored norms instead).
+Search runs directly on the stored form in row blocks, so the full matrix is
+never materialized as float32 / float64.
+"""
+import hashlib
+import logging
+from typing import List, Dict, Any, Optional, Tuple
+
+from services.vector_math import VectorMath
+
+logger = logging.getLogger(__name__)
+
+# Optional dependencies
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+    logger.warning("numpy not available, embedding sets will not work")
+
+
+class EmbeddingSet:
+    """Embedding matrix stored as float32, float16 or int8 with vectorized cosine search"""
+    
+    SUPPORTED_DTYPES = ('float32', 'float16', 'int8')
+    
+    # Rows scored per block when upcasting float16 / int8 to float32
+    BLOCK_ROWS = 65536
+    
+    # Row subsets with at most this many contiguous runs are scored slice by slice (no gather copy)
+    MAX_ROW_SEGMENTS = 256
+    
+    def __init__(self, embeddings, dtype: str = 'float32', fingerprint: Optional[str] = None, version: int = 1):
+        """
+        Args:
+            embeddings: 2-D array-like of embedding vectors
+            dtype: Storage dtype ('float32', 'float16' or 'int8')
+            fingerprint: Known fingerprint of the vectors (skips hashing the matrix)
+            version: Version of the vectors under that fingerprint
+        """
+        if dtype not in EmbeddingSet.SUPPORTED_DTYPES:
+            raise ValueError(f"Unsupported storage dtype: {dtype}. Supported: {', '.join(EmbeddingSet.SUPPORTED_DTYPES)}")
+        
+        X = np.asarray(embeddings, dtype=np.float32)
+        if X.ndim != 2:
+            raise ValueError(f'Expected 2-D embedding matrix, got shape {X.shape}')
+        
+        self.dtype = dtype
+        self.n_vectors, self.dim = X.shape
+        self.fingerprint = fingerprint or EmbeddingSet.compute_fingerprint(X)
+        self.version = version
+        
+        # Normalize once at ingest; cosine is then a dot product
+        X, _ = VectorMath.normalize_rows(X)
+        self.scale = None
+        self.offset = None
+        
+        if dtype == 'float32':
+            self.data = np.ascontiguousarray(X)
+        elif dtype == 'float16':
+            self.data = X.astype(np.float16)
+        else:
+            # Asymmetric per-dimension quantization: x ~= (code + 128) * scale + offset
+            lower = X.min(axis=0) if len(X) else np.zeros(self.dim, dtype=np.float32)
+            upper = X.max(axis=0) if len(X) else np.zeros(self.dim, dtype=np.float32)
+            self.offset = lower.astype(np.float32)
+            self.scale = np.maximum((upper - lower) / 255.0, 1e-12).astype(np.float32)
+            codes = np.rint((X - self.offset) / self.scale) - 128
+            self.data = np.clip(codes, -128, 127).astype(np.int8)
+        
+        # Norms of the stored (reconstructed) vectors: ~1 unless quantization moved them
+        self.norms = np.empty(self.n_vectors, dtype=np.float32)
+        for start, block in self._iter_blocks():
+            self.norms[start:start + len(block)] = np.linalg.norm(block, axis=1)
+        self.normalized = VectorMath.is_unit_norm(self.norms)
+    
+    @classmethod
+    def from_float32(cls, data, norms, fingerprint: str, version: int = 1,
+                     normalized: Optional[bool] = None) -> 'EmbeddingSet':
+        """
+        Wrap an existing float32 matrix (e.g. an np.memmap) without copying,
+        hashing or recomputing norms
+        """
+        return cls.from_stored(data, norms, 'float32', fingerprint=fingerprint, version=version, normalized=normalized)
+    
+    @classmethod
+    def from_stored(cls, data, norms, dtype: str, scale=None, offset=None,
+                    fingerprint: str = '', version: int = 1, normalized: Optional[bool] = None) -> 'EmbeddingSet':
+        """
+        Wrap already encoded arrays (e.g. shared-memory or memory-mapped views)
+        without copying, hashing or recomputing norms
+        
+        normalized tells whether the stored rows are unit length; when None it is
+        read off the norms.
+        """
+        embedding_set = cls.__new__(cls)
+        embedding_set.dtype = dtype
+        embedding_set.n_vectors, embedding_set.dim = data.shape
+        embedding_set.fingerprint = fingerprint
+        embedding_set.version = version
+        embedding_set.scale = scale
+        embedding_set.offset = offset
+        embedding_set.data = data
+        embedding_set.norms = norms
+        embedding_set.normalized = VectorMath.is_unit_norm(norms) if normalized is None else bool(normalized)
+        return embedding_set
+    
+    @staticmethod
+    def compute_fingerprint(X) -> str:
+        """Stable fingerprint of an embedding matrix (shape + float32 bytes)"""
+        digest = hashlib.sha1()
+        digest.update(str(X.shape).encode('utf-8'))
+        digest.update(np.ascontiguousarray(X, dtype=np.float32).tobytes())
+        return digest.hexdigest()
+    
+    def __len__(self) -> int:
+        return self.n_vectors
+    
+    def _iter_blocks(self, rows=None):
+        """Yield (start, float32 block) over the stored matrix (or a subset of rows)"""
+        data = self.data if rows is None else self.data[rows]
+        for start in range(0, len(data), EmbeddingSet.BLOCK_ROWS):
+            block = data[start:start + EmbeddingSet.BLOCK_ROWS]
+            if self.dtype == 'int8':
+                block = (block.astype(np.float32) + 128.0) * self.scale + self.offset
+            elif self.dtype == 'float16':
+                block = block.astype(np.float32)
+            yield start, block
+    
+    def reconstruct(self, rows=None):
+        """Return float32 vectors (dequantized if needed) for all or selected rows"""
+        if self.dtype == 'float32':
+            return self.data if rows is None else self.data[rows]
+        blocks = [block for _, block in self._iter_blocks(rows)]
+        return np.vstack(blocks) if blocks else np.empty((0, self.dim), dtype=np.float32)
+    
+    @staticmethod
+    def row_segments(rows) -> List[Any]:
+        """
+        Split sorted row ids into slices over contiguous runs, or a single
+        index array when the rows are too scattered for slicing to pay off
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        if not len(rows):
+            return []
+        boundaries = np.flatnonzero(np.diff(rows) != 1) + 1
+        if len(boundaries) + 1 > EmbeddingSet.MAX_ROW_SEGMENTS:
+            return [rows]
+        starts = np.concatenate([[0], boundaries])
+        stops = np.concatenate([boundaries, [len(rows)]])
+        return [slice(int(rows[a]), int(rows[b - 1]) + 1) for a, b in zip(starts, stops)]
+    
+    def dot_scores(self, query, rows=None):
+        """
+        Raw dot products between the query and every stored vector
+        
+        Args:
+            query: Query embedding vector
+            rows: Optional sorted row ids; only these rows are read and scored
+        """
+        q = np.asarray(query, dtype=np.float32).reshape(-1)
+        
+        if self.dtype == 'float32' and rows is None:
+            return self.data @ q
+        
+        if self.dtype == 'int8':
+            # x.q = code.(scale*q) + sum((128*scale + offset)*q): no dequantized copy needed
+            weights = self.scale * q
+            bias = float(np.dot(128.0 * self.scale + self.offset, q))
+        else:
+            weights = q
+            bias = 0.0
+        
+        segments = [slice(0, self.n_vectors)] if rows is None else EmbeddingSet.row_segments(rows)
+        n_scores = self.n_vectors if rows is None else len(rows)
+        scores = np.empty(n_scores, dtype=np.float32)
+        
+        filled = 0
+        for segment in segments:
+            if isinstance(segment, slice):
+                blocks = (slice(start, min(start + EmbeddingSet.BLOCK_ROWS, segment.stop))
+                          for start in range(segment.start, segment.stop, EmbeddingSet.BLOCK_ROWS))
+            else:
+                blocks = (segment[start:start + EmbeddingSet.BLOCK_ROWS]
+                          for start in range(0, len(segment), EmbeddingSet.BLOCK_ROWS))
+            for block_rows in blocks:
+                block = self.data[block_rows]
+                if self.dtype != 'float32':
+                    block = block.astype(np.float32)
+                scores[filled:filled + len(block)] = block @ weights + bias
+                filled += len(block)
+        return scores
+    
+    def cosine_scores(self, query, rows=None):
+        """Cosine similarity between the query and every stored vector (or the given rows)"""
+        q = VectorMath.normalize(query)
+        scores = self.dot_scores(q, rows)
+        if self.normalized:
+            return scores
+        norms = self.norms if rows is None else self.norms[np.asarray(rows, dtype=np.int64)]
+        return np.divide(scores, norms, out=np.zeros_like(scores), where=norms > 0)
+    
+    @staticmethod
+    def top_k_from_scores(scores, top_k: int) -> List[Tuple[int, float]]:
+        """Select top-k (index, score) pairs, sorted by score descending"""
+        return VectorMath.top_k_from_scores(scores, top_k)
+    
+    def search(self, query, top_k: int = 5, rows=None) -> List[Tuple[int, float]]:
+        """
+        Exact cosine search on the stored representation
+        
+        Args:
+            query: Query embedding vector
+            top_k: Number of results
+            rows: Optional sorted row ids to restrict the search to (pre-filtering)
+        
+        Returns:
+            List of (index, similarity_score) tuples, sorted by score descending
+        """
+        if rows is None:
+            return EmbeddingSet.top_k_from_scores(self.cosine_scores(query), top_k)
+        
+        rows = np.asarray(rows, dtype=np.int64)
+        top = EmbeddingSet.top_k_from_scores(self.cosine_scores(query, rows), top_k)
+        return [(int(rows[i]), score) for i, score in top]
+    
+    def memory_bytes(self) -> int:
+        """Bytes used by vectors plus per-set quantization / norm arrays"""
+        total = self.data.nbytes + self.norms.nbytes
+        if self.scale is not None:
+            total += self.scale.nbytes + self.offset.nbytes
+        return int(total)
+    
+    def storage_info(self) -> Dict[str, Any]:
+        """Describe the storage dtype and memory footprint"""
+        float32_bytes = self.n_vectors * self.dim * 4
+        return {
+            'dtype': self.dtype,
+            'n_vectors': self.n_vectors,
+            'dim': self.dim,
+            'memory_bytes': self.memory_bytes(),
+            'bytes_per_vector': round(self.data.nbytes / self.n_vectors, 2) if self.n_vectors else 0,
+            'compression_vs_float32': round(float32_bytes / self.data.nbytes, 2) if self.data.nbytes else 1.0,
+            'normalized': self.normalized,
+            'fingerprint': self.fingerprint[:16],
+            'version': self.version
+        }
+    
+    def recall_against(self, reference: 'EmbeddingSet', queries, k: int = 10) -> Dict[str, Any]:
+        """
+        Recall@k of this set's search relative to a reference (normally float32) set
+        
+        Args:
+            reference: Set searched exactly in full precision
+            queries: 2-D array-like of query vectors
+            k: Number of neighbors compared
+        
+        Returns:
+            Dict with mean / min recall over queries
+        """
+        queries = np.asarray(queries, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries.reshape(1, -1)
+        
+        recalls = []
+        for q in queries:
+            expected = {idx for idx, _ in reference.search(q, k)}
+            if not expected:
+                continue
+            found = {idx for idx, _ in self.search(q, k)}
+            recalls.append(len(expected & found) / len(expected))
+        
+        return {
+            'k': k,
+            'n_queries': len(recalls),
+            'mean_recall': round(float(np.mean(recalls)), 4) if recalls else None,
+            'min_recall': round(float(np.min(recalls)), 4) if recalls else None
+        }
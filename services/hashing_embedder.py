@@ -0,0 +1,127 @@
+"""
+Hashing Embedder - Deterministic local embeddings from character n-gram feature hashing
+
+Each text is lowercased, whitespace-normalized and padded with spaces; every
+character n-gram (default 3-5) is hashed into one of `dim` buckets with a
++1 / -1 sign, counts are log-damped and the vector is L2-normalized.
+
+The hashing runs on whole batches at once: texts are concatenated into one
+code point array and n-gram hashes are computed with vectorized uint64
+arithmetic, dropping windows that cross text boundaries. No network, model
+download or randomness is involved, so the same text always gets the same
+vector on every machine.
+"""
+import logging
+import re
+from typing import List, Dict, Any
+
+logger = logging.getLogger(__name__)
+
+# Optional dependencies
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+    logger.warning("numpy not available, hashing embeddings will not work")
+
+
+class HashingEmbedder:
+    """Signed feature hashing of character n-grams into a fixed dimension"""
+    
+    WHITESPACE_PATTERN = re.compile(r'\s+')
+    
+    # Code points hashed per batch (bounds temporary uint64 arrays)
+    MAX_BATCH_CHARS = 1 << 21
+    
+    # Odd 64-bit multipliers for the rolling hash and the final mix
+    _BASE = np.uint64(0x100000001B3) if HAS_NUMPY else None
+    _MIX = np.uint64(0x9E3779B97F4A7C15) if HAS_NUMPY else None
+    
+    def __init__(self, dim: int = 384, ngram_min: int = 3, ngram_max: int = 5, seed: int = 0):
+        """
+        Args:
+            dim: Embedding dimension (number of hash buckets)
+            ngram_min: Shortest character n-gram
+            ngram_max: Longest character n-gram
+            seed: Changes the hash functions (same seed = same vectors)
+        """
+        if dim <= 0 or ngram_min <= 0 or ngram_max < ngram_min:
+            raise ValueError('Invalid hashing embedder parameters')
+        self.dim = int(dim)
+        self.ngram_min = int(ngram_min)
+        self.ngram_max = int(ngram_max)
+        self.seed = int(seed)
+    
+    @property
+    def model_name(self) -> str:
+        """Identifier for caches / reports (changes whenever the vectors would)"""
+        return f'hashing-d{self.dim}-n{self.ngram_min}{self.ngram_max}-s{self.seed}'
+    
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Lowercase, collapse whitespace and pad with spaces (marks word edges)"""
+        return f" {HashingEmbedder.WHITESPACE_PATTERN.sub(' ', (text or '').lower()).strip()} "
+    
+    def _embed_batch(self, texts: List[str]):
+        normalized = [HashingEmbedder.normalize(text) for text in texts]
+        lengths = np.fromiter((len(text) for text in normalized), dtype=np.int64, count=len(normalized))
+        codes = np.frombuffer(''.join(normalized).encode('utf-32-le'), dtype=np.uint32).astype(np.uint64)
+        doc_ids = np.repeat(np.arange(len(texts), dtype=np.int64), lengths)
+        
+        counts = np.zeros(len(texts) * self.dim, dtype=np.float32)
+        seed = np.uint64(self.seed * 2 + 1)
+        
+        with np.errstate(over='ignore'):
+            for n in range(self.ngram_min, self.ngram_max + 1):
+                n_windows = len(codes) - n + 1
+                if n_windows <= 0:
+                    continue
+                # Polynomial rolling hash of every window, wrapping in uint64
+                hashes = np.full(n_windows, np.uint64(n), dtype=np.uint64) * seed
+                for offset in range(n):
+                    hashes = hashes * HashingEmbedder._BASE + codes[offset:offset + n_windows]
+                # Keep windows inside one text
+                valid = doc_ids[:n_windows] == doc_ids[n - 1:]
+                hashes = hashes[valid] * HashingEmbedder._MIX
+                hashes ^= hashes >> np.uint64(29)
+                
+                buckets = (hashes % np.uint64(self.dim)).astype(np.int64)
+                signs = np.where(hashes >> np.uint64(63), -1.0, 1.0).astype(np.float32)
+                counts += np.bincount(doc_ids[:n_windows][valid] * self.dim + buckets,
+                                      weights=signs, minlength=len(counts)).astype(np.float32)
+        
+        X = counts.reshape(len(texts), self.dim)
+        X = np.sign(X) * np.log1p(np.abs(X))
+        norms = np.linalg.norm(X, axis=1, keepdims=True)
+        return np.divide(X, norms, out=np.zeros_like(X), where=norms > 0)
+    
+    def embed(self, texts: List[str]):
+        """
+        Embed texts
+        
+        Returns:
+            float32 array of shape (len(texts), dim), rows L2-normalized
+            (all zeros for empty texts)
+        """
+        X = np.zeros((len(texts), self.dim), dtype=np.float32)
+        start = 0
+        while start < len(texts):
+            # Group texts into batches of about MAX_BATCH_CHARS code points
+            stop, chars = start, 0
+            while stop < len(texts) and (stop == start or chars + len(texts[stop] or '') <= HashingEmbedder.MAX_BATCH_CHARS):
+                chars += len(texts[stop] or '') + 2
+                stop += 1
+            X[start:stop] = self._embed_batch(texts[start:stop])
+            start = stop
+        return X
+    
+    def info(self) -> Dict[str, Any]:
+        """Describe the embedder"""
+        return {
+            'method': 'hashing',
+            'model': self.model_name,
+            'dim': self.dim,
+            'ngram_range': [self.ngram_min, self.ngram_max],
+            'seed': self.seed
+        }
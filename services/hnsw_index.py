@@ -0,0 +1,278 @@
+"""
+HNSW Index - Approximate nearest-neighbor search over an embedding set
+
+Hierarchical Navigable Small World graph (Malkov & Yashunin) on L2-normalized
+vectors, so inner product equals cosine similarity.
+
+Backends:
+- hnswlib (optional, used when installed): C++ implementation
+- numpy: in-repo implementation, vectorized per neighbor list
+
+The index is built once per embedding set; ef_search is tunable per query.
+"""
+import heapq
+import logging
+import math
+import threading
+import time
+from typing import List, Dict, Any, Optional, Tuple
+
+from services.vector_math import VectorMath
+
+logger = logging.getLogger(__name__)
+
+# Optional dependencies
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+    logger.warning("numpy not available, HNSW index will not work")
+
+try:
+    import hnswlib
+    HAS_HNSWLIB = True
+except ImportError:
+    HAS_HNSWLIB = False
+
+
+class HNSWIndex:
+    """HNSW graph index returning (index, cosine similarity) pairs like RetrievalService.search_similar"""
+    
+    BACKENDS = ('auto', 'numpy', 'hnswlib')
+    
+    def __init__(self, embedding_set, M: int = 16, ef_construction: int = 100,
+                 ef_search: int = 64, backend: str = 'auto', random_state: int = 42):
+        """
+        Args:
+            embedding_set: EmbeddingSet to index (vectors are dequantized once for the graph)
+            M: Max neighbors per node on upper layers (2*M on layer 0)
+            ef_construction: Candidate list size while inserting
+            ef_search: Default candidate list size while searching
+            backend: 'auto' (hnswlib if installed), 'numpy' or 'hnswlib'
+            random_state: Seed for level assignment
+        """
+        if backend not in HNSWIndex.BACKENDS:
+            raise ValueError(f"Unsupported HNSW backend: {backend}. Supported: {', '.join(HNSWIndex.BACKENDS)}")
+        if backend == 'hnswlib' and not HAS_HNSWLIB:
+            raise ValueError('hnswlib is not installed')
+        
+        self.backend = 'hnswlib' if backend == 'hnswlib' or (backend == 'auto' and HAS_HNSWLIB) else 'numpy'
+        self.M = max(int(M), 2)
+        self.ef_construction = max(int(ef_construction), self.M)
+        self.ef_search = max(int(ef_search), 1)
+        self.random_state = random_state
+        self.fingerprint = embedding_set.fingerprint
+        self.storage_dtype = embedding_set.dtype
+        self.n_vectors = len(embedding_set)
+        self.dim = embedding_set.dim
+        self._lock = threading.Lock()
+        
+        X = np.asarray(embedding_set.reconstruct(), dtype=np.float32)
+        # Sets normalized at ingest are used as-is
+        self.vectors = X if embedding_set.normalized else VectorMath.normalize_rows(X)[0]
+        
+        start = time.perf_counter()
+        if self.backend == 'hnswlib':
+            self._build_hnswlib()
+        else:
+            self._build_numpy()
+        self.build_seconds = round(time.perf_counter() - start, 3)
+        
+        logger.info(f"Built HNSW index ({self.backend}) over {self.n_vectors} vectors in {self.build_seconds}s")
+    
+    def __len__(self) -> int:
+        return self.n_vectors
+    
+    # hnswlib backend
+    def _build_hnswlib(self):
+        self._hnsw = hnswlib.Index(space='ip', dim=self.dim)
+        self._hnsw.init_index(max_elements=max(self.n_vectors, 1), ef_construction=self.ef_construction,
+                              M=self.M, random_seed=self.random_state)
+        if self.n_vectors:
+            self._hnsw.add_items(self.vectors, np.arange(self.n_vectors))
+        self._hnsw.set_ef(self.ef_search)
+    
+    def _search_hnswlib(self, q, top_k: int, ef: int) -> List[Tuple[int, float]]:
+        # set_ef is index-wide, so queries with different ef must not interleave
+        with self._lock:
+            self._hnsw.set_ef(max(ef, top_k))
+            labels, distances = self._hnsw.knn_query(q, k=top_k)
+        return [(int(i), float(1.0 - d)) for i, d in zip(labels[0], distances[0])]
+    
+    # numpy backend
+    def _build_numpy(self):
+        rng = np.random.default_rng(self.random_state)
+        level_mult = 1.0 / math.log(self.M)
+        levels = np.floor(-np.log(1.0 - rng.random(self.n_vectors)) * level_mult).astype(int)
+        
+        # links[node][level] -> list of neighbor ids
+        self._links: List[List[List[int]]] = [[[] for _ in range(level + 1)] for level in levels]
+        self._entry_point = -1
+        self._max_level = -1
+        
+        for node in range(self.n_vectors):
+            self._insert(node, int(levels[node]))
+    
+    def _max_neighbors(self, level: int) -> int:
+        return self.M * 2 if level == 0 else self.M
+    
+    def _search_layer(self, q, entry_points: List[int], ef: int, level: int) -> List[Tuple[float, int]]:
+        """Best-first search on one layer; returns up to ef (similarity, node) pairs, best first"""
+        visited = set(entry_points)
+        entry_sims = self.vectors[entry_points] @ q
+        
+        candidates = [(-float(s), n) for s, n in zip(entry_sims, entry_points)]  # max-heap on similarity
+        heapq.heapify(candidates)
+        results = [(float(s), n) for s, n in zip(entry_sims, entry_points)]      # min-heap on similarity
+        heapq.heapify(results)
+        while len(results) > ef:
+            heapq.heappop(results)
+        
+        while candidates:
+            neg_sim, node = heapq.heappop(candidates)
+            if -neg_sim < results[0][0] and len(results) >= ef:
+                break
+            
+            neighbors = [n for n in self._links[node][level] if n not in visited]
+            if not neighbors:
+                continue
+            visited.update(neighbors)
+            
+            sims = self.vectors[neighbors] @ q
+            if len(results) >= ef:
+                # Only neighbors beating the current worst result can enter
+                keep = np.flatnonzero(sims > results[0][0])
+                if not len(keep):
+                    continue
+                sims = sims[keep]
+                neighbors = [neighbors[i] for i in keep]
+            for sim, neighbor in zip(sims.tolist(), neighbors):
+                if len(results) < ef or sim > results[0][0]:
+                    heapq.heappush(candidates, (-sim, neighbor))
+                    heapq.heappush(results, (sim, neighbor))
+                    if len(results) > ef:
+                        heapq.heappop(results)
+        
+        return sorted(results, reverse=True)
+    
+    def _select_neighbors(self, candidates: List[Tuple[float, int]], max_neighbors: int) -> List[int]:
+        """
+        Neighbor selection heuristic: keep a candidate only if it is closer to the
+        base point than to every neighbor already kept (preserves graph connectivity
+        across clusters)
+        """
+        nodes = [node for _, node in candidates]
+        candidate_vectors = self.vectors[nodes]
+        pairwise = candidate_vectors @ candidate_vectors.T
+        
+        # Running max similarity of each candidate to the neighbors kept so far
+        closest_kept = np.full(len(nodes), -np.inf, dtype=np.float32)
+        selected: List[int] = []
+        for i, (sim, node) in enumerate(candidates):
+            if len(selected) >= max_neighbors:
+                break
+            if closest_kept[i] < sim:
+                selected.append(node)
+                np.maximum(closest_kept, pairwise[i], out=closest_kept)
+        
+        # Top up with the nearest skipped candidates so nodes keep enough links
+        if len(selected) < max_neighbors:
+            chosen = set(selected)
+            for _, node in candidates:
+                if len(selected) >= max_neighbors:
+                    break
+                if node not in chosen:
+                    selected.append(node)
+                    chosen.add(node)
+        return selected
+    
+    def _insert(self, node: int, level: int):
+        if self._entry_point < 0:
+            self._entry_point = node
+            self._max_level = level
+            return
+        
+        q = self.vectors[node]
+        entry = [self._entry_point]
+        
+        # Greedy descent through layers above the node's level
+        for layer in range(self._max_level, level, -1):
+            entry = [self._search_layer(q, entry, 1, layer)[0][1]]
+        
+        for layer in range(min(level, self._max_level), -1, -1):
+            candidates = self._search_layer(q, entry, self.ef_construction, layer)
+            max_neighbors = self._max_neighbors(layer)
+            neighbors = self._select_neighbors(candidates, self.M)
+            self._links[node][layer] = neighbors
+            
+            for neighbor in neighbors:
+                links = self._links[neighbor][layer]
+                links.append(node)
+                if len(links) > max_neighbors:
+                    sims = self.vectors[links] @ self.vectors[neighbor]
+                    order = np.argsort(-sims)
+                    self._links[neighbor][layer] = self._select_neighbors(
+                        [(float(sims[i]), links[i]) for i in order], max_neighbors
+                    )
+            
+            entry = [n for _, n in candidates]
+        
+        if level > self._max_level:
+            self._entry_point = node
+            self._max_level = level
+    
+    def _search_numpy(self, q, top_k: int, ef: int) -> List[Tuple[int, float]]:
+        entry = [self._entry_point]
+        for layer in range(self._max_level, 0, -1):
+            entry = [self._search_layer(q, entry, 1, layer)[0][1]]
+        results = self._search_layer(q, entry, max(ef, top_k), 0)
+        return [(node, sim) for sim, node in results[:top_k]]
+    
+    # Public API
+    def search(self, query, top_k: int = 5, ef_search: Optional[int] = None) -> List[Tuple[int, float]]:
+        """
+        Approximate cosine search
+        
+        Args:
+            query: Query embedding vector
+            top_k: Number of results
+            ef_search: Candidate list size (higher = better recall, slower); default from the index
+        
+        Returns:
+            List of (index, similarity_score) tuples, sorted by score descending
+        """
+        top_k = min(int(top_k), self.n_vectors)
+        if top_k <= 0:
+            return []
+        
+        q = VectorMath.normalize(query)
+        
+        ef = int(ef_search) if ef_search else self.ef_search
+        if self.backend == 'hnswlib':
+            return self._search_hnswlib(q, top_k, ef)
+        return self._search_numpy(q, top_k, ef)
+    
+    def memory_bytes(self) -> int:
+        """Approximate bytes for normalized vectors plus graph links"""
+        total = self.vectors.nbytes
+        if self.backend == 'numpy':
+            total += sum(len(links) for node_links in self._links for links in node_links) * 8
+        else:
+            total += self.n_vectors * self.M * 2 * 4
+        return int(total)
+    
+    def info(self) -> Dict[str, Any]:
+        """Describe the index configuration and build cost"""
+        return {
+            'method': 'hnsw',
+            'backend': self.backend,
+            'n_vectors': self.n_vectors,
+            'dim': self.dim,
+            'storage_dtype': self.storage_dtype,
+            'M': self.M,
+            'ef_construction': self.ef_construction,
+            'ef_search': self.ef_search,
+            'build_seconds': self.build_seconds,
+            'memory_bytes': self.memory_bytes()
+        }
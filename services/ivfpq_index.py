@@ -0,0 +1,217 @@
+"""
+IVF-PQ Index - Compressed approximate search for memory-bound corpora
+
+- IVF: k-means coarse quantizer splits vectors into n_lists inverted lists;
+  a query only scans the nprobe nearest lists
+- PQ: each residual (vector - list centroid) is split into m sub-vectors and
+  stored as m one-byte codes from per-subspace codebooks (m bytes per vector)
+- ADC: asymmetric distance computation; per query one (m x 256) lookup table of
+  query / codeword inner products scores every code with a vectorized gather
+- Optional exact re-ranking of the best candidates from the embedding set
+
+Vectors are L2-normalized, so inner product equals cosine similarity.
+"""
+import logging
+import math
+import time
+from typing import List, Dict, Any, Optional, Tuple
+
+from services.vector_math import VectorMath
+
+logger = logging.getLogger(__name__)
+
+# Optional dependencies
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+    logger.warning("numpy not available, IVF-PQ index will not work")
+
+try:
+    from sklearn.cluster import KMeans
+    HAS_SKLEARN = True
+except ImportError:
+    HAS_SKLEARN = False
+    logger.warning("sklearn not available, IVF-PQ index will not work")
+
+
+class IVFPQIndex:
+    """Inverted-file index with product-quantized residuals"""
+    
+    # Codewords per subspace (8-bit codes)
+    N_CODES = 256
+    
+    # Rows used to train the coarse quantizer and codebooks
+    MAX_TRAINING_ROWS = 16384
+    
+    def __init__(self, embedding_set, n_lists: Optional[int] = None, m: int = 16,
+                 nprobe: int = 8, rerank: int = 0, random_state: int = 42):
+        """
+        Args:
+            embedding_set: EmbeddingSet to index (also used for exact re-ranking)
+            n_lists: Number of inverted lists (default: ~sqrt(n_vectors))
+            m: Number of PQ sub-vectors, i.e. code bytes per vector
+            nprobe: Default number of lists scanned per query
+            rerank: Default number of candidates re-scored exactly (0 disables)
+            random_state: Seed for k-means and training sample
+        """
+        if not HAS_SKLEARN:
+            raise ValueError('sklearn not available')
+        
+        self.embedding_set = embedding_set
+        self.fingerprint = embedding_set.fingerprint
+        self.storage_dtype = embedding_set.dtype
+        self.n_vectors = len(embedding_set)
+        self.dim = embedding_set.dim
+        self.m = max(1, min(int(m), self.dim))
+        self.dsub = math.ceil(self.dim / self.m)
+        self.n_lists = max(1, min(int(n_lists) if n_lists else int(round(math.sqrt(self.n_vectors))), self.n_vectors))
+        self.nprobe = max(1, int(nprobe))
+        self.rerank = max(0, int(rerank))
+        self.random_state = random_state
+        
+        start = time.perf_counter()
+        self._train_and_add()
+        self.build_seconds = round(time.perf_counter() - start, 3)
+        
+        logger.info(f"Built IVF-PQ index ({self.n_lists} lists, m={self.m}) over {self.n_vectors} vectors "
+                    f"in {self.build_seconds}s")
+    
+    def __len__(self) -> int:
+        return self.n_vectors
+    
+    def _normalized(self, X, normalized: bool = False):
+        """L2-normalize rows (unless already normalized) and zero-pad to m * dsub dimensions"""
+        X = np.asarray(X, dtype=np.float32)
+        if not normalized:
+            X = VectorMath.normalize_rows(X)[0]
+        padding = self.m * self.dsub - self.dim
+        if padding:
+            X = np.pad(X, [(0, 0)] * (X.ndim - 1) + [(0, padding)])
+        return X
+    
+    def _encode(self, residuals):
+        """PQ codes (n, m) uint8 for residual vectors"""
+        codes = np.empty((len(residuals), self.m), dtype=np.uint8)
+        for j in range(self.m):
+            sub = residuals[:, j * self.dsub:(j + 1) * self.dsub]
+            codebook = self.codebooks[j]
+            # argmin ||sub - c||^2 == argmax (sub.c - ||c||^2 / 2)
+            scores = sub @ codebook.T - 0.5 * np.einsum('ij,ij->i', codebook, codebook)
+            codes[:, j] = np.argmax(scores, axis=1)
+        return codes
+    
+    def _train_and_add(self):
+        X = self._normalized(self.embedding_set.reconstruct(), self.embedding_set.normalized)
+        rng = np.random.default_rng(self.random_state)
+        
+        if len(X) > IVFPQIndex.MAX_TRAINING_ROWS:
+            sample = X[np.sort(rng.choice(len(X), IVFPQIndex.MAX_TRAINING_ROWS, replace=False))]
+        else:
+            sample = X
+        
+        # Coarse quantizer
+        coarse = KMeans(n_clusters=self.n_lists, n_init=1, max_iter=25, random_state=self.random_state)
+        coarse.fit(sample)
+        self.centroids = coarse.cluster_centers_.astype(np.float32)
+        
+        # Residual codebooks, one per subspace
+        sample_residuals = sample - self.centroids[coarse.labels_]
+        n_codes = min(IVFPQIndex.N_CODES, len(sample))
+        self.codebooks = np.zeros((self.m, n_codes, self.dsub), dtype=np.float32)
+        for j in range(self.m):
+            sub = sample_residuals[:, j * self.dsub:(j + 1) * self.dsub]
+            pq = KMeans(n_clusters=n_codes, n_init=1, max_iter=25, random_state=self.random_state)
+            pq.fit(sub)
+            self.codebooks[j] = pq.cluster_centers_
+        
+        # Assign every vector to its list, then store ids / codes grouped by list
+        assignments = np.empty(len(X), dtype=np.int32)
+        codes = np.empty((len(X), self.m), dtype=np.uint8)
+        block_rows = 65536
+        for start in range(0, len(X), block_rows):
+            block = X[start:start + block_rows]
+            # Nearest centroid by L2 (vectors are normalized, centroids are not)
+            scores = block @ self.centroids.T - 0.5 * np.einsum('ij,ij->i', self.centroids, self.centroids)
+            assignments[start:start + len(block)] = np.argmax(scores, axis=1)
+            codes[start:start + len(block)] = self._encode(block - self.centroids[assignments[start:start + len(block)]])
+        
+        order = np.argsort(assignments, kind='stable')
+        self.ids = order.astype(np.int32)
+        self.codes = np.ascontiguousarray(codes[order])
+        self.list_offsets = np.zeros(self.n_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignments, minlength=self.n_lists), out=self.list_offsets[1:])
+    
+    def search(self, query, top_k: int = 5, nprobe: Optional[int] = None,
+               rerank: Optional[int] = None) -> List[Tuple[int, float]]:
+        """
+        Approximate cosine search with ADC lookup tables
+        
+        Args:
+            query: Query embedding vector
+            top_k: Number of results
+            nprobe: Lists scanned (higher = better recall, slower); default from the index
+            rerank: Candidates re-scored exactly from the embedding set; default from the index
+        
+        Returns:
+            List of (index, similarity_score) tuples, sorted by score descending
+        """
+        top_k = min(int(top_k), self.n_vectors)
+        if top_k <= 0:
+            return []
+        
+        nprobe = min(int(nprobe) if nprobe else self.nprobe, self.n_lists)
+        rerank = self.rerank if rerank is None else max(0, int(rerank))
+        
+        q = self._normalized(np.asarray(query, dtype=np.float32).reshape(1, -1))[0]
+        
+        # Lists with the highest query . centroid
+        centroid_scores = self.centroids @ q
+        probe = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe] if nprobe < self.n_lists else np.arange(self.n_lists)
+        
+        # ADC table: lut[j, c] = q_j . codebook_j[c]
+        lut = np.einsum('jd,jcd->jc', q.reshape(self.m, self.dsub), self.codebooks)
+        
+        rows = np.concatenate([np.arange(self.list_offsets[c], self.list_offsets[c + 1]) for c in probe])
+        if not len(rows):
+            return []
+        list_of_row = np.repeat(probe, self.list_offsets[probe + 1] - self.list_offsets[probe])
+        
+        scores = centroid_scores[list_of_row] + lut[np.arange(self.m), self.codes[rows]].sum(axis=1)
+        
+        n_candidates = min(max(top_k, rerank), len(rows))
+        best = np.argpartition(-scores, n_candidates - 1)[:n_candidates]
+        candidate_ids = self.ids[rows[best]]
+        candidate_scores = scores[best]
+        
+        if rerank:
+            # Exact cosine on the stored vectors for the shortlisted candidates
+            candidate_ids = np.sort(candidate_ids)
+            candidate_scores = self.embedding_set.cosine_scores(q[:self.dim], candidate_ids)
+        
+        order = np.argsort(-candidate_scores, kind='stable')[:top_k]
+        return [(int(candidate_ids[i]), float(candidate_scores[i])) for i in order]
+    
+    def memory_bytes(self) -> int:
+        """Bytes held by the index itself (codes, ids, list offsets, centroids, codebooks)"""
+        return int(self.codes.nbytes + self.ids.nbytes + self.list_offsets.nbytes
+                   + self.centroids.nbytes + self.codebooks.nbytes)
+    
+    def info(self) -> Dict[str, Any]:
+        """Describe the index configuration, build cost and memory per vector"""
+        return {
+            'method': 'ivfpq',
+            'n_vectors': self.n_vectors,
+            'dim': self.dim,
+            'storage_dtype': self.storage_dtype,
+            'n_lists': self.n_lists,
+            'm': self.m,
+            'nprobe': self.nprobe,
+            'rerank': self.rerank,
+            'build_seconds': self.build_seconds,
+            'memory_bytes': self.memory_bytes(),
+            'code_bytes_per_vector': self.m,
+            'bytes_per_vector': round((self.codes.nbytes + self.ids.nbytes) / self.n_vectors, 2) if self.n_vectors else 0,
+            'float32_bytes_per_vector': self.dim * 4
+        }
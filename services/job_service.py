@@ -0,0 +1,276 @@
+"""
+Job Service - In-process background jobs for long-running pipeline operations
+
+Jobs run on a bounded thread pool (JOB_WORKERS threads, at most JOB_MAX_QUEUED
+waiting). Each job has an id, a status (queued / running / succeeded / failed /
+cancelled), optional progress reported by the code it runs, and timings.
+Cancellation is cooperative: queued jobs are dropped, running jobs stop at their
+next report_progress() / check_cancelled() call. Finished jobs and their results
+are kept for JOB_RESULT_TTL_SECONDS (at most JOB_MAX_RETAINED of them).
+"""
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional, Callable
+
+from config import JOB_WORKERS, JOB_MAX_QUEUED, JOB_RESULT_TTL_SECONDS, JOB_MAX_RETAINED
+
+logger = logging.getLogger(__name__)
+
+
+class JobCancelled(BaseException):
+    """
+    Raised inside a job when it has been cancelled
+    
+    Derives from BaseException so the broad `except Exception` fallbacks in
+    services and routes do not swallow it.
+    """
+
+
+class JobFailed(Exception):
+    """Raised by a job function to fail the job while still keeping a result"""
+    
+    def __init__(self, message: str, result: Any = None):
+        super().__init__(message)
+        self.result = result
+
+
+class JobQueueFull(Exception):
+    """Raised by submit when JOB_MAX_QUEUED jobs are already waiting"""
+
+
+@dataclass
+class Job:
+    """Model for a background job"""
+    job_id: str = ""
+    kind: str = ""
+    status: str = "queued"
+    progress: Optional[float] = None
+    message: str = ""
+    error: Optional[str] = None
+    result: Any = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    cancel_event: threading.Event = field(default_factory=threading.Event, repr=False)
+    future: Optional[Future] = field(default=None, repr=False)
+    
+    @property
+    def finished(self) -> bool:
+        return self.status in JobService.FINISHED_STATUSES
+    
+    def to_dict(self):
+        """Convert Job to dictionary (without the result)"""
+        now = time.time()
+        queue_end = self.started_at or self.finished_at or now
+        return {
+            'job_id': self.job_id,
+            'kind': self.kind,
+            'status': self.status,
+            'progress': round(self.progress, 4) if self.progress is not None else None,
+            'message': self.message,
+            'error': self.error,
+            'cancel_requested': self.cancel_event.is_set(),
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'timing': {
+                'queue_seconds': round(queue_end - self.created_at, 3),
+                'run_seconds': round((self.finished_at or now) - self.started_at, 3) if self.started_at else None,
+                'total_seconds': round((self.finished_at or now) - self.created_at, 3)
+            },
+            'expires_at': self.finished_at + JOB_RESULT_TTL_SECONDS if self.finished_at else None
+        }
+
+
+class JobService:
+    """Service for running and tracking background jobs"""
+    
+    FINISHED_STATUSES = ('succeeded', 'failed', 'cancelled')
+    
+    # job_id -> Job, oldest first
+    _jobs: "OrderedDict[str, Job]" = OrderedDict()
+    _lock = threading.Lock()
+    _executor: Optional[ThreadPoolExecutor] = None
+    # Job run by the current worker thread (for progress / cancellation checks)
+    _current = threading.local()
+    
+    @staticmethod
+    def _get_executor() -> ThreadPoolExecutor:
+        if JobService._executor is None:
+            JobService._executor = ThreadPoolExecutor(max_workers=max(1, JOB_WORKERS), thread_name_prefix='job')
+        return JobService._executor
+    
+    @staticmethod
+    def submit(kind: str, func: Callable, *args, **kwargs) -> Job:
+        """
+        Queue func(*args, **kwargs) as a background job
+        
+        Args:
+            kind: Job type shown in listings (e.g. 'chunking')
+            func: Callable run on a worker thread; its return value becomes the job result
+        
+        Returns:
+            The queued Job
+        
+        Raises:
+            JobQueueFull: if JOB_MAX_QUEUED jobs are already waiting
+        """
+        with JobService._lock:
+            JobService._purge_locked()
+            queued = sum(1 for job in JobService._jobs.values() if job.status == 'queued')
+            if queued >= JOB_MAX_QUEUED:
+                raise JobQueueFull(f'Job queue is full ({queued} jobs waiting)')
+            job = Job(job_id=uuid.uuid4().hex, kind=kind)
+            JobService._jobs[job.job_id] = job
+            executor = JobService._get_executor()
+        
+        job.future = executor.submit(JobService._run, job, func, args, kwargs)
+        logger.info(f"Queued {kind} job {job.job_id}")
+        return job
+    
+    @staticmethod
+    def _run(job: Job, func: Callable, args, kwargs):
+        with JobService._lock:
+            if job.cancel_event.is_set():
+                job.status = 'cancelled'
+                job.finished_at = time.time()
+                return
+            job.status = 'running'
+            job.started_at = time.time()
+        
+        JobService._current.job = job
+        try:
+            result = func(*args, **kwargs)
+            with JobService._lock:
+                job.result = result
+                job.status = 'succeeded'
+                if job.progress is not None:
+                    job.progress = 1.0
+        except JobCancelled:
+            with JobService._lock:
+                job.status = 'cancelled'
+        except JobFailed as e:
+            with JobService._lock:
+                job.result = e.result
+                job.status = 'failed'
+                job.error = str(e)
+        except Exception as e:
+            logger.error(f"{job.kind} job {job.job_id} failed: {e}")
+            with JobService._lock:
+                job.status = 'failed'
+                job.error = str(e)
+        finally:
+            JobService._current.job = None
+            job.finished_at = time.time()
+            logger.info(f"{job.kind} job {job.job_id} {job.status} in {job.finished_at - job.started_at:.2f}s")
+    
+    @staticmethod
+    def current_job() -> Optional[Job]:
+        """Job run by the calling thread, if any"""
+        return getattr(JobService._current, 'job', None)
+    
+    @staticmethod
+    def check_cancelled():
+        """Raise JobCancelled if the calling thread's job was cancelled (no-op outside jobs)"""
+        job = JobService.current_job()
+        if job is not None and job.cancel_event.is_set():
+            raise JobCancelled(f'Job {job.job_id} cancelled')
+    
+    @staticmethod
+    def report_progress(done: Optional[float] = None, total: Optional[float] = None, message: Optional[str] = None):
+        """
+        Update the calling thread's job progress and honour cancellation
+        
+        Cheap no-op when not running inside a job, so services can call it freely.
+        
+        Args:
+            done: Units of work completed (fraction of 1 when total is omitted)
+            total: Total units of work
+            message: Short description of the current stage
+        """
+        job = JobService.current_job()
+        if job is None:
+            return
+        if job.cancel_event.is_set():
+            raise JobCancelled(f'Job {job.job_id} cancelled')
+        if done is not None:
+            job.progress = min(max(done / total if total else done, 0.0), 1.0)
+        if message is not None:
+            job.message = message
+    
+    @staticmethod
+    def get(job_id: str) -> Optional[Job]:
+        with JobService._lock:
+            JobService._purge_locked()
+            return JobService._jobs.get(job_id)
+    
+    @staticmethod
+    def list_jobs(status: Optional[str] = None, kind: Optional[str] = None) -> List[Job]:
+        """Retained jobs, newest first"""
+        with JobService._lock:
+            JobService._purge_locked()
+            jobs = list(JobService._jobs.values())
+        return [
+            job for job in reversed(jobs)
+            if (status is None or job.status == status) and (kind is None or job.kind == kind)
+        ]
+    
+    @staticmethod
+    def cancel(job_id: str) -> Optional[Job]:
+        """Request cancellation; queued jobs are cancelled immediately"""
+        job = JobService.get(job_id)
+        if job is None or job.finished:
+            return job
+        job.cancel_event.set()
+        if job.future is not None and job.future.cancel():
+            with JobService._lock:
+                job.status = 'cancelled'
+                job.finished_at = time.time()
+        logger.info(f"Cancellation requested for {job.kind} job {job.job_id}")
+        return job
+    
+    @staticmethod
+    def delete(job_id: str) -> bool:
+        """Drop a finished job and its result"""
+        with JobService._lock:
+            job = JobService._jobs.get(job_id)
+            if job is None or not job.finished:
+                return False
+            del JobService._jobs[job_id]
+            return True
+    
+    @staticmethod
+    def _purge_locked():
+        """Drop expired results, then the oldest finished jobs beyond JOB_MAX_RETAINED"""
+        now = time.time()
+        expired = [
+            job_id for job_id, job in JobService._jobs.items()
+            if job.finished and job.finished_at and now - job.finished_at > JOB_RESULT_TTL_SECONDS
+        ]
+        for job_id in expired:
+            del JobService._jobs[job_id]
+        
+        finished = [job_id for job_id, job in JobService._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - JOB_MAX_RETAINED)]:
+            del JobService._jobs[job_id]
+    
+    @staticmethod
+    def get_info() -> Dict[str, Any]:
+        """Pool settings and job counts by status"""
+        with JobService._lock:
+            JobService._purge_locked()
+            counts = {status: 0 for status in ('queued', 'running') + JobService.FINISHED_STATUSES}
+            for job in JobService._jobs.values():
+                counts[job.status] += 1
+        return {
+            'workers': max(1, JOB_WORKERS),
+            'max_queued': JOB_MAX_QUEUED,
+            'result_ttl_seconds': JOB_RESULT_TTL_SECONDS,
+            'max_retained': JOB_MAX_RETAINED,
+            'counts': counts
+        }
@@ -0,0 +1,145 @@
+"""
+Metadata Index - Compile chunk metadata predicates into row selections
+
+Chunk metadata (filename, strategy, position) is stored columnar:
+- categorical fields as int32 codes into a per-field category list
+- positions as an int64 array
+- per-file row ranges (runs of consecutive rows), since chunks of one file
+  are usually stored together
+
+Filters compile to a sorted array of row ids, taken straight from the file
+ranges when only filenames are filtered, otherwise from a NumPy boolean mask.
+"""
+import hashlib
+import json
+import logging
+from typing import List, Dict, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Optional dependencies
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+    logger.warning("numpy not available, metadata filtering will not work")
+
+
+class MetadataIndex:
+    """Columnar chunk metadata with filter compilation"""
+    
+    CATEGORICAL_FIELDS = ('filename', 'strategy')
+    FILTER_KEYS = ('filename', 'strategy', 'position_min', 'position_max')
+    
+    def __init__(self, metadata: List[Dict[str, Any]]):
+        """
+        Args:
+            metadata: One dict per row (filename, strategy, position), aligned with the embeddings
+        """
+        self.n_rows = len(metadata)
+        self.fingerprint = MetadataIndex.compute_fingerprint(metadata)
+        
+        self.categories: Dict[str, List[str]] = {}
+        self.codes: Dict[str, Any] = {}
+        for field in MetadataIndex.CATEGORICAL_FIELDS:
+            lookup: Dict[str, int] = {}
+            codes = np.fromiter(
+                (lookup.setdefault(row.get(field), len(lookup)) if row.get(field) is not None else -1
+                 for row in metadata),
+                dtype=np.int32, count=self.n_rows
+            )
+            self.categories[field] = list(lookup)
+            self.codes[field] = codes
+        
+        self.positions = np.fromiter(
+            (row.get('position') if row.get('position') is not None else -1 for row in metadata),
+            dtype=np.int64, count=self.n_rows
+        )
+        
+        self.file_ranges = MetadataIndex._runs(self.codes['filename'], len(self.categories['filename']))
+    
+    @staticmethod
+    def compute_fingerprint(metadata: List[Dict[str, Any]]) -> str:
+        """Stable fingerprint of the indexed metadata fields"""
+        digest = hashlib.sha1()
+        for row in metadata:
+            digest.update(json.dumps([row.get('filename'), row.get('strategy'), row.get('position')]).encode('utf-8'))
+        return digest.hexdigest()
+    
+    @staticmethod
+    def _runs(codes, n_categories: int) -> List[List[Tuple[int, int]]]:
+        """(start, stop) runs of consecutive rows for each category code"""
+        ranges: List[List[Tuple[int, int]]] = [[] for _ in range(n_categories)]
+        if not len(codes):
+            return ranges
+        boundaries = np.flatnonzero(np.diff(codes)) + 1
+        starts = np.concatenate([[0], boundaries])
+        stops = np.concatenate([boundaries, [len(codes)]])
+        for start, stop in zip(starts.tolist(), stops.tolist()):
+            code = int(codes[start])
+            if code >= 0:
+                ranges[code].append((start, stop))
+        return ranges
+    
+    @staticmethod
+    def _as_list(value) -> List[Any]:
+        return value if isinstance(value, (list, tuple, set)) else [value]
+    
+    def _category_codes(self, field: str, values) -> List[int]:
+        lookup = {value: code for code, value in enumerate(self.categories[field])}
+        return [lookup[value] for value in MetadataIndex._as_list(values) if value in lookup]
+    
+    def compile(self, filters: Optional[Dict[str, Any]]):
+        """
+        Compile filters into the selected row ids
+        
+        Args:
+            filters: Dict with any of:
+                - 'filename': str or list of str
+                - 'strategy': str or list of str
+                - 'position_min' / 'position_max': inclusive position bounds
+        
+        Returns:
+            Sorted int64 array of row ids, or None when no filter is set
+        
+        Raises:
+            ValueError: For unknown filter keys
+        """
+        if not filters:
+            return None
+        
+        unknown = set(filters) - set(MetadataIndex.FILTER_KEYS)
+        if unknown:
+            raise ValueError(f"Unsupported filter keys: {', '.join(sorted(unknown))}")
+        
+        filters = {key: value for key, value in filters.items() if value is not None}
+        if not filters:
+            return None
+        
+        # Filename-only filters map directly to precomputed row ranges
+        if set(filters) == {'filename'}:
+            ranges = [r for code in self._category_codes('filename', filters['filename']) for r in self.file_ranges[code]]
+            if not ranges:
+                return np.empty(0, dtype=np.int64)
+            return np.sort(np.concatenate([np.arange(start, stop) for start, stop in ranges]))
+        
+        mask = np.ones(self.n_rows, dtype=bool)
+        for field in MetadataIndex.CATEGORICAL_FIELDS:
+            if field in filters:
+                mask &= np.isin(self.codes[field], self._category_codes(field, filters[field]))
+        if 'position_min' in filters:
+            mask &= self.positions >= int(filters['position_min'])
+        if 'position_max' in filters:
+            mask &= self.positions <= int(filters['position_max'])
+        
+        return np.flatnonzero(mask)
+    
+    def info(self) -> Dict[str, Any]:
+        """Describe the indexed metadata"""
+        return {
+            'n_rows': self.n_rows,
+            'filenames': len(self.categories['filename']),
+            'strategies': len(self.categories['strategy']),
+            'file_ranges': sum(len(ranges) for ranges in self.file_ranges)
+        }
@@ -0,0 +1,269 @@
+"""
+Ollama Balancer - Spread Ollama requests over several servers
+
+OLLAMA_BASE_URL may list several servers (comma or space separated). Each
+request goes to the healthy server with the fewest outstanding requests (ties:
+lowest recent latency). A server is ejected after OLLAMA_EJECT_AFTER_FAILURES
+consecutive failed requests (connection errors, timeouts, 5xx) or a failed
+health probe, and re-admitted when a probe (GET /api/tags, every
+OLLAMA_HEALTH_INTERVAL_SECONDS) succeeds again. A failed request is retried
+once on every other server before giving up. If every server is ejected,
+requests still go to the one ejected longest ago rather than failing outright.
+"""
+import logging
+import re
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional
+
+from config import OLLAMA_HEALTH_INTERVAL_SECONDS, OLLAMA_HEALTH_TIMEOUT_SECONDS, OLLAMA_EJECT_AFTER_FAILURES
+
+logger = logging.getLogger(__name__)
+
+# Optional dependencies
+try:
+    import requests
+    HAS_REQUESTS = True
+except ImportError:
+    HAS_REQUESTS = False
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+
+@dataclass
+class Endpoint:
+    """State and counters of one Ollama server"""
+    url: str = ""
+    healthy: bool = True
+    outstanding: int = 0
+    consecutive_failures: int = 0
+    requests: int = 0
+    failures: int = 0
+    ejections: int = 0
+    ejected_at: Optional[float] = None
+    ewma_seconds: Optional[float] = None
+    last_probe_ok: Optional[bool] = None
+    last_probe_at: Optional[float] = None
+    last_error: Optional[str] = None
+    latencies: deque = field(default_factory=lambda: deque(maxlen=1024), repr=False)
+    
+    def to_dict(self):
+        """Convert Endpoint to dictionary (latencies as percentiles)"""
+        latencies_ms = [seconds * 1000 for seconds in self.latencies]
+        stats = {
+            'url': self.url,
+            'healthy': self.healthy,
+            'outstanding': self.outstanding,
+            'requests': self.requests,
+            'failures': self.failures,
+            'consecutive_failures': self.consecutive_failures,
+            'ejections': self.ejections,
+            'ejected_at': self.ejected_at,
+            'ewma_ms': round(self.ewma_seconds * 1000, 3) if self.ewma_seconds is not None else None,
+            'last_probe_ok': self.last_probe_ok,
+            'last_probe_at': self.last_probe_at,
+            'last_error': self.last_error
+        }
+        for q in (50, 95, 99):
+            if latencies_ms and HAS_NUMPY:
+                stats[f'latency_p{q}_ms'] = round(float(np.percentile(latencies_ms, q)), 3)
+            else:
+                stats[f'latency_p{q}_ms'] = None
+        return stats
+
+
+class OllamaBalancer:
+    """Least-outstanding-requests balancing with health probes over a set of Ollama servers"""
+    
+    # Weight of the newest latency in the moving average used for tie-breaks
+    EWMA_ALPHA = 0.2
+    
+    # (urls) -> balancer
+    _balancers: Dict[tuple, 'OllamaBalancer'] = {}
+    _registry_lock = threading.Lock()
+    
+    def __init__(self, urls: List[str], health_interval: float = 10.0, health_timeout: float = 2.0,
+                 eject_after: int = 3):
+        """
+        Args:
+            urls: Server base URLs
+            health_interval: Seconds between health probes (<= 0 disables them)
+            health_timeout: Timeout of one probe
+            eject_after: Consecutive failed requests before a server is ejected
+        """
+        if not urls:
+            raise ValueError("At least one Ollama URL is required")
+        self.endpoints = [Endpoint(url=url) for url in urls]
+        self.name = ','.join(urls)
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self.eject_after = max(1, int(eject_after))
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._prober = None
+    
+    @staticmethod
+    def parse_urls(value: str) -> List[str]:
+        """Server URLs from an OLLAMA_BASE_URL value (comma / whitespace separated, duplicates dropped)"""
+        urls = [url.strip().rstrip('/') for url in re.split(r'[\s,;]+', value or '')]
+        return list(dict.fromkeys(url for url in urls if url))
+    
+    @staticmethod
+    def for_url(base_url: str) -> 'OllamaBalancer':
+        """Shared balancer of an OLLAMA_BASE_URL value; health probes start with it when it lists several servers"""
+        urls = tuple(OllamaBalancer.parse_urls(base_url))
+        with OllamaBalancer._registry_lock:
+            balancer = OllamaBalancer._balancers.get(urls)
+            if balancer is None:
+                balancer = OllamaBalancer(
+                    list(urls), OLLAMA_HEALTH_INTERVAL_SECONDS, OLLAMA_HEALTH_TIMEOUT_SECONDS, OLLAMA_EJECT_AFTER_FAILURES
+                )
+                if len(urls) > 1:
+                    balancer.start_health_checks()
+                OllamaBalancer._balancers[urls] = balancer
+            return balancer
+    
+    def _acquire(self, exclude) -> Optional[Endpoint]:
+        """Healthy endpoint with the fewest outstanding requests (not in exclude), counted as outstanding"""
+        with self._lock:
+            candidates = [e for e in self.endpoints if e.healthy and e.url not in exclude]
+            if not candidates and not any(e.healthy for e in self.endpoints):
+                # Everything is ejected: fail open on the server ejected longest ago
+                ejected = [e for e in self.endpoints if e.url not in exclude]
+                candidates = sorted(ejected, key=lambda e: e.ejected_at or 0.0)[:1]
+            if not candidates:
+                return None
+            endpoint = min(candidates, key=lambda e: (e.outstanding, e.ewma_seconds or 0.0))
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+            return endpoint
+    
+    def _release(self, endpoint: Endpoint, ok: bool, seconds: float, error: Optional[str] = None):
+        with self._lock:
+            endpoint.outstanding -= 1
+            if ok:
+                endpoint.consecutive_failures = 0
+                endpoint.latencies.append(seconds)
+                if endpoint.ewma_seconds is None:
+                    endpoint.ewma_seconds = seconds
+                else:
+                    endpoint.ewma_seconds += OllamaBalancer.EWMA_ALPHA * (seconds - endpoint.ewma_seconds)
+                if not endpoint.healthy:
+                    self._readmit_locked(endpoint, 'request succeeded')
+                return
+            endpoint.failures += 1
+            endpoint.consecutive_failures += 1
+            endpoint.last_error = error
+            if endpoint.healthy and endpoint.consecutive_failures >= self.eject_after:
+                self._eject_locked(endpoint, f'{endpoint.consecutive_failures} consecutive failures ({error})')
+    
+    def _eject_locked(self, endpoint: Endpoint, reason: str):
+        if len(self.endpoints) < 2:
+            return
+        endpoint.healthy = False
+        endpoint.ejections += 1
+        endpoint.ejected_at = time.time()
+        logger.warning(f"Ejected Ollama server {endpoint.url}: {reason}")
+    
+    def _readmit_locked(self, endpoint: Endpoint, reason: str):
+        endpoint.healthy = True
+        endpoint.consecutive_failures = 0
+        endpoint.ejected_at = None
+        logger.info(f"Re-admitted Ollama server {endpoint.url}: {reason}")
+    
+    def post(self, path: str, payload: Dict[str, Any], timeout: float = 60):
+        """
+        POST payload to path on the least busy healthy server
+        
+        Connection errors, timeouts and 5xx answers are retried once on each
+        other server.
+        
+        Returns:
+            The response (possibly a 4xx / 5xx one from the last server tried)
+        
+        Raises:
+            requests.exceptions.RequestException: if no server could be reached
+        """
+        tried = set()
+        last_response = None
+        last_error = None
+        while True:
+            endpoint = self._acquire(tried)
+            if endpoint is None:
+                break
+            tried.add(endpoint.url)
+            start = time.perf_counter()
+            try:
+                response = requests.post(f"{endpoint.url}{path}", json=payload, timeout=timeout)
+            except requests.exceptions.RequestException as e:
+                self._release(endpoint, False, time.perf_counter() - start, type(e).__name__)
+                last_error = e
+                continue
+            ok = response.status_code < 500
+            self._release(endpoint, ok, time.perf_counter() - start, None if ok else f'HTTP {response.status_code}')
+            if ok:
+                return response
+            last_response = response
+        
+        if last_response is not None:
+            return last_response
+        raise last_error or requests.exceptions.ConnectionError('No Ollama server available')
+    
+    def probe(self):
+        """Health-check every server once: eject failing ones, re-admit recovered ones"""
+        for endpoint in self.endpoints:
+            try:
+                ok = requests.get(f"{endpoint.url}/api/tags", timeout=self.health_timeout).status_code == 200
+                error = None if ok else 'health probe failed'
+            except requests.exceptions.RequestException as e:
+                ok, error = False, f'health probe: {type(e).__name__}'
+            with self._lock:
+                endpoint.last_probe_ok = ok
+                endpoint.last_probe_at = time.time()
+                if ok and not endpoint.healthy:
+                    self._readmit_locked(endpoint, 'health probe succeeded')
+                elif not ok and endpoint.healthy:
+                    endpoint.last_error = error
+                    self._eject_locked(endpoint, error)
+    
+    def start_health_checks(self):
+        """Probe all servers every health_interval seconds on a daemon thread"""
+        if self._prober is not None or self.health_interval <= 0 or not HAS_REQUESTS:
+            return
+        
+        def run():
+            while not self._stop.wait(self.health_interval):
+                try:
+                    self.probe()
+                except Exception as e:
+                    logger.error(f"Ollama health probe error: {e}")
+        
+        self._prober = threading.Thread(target=run, name='ollama-health', daemon=True)
+        self._prober.start()
+    
+    def stop_health_checks(self):
+        self._stop.set()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Per-server health, outstanding requests, failures and latency percentiles"""
+        with self._lock:
+            endpoints = [endpoint.to_dict() for endpoint in self.endpoints]
+        return {
+            'servers': len(endpoints),
+            'healthy': sum(1 for endpoint in endpoints if endpoint['healthy']),
+            'health_interval_seconds': self.health_interval if len(endpoints) > 1 else None,
+            'eject_after_failures': self.eject_after,
+            'endpoints': endpoints
+        }
+    
+    @staticmethod
+    def get_all_stats() -> Dict[str, Any]:
+        with OllamaBalancer._registry_lock:
+            balancers = list(OllamaBalancer._balancers.values())
+        return {balancer.name: balancer.stats() for balancer in balancers}
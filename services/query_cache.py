@@ -0,0 +1,92 @@
+"""
+Query Cache - Thread-safe LRU cache with hit-rate statistics
+
+Used for query vectors ((method, model, query text) -> embedding) and ranked
+retrieval results ((query hash, index version, k, filters, ...) -> ranking).
+Entries can carry a tag (e.g. an embedding set fingerprint) so everything
+derived from a set is dropped at once when that set changes version.
+"""
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class QueryCache:
+    """Bounded LRU mapping with hit / miss / eviction counters"""
+    
+    def __init__(self, name: str, max_entries: int):
+        """
+        Args:
+            name: Cache name (for stats and logs)
+            max_entries: Maximum number of entries (0 disables caching)
+        """
+        self.name = name
+        self.max_entries = max(int(max_entries), 0)
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._tags: Dict[Hashable, Optional[str]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+    
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Cached value (marked as recently used), or None"""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+    
+    def put(self, key: Hashable, value: Any, tag: Optional[str] = None) -> None:
+        """Store a value, evicting least recently used entries"""
+        if self.max_entries == 0 or value is None:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            self._tags[key] = tag
+            while len(self._entries) > self.max_entries:
+                evicted_key, _ = self._entries.popitem(last=False)
+                self._tags.pop(evicted_key, None)
+                self.evictions += 1
+    
+    def invalidate(self, tag: str) -> int:
+        """Drop every entry stored with the given tag; returns the number dropped"""
+        with self._lock:
+            keys = [key for key, entry_tag in self._tags.items() if entry_tag == tag]
+            for key in keys:
+                self._entries.pop(key, None)
+                self._tags.pop(key, None)
+            self.invalidations += len(keys)
+        if keys:
+            logger.info(f"Invalidated {len(keys)} entries of the {self.name} cache")
+        return len(keys)
+    
+    def clear(self) -> None:
+        """Drop all entries and reset counters"""
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+            self.hits = self.misses = self.evictions = self.invalidations = 0
+    
+    def stats(self) -> Dict[str, Any]:
+        """Size, hit rate and eviction counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'name': self.name,
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations
+            }
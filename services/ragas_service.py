@@ -12,6 +12,8 @@ import logging
 from typing import List, Dict, Any, Optional
 import re
 
+from services.vector_math import VectorMath
+
 logger = logging.getLogger(__name__)
 
 # Optional dependencies
@@ -36,18 +38,7 @@ class RAGASService:
     @staticmethod
     def cosine_similarity_custom(vec1: List[float], vec2: List[float]) -> float:
         """Calculate cosine similarity between two vectors"""
-        if not HAS_NUMPY:
-            import math
-            dot_product = sum(a * b for a, b in zip(vec1, vec2))
-            magnitude1 = math.sqrt(sum(a * a for a in vec1))
-            magnitude2 = math.sqrt(sum(a * a for a in vec2))
-            if magnitude1 == 0 or magnitude2 == 0:
-                return 0.0
-            return dot_product / (magnitude1 * magnitude2)
-        else:
-            vec1_arr = np.array(vec1)
-            vec2_arr = np.array(vec2)
-            return float(np.dot(vec1_arr, vec2_arr) / (np.linalg.norm(vec1_arr) * np.linalg.norm(vec2_arr)))
+        return VectorMath.cosine(vec1, vec2)
     
     @staticmethod
     def extract_claims(text: str) -> List[str]:
@@ -2,7 +2,13 @@
 Retrieval Service - Layer 3: Retrieval Quality Evaluation
 Based on guide: "Evaluating Embedding Quality Before Ingesting into Vector Database"
 """
+import hashlib
+import json
 import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
 from typing import List, Dict, Any, Optional, Set, Tuple
 import math
 
@@ -16,32 +22,354 @@ except ImportError:
     HAS_NUMPY = False
     logger.warning("numpy not available, some metrics will not work")
 
-try:
-    from sklearn.metrics.pairwise import cosine_similarity
-    HAS_SKLEARN = True
-except ImportError:
-    HAS_SKLEARN = False
-    logger.warning("sklearn not available, similarity search will not work")
+from services.embedding_set import EmbeddingSet
+from services.vector_math import VectorMath
+from services.hnsw_index import HNSWIndex
+from services.ivfpq_index import IVFPQIndex
+from services.bm25_index import BM25Index
+from services.metadata_index import MetadataIndex
+from services.query_cache import QueryCache
+from services.sharded_search import ShardedSearcher
+from services.singleflight import SingleFlight
+from config import QUERY_RESULT_CACHE_SIZE
 
 
 class RetrievalService:
     """Service for evaluating retrieval quality (Layer 3)"""
     
+    # Embedding sets keyed by (fingerprint, version, storage dtype), LRU order.
+    # Re-evaluating the same document embeddings reuses the stored / quantized set.
+    _embedding_sets: "OrderedDict[Tuple[str, int, str], EmbeddingSet]" = OrderedDict()
+    _embedding_sets_lock = threading.Lock()
+    
+    # ANN indexes and sharded searchers keyed by (fingerprint, dtype, method), LRU order
+    _ann_indexes: "OrderedDict[Tuple[str, str, str], Any]" = OrderedDict()
+    # Concurrent first queries of one key wait for a single build
+    _ann_flight = SingleFlight('ann_indexes')
+    # Searches in progress per index (id -> count); an evicted index is closed by its last search
+    _ann_leases: Dict[int, int] = {}
+    _ann_retired: Dict[int, Any] = {}
+    
+    # 'sharded' is exact search split across worker processes
+    SEARCH_METHODS = ('exact', 'hnsw', 'ivfpq', 'sharded')
+    
+    # Per-query parameters accepted by each ANN method
+    SEARCH_PARAMS = {
+        'hnsw': ('ef_search',),
+        'ivfpq': ('nprobe', 'rerank')
+    }
+    
+    # Dense (embeddings), sparse (BM25 over chunk texts) or fused rankings
+    RETRIEVAL_MODES = ('dense', 'bm25', 'hybrid')
+    FUSION_METHODS = ('rrf', 'weighted')
+    
+    # BM25 indexes keyed by text-list fingerprint, LRU order
+    _bm25_indexes: "OrderedDict[str, BM25Index]" = OrderedDict()
+    
+    # Metadata indexes keyed by metadata fingerprint, LRU order
+    _metadata_indexes: "OrderedDict[str, MetadataIndex]" = OrderedDict()
+    
+    # Ranked results keyed by query, index version, k, filters and search settings;
+    # tagged with the searched set's fingerprint for invalidation
+    _result_cache = QueryCache('query_results', QUERY_RESULT_CACHE_SIZE)
+    
+    @staticmethod
+    def get_embedding_set(document_embeddings, storage_dtype: Optional[str] = None) -> EmbeddingSet:
+        """
+        Get (or build and cache) the embedding set for a document matrix
+        
+        Args:
+            document_embeddings: 2-D array-like of document vectors, or an EmbeddingSet
+            storage_dtype: 'float32', 'float16' or 'int8' (default: the set's own dtype, else config)
+        
+        Returns:
+            EmbeddingSet stored in the requested dtype
+        """
+        from config import EMBEDDING_STORAGE_DTYPE, EMBEDDING_SET_CACHE_SIZE
+        
+        if isinstance(document_embeddings, EmbeddingSet):
+            if storage_dtype is None or document_embeddings.dtype == storage_dtype:
+                return document_embeddings
+            # Another set (e.g. a memory-mapped store) in the requested dtype: keyed on its
+            # fingerprint / version, so the matrix is only read back on a miss
+            source = document_embeddings
+            key = (source.fingerprint, source.version, storage_dtype)
+        else:
+            if storage_dtype is None:
+                storage_dtype = EMBEDDING_STORAGE_DTYPE
+            source = np.asarray(document_embeddings, dtype=np.float32)
+            key = (EmbeddingSet.compute_fingerprint(source), 1, storage_dtype)
+        
+        with RetrievalService._embedding_sets_lock:
+            embedding_set = RetrievalService._embedding_sets.get(key)
+            if embedding_set is not None:
+                RetrievalService._embedding_sets.move_to_end(key)
+                return embedding_set
+        
+        X = source.reconstruct() if isinstance(source, EmbeddingSet) else source
+        embedding_set = EmbeddingSet(X, dtype=storage_dtype, fingerprint=key[0], version=key[1])
+        
+        with RetrievalService._embedding_sets_lock:
+            RetrievalService._embedding_sets[key] = embedding_set
+            while len(RetrievalService._embedding_sets) > max(EMBEDDING_SET_CACHE_SIZE, 1):
+                RetrievalService._embedding_sets.popitem(last=False)
+        
+        return embedding_set
+    
+    @staticmethod
+    def get_ann_index(embedding_set: EmbeddingSet, method: str = 'hnsw'):
+        """
+        Get (or build once and cache) an approximate nearest-neighbor index
+        (or a sharded multi-process searcher) for an embedding set
+        
+        Args:
+            embedding_set: EmbeddingSet to index
+            method: Index type ('hnsw', 'ivfpq' or 'sharded')
+        
+        Returns:
+            Index object exposing search(query, top_k, **search_params) and info()
+        """
+        from config import (ANN_BACKEND, HNSW_M, HNSW_EF_CONSTRUCTION, HNSW_EF_SEARCH,
+                            IVFPQ_N_LISTS, IVFPQ_M, IVFPQ_NPROBE, IVFPQ_RERANK, EMBEDDING_SET_CACHE_SIZE,
+                            SHARDED_WORKERS, SHARDED_START_METHOD)
+        
+        if method not in RetrievalService.SEARCH_METHODS or method == 'exact':
+            raise ValueError(f"Unsupported ANN method: {method}")
+        
+        key = (embedding_set.fingerprint, embedding_set.dtype, method)
+        
+        with RetrievalService._embedding_sets_lock:
+            index = RetrievalService._ann_indexes.get(key)
+            if index is not None:
+                RetrievalService._ann_indexes.move_to_end(key)
+                return index
+        
+        def build(keys):
+            # A build that finished between the lookup above and joining the flight is reused
+            with RetrievalService._embedding_sets_lock:
+                index = RetrievalService._ann_indexes.get(key)
+            if index is not None:
+                return [index]
+            
+            if method == 'sharded':
+                index = ShardedSearcher(
+                    embedding_set,
+                    n_shards=SHARDED_WORKERS or None,
+                    start_method=SHARDED_START_METHOD
+                )
+            elif method == 'ivfpq':
+                index = IVFPQIndex(
+                    embedding_set,
+                    n_lists=IVFPQ_N_LISTS or None,
+                    m=IVFPQ_M,
+                    nprobe=IVFPQ_NPROBE,
+                    rerank=IVFPQ_RERANK
+                )
+            else:
+                index = HNSWIndex(
+                    embedding_set,
+                    M=HNSW_M,
+                    ef_construction=HNSW_EF_CONSTRUCTION,
+                    ef_search=HNSW_EF_SEARCH,
+                    backend=ANN_BACKEND
+                )
+            
+            with RetrievalService._embedding_sets_lock:
+                RetrievalService._ann_indexes[key] = index
+                evicted = []
+                while len(RetrievalService._ann_indexes) > max(EMBEDDING_SET_CACHE_SIZE, 1):
+                    evicted.append(RetrievalService._ann_indexes.popitem(last=False)[1])
+                to_close = RetrievalService._retire_ann_indexes(evicted)
+            RetrievalService._close_ann_indexes(to_close)
+            return [index]
+        
+        indexes = RetrievalService._ann_flight.run_batch([key], build)
+        if indexes is None:
+            raise RuntimeError(f"Building the {method} index failed in a concurrent request")
+        return indexes[0]
+    
+    @staticmethod
+    @contextmanager
+    def lease_ann_index(embedding_set: EmbeddingSet, method: str = 'hnsw'):
+        """
+        Hold a cached ANN index for the block: if it is evicted meanwhile, it is
+        closed when the last block using it exits
+        
+        Args:
+            embedding_set: EmbeddingSet to index
+            method: Index type ('hnsw', 'ivfpq' or 'sharded')
+        """
+        while True:
+            index = RetrievalService.get_ann_index(embedding_set, method)
+            with RetrievalService._embedding_sets_lock:
+                # An index evicted and closed since the lookup is built again
+                if id(index) in RetrievalService._ann_retired or any(
+                    cached is index for cached in RetrievalService._ann_indexes.values()
+                ):
+                    RetrievalService._ann_leases[id(index)] = RetrievalService._ann_leases.get(id(index), 0) + 1
+                    break
+        
+        try:
+            yield index
+        finally:
+            to_close = []
+            with RetrievalService._embedding_sets_lock:
+                remaining = RetrievalService._ann_leases[id(index)] - 1
+                if remaining:
+                    RetrievalService._ann_leases[id(index)] = remaining
+                else:
+                    del RetrievalService._ann_leases[id(index)]
+                    retired = RetrievalService._ann_retired.pop(id(index), None)
+                    if retired is not None:
+                        to_close.append(retired)
+            RetrievalService._close_ann_indexes(to_close)
+    
+    @staticmethod
+    def _retire_ann_indexes(indexes: List[Any]) -> List[Any]:
+        """
+        Indexes dropped from the cache that can be closed now; those still in use
+        are kept until their last lease ends (call with _embedding_sets_lock held)
+        """
+        to_close = []
+        for index in indexes:
+            if not isinstance(index, ShardedSearcher):
+                continue
+            if RetrievalService._ann_leases.get(id(index)):
+                RetrievalService._ann_retired[id(index)] = index
+            else:
+                to_close.append(index)
+        return to_close
+    
+    @staticmethod
+    def _close_ann_indexes(indexes: List[Any]) -> None:
+        for index in indexes:
+            index.close()
+    
+    @staticmethod
+    def clear_ann_indexes() -> None:
+        """Drop cached ANN indexes and detach sharded searchers (in-use ones when their searches end)"""
+        with RetrievalService._embedding_sets_lock:
+            indexes = list(RetrievalService._ann_indexes.values())
+            RetrievalService._ann_indexes.clear()
+            to_close = RetrievalService._retire_ann_indexes(indexes)
+        RetrievalService._close_ann_indexes(to_close)
+    
+    @staticmethod
+    def ann_search(query_embedding: List[float],
+                   embedding_set: EmbeddingSet,
+                   top_k: int = 5,
+                   method: str = 'hnsw',
+                   search_params: Optional[Dict[str, Any]] = None) -> Tuple[List[Tuple[int, float]], Dict[str, Any]]:
+        """
+        Approximate search plus a report comparing it to exact search
+        
+        Returns:
+            Tuple of (results, report) where results are (index, similarity_score)
+            tuples and report holds latency and recall@top_k against exact search
+        """
+        with RetrievalService.lease_ann_index(embedding_set, method) as index:
+            start = time.perf_counter()
+            results = index.search(query_embedding, top_k, **(search_params or {}))
+            ann_seconds = time.perf_counter() - start
+            index_info = index.info()
+        
+        start = time.perf_counter()
+        exact = embedding_set.search(query_embedding, top_k)
+        exact_seconds = time.perf_counter() - start
+        
+        expected = {idx for idx, _ in exact}
+        found = {idx for idx, _ in results}
+        
+        report = {
+            'method': method,
+            'search_params': search_params or {},
+            'recall_vs_exact': round(len(expected & found) / len(expected), 4) if expected else None,
+            'search_ms': round(ann_seconds * 1000, 3),
+            'exact_search_ms': round(exact_seconds * 1000, 3),
+            'index': index_info
+        }
+        
+        return results, report
+    
+    @staticmethod
+    def get_bm25_index(document_texts: List[str]) -> BM25Index:
+        """
+        Get (or build once and cache) the BM25 index for a list of chunk texts
+        
+        Args:
+            document_texts: Chunk texts, in the same order as the document embeddings
+                (or an already built BM25Index)
+        
+        Returns:
+            BM25Index over the texts
+        """
+        from config import BM25_K1, BM25_B, EMBEDDING_SET_CACHE_SIZE
+        
+        if isinstance(document_texts, BM25Index):
+            return document_texts
+        
+        key = BM25Index.compute_fingerprint(document_texts)
+        
+        with RetrievalService._embedding_sets_lock:
+            index = RetrievalService._bm25_indexes.get(key)
+            if index is not None:
+                RetrievalService._bm25_indexes.move_to_end(key)
+                return index
+        
+        index = BM25Index(document_texts, k1=BM25_K1, b=BM25_B)
+        
+        with RetrievalService._embedding_sets_lock:
+            RetrievalService._bm25_indexes[key] = index
+            while len(RetrievalService._bm25_indexes) > max(EMBEDDING_SET_CACHE_SIZE, 1):
+                RetrievalService._bm25_indexes.popitem(last=False)
+        
+        return index
+    
+    @staticmethod
+    def fuse_rankings(rankings: List[List[Tuple[int, float]]],
+                      method: str = 'rrf',
+                      weights: Optional[List[float]] = None,
+                      rrf_k: int = 60) -> List[Tuple[int, float]]:
+        """
+        Fuse several rankings of (index, score) into one
+        
+        Args:
+            rankings: Rankings sorted by score descending (e.g. dense and BM25)
+            method: 'rrf' (reciprocal rank fusion: sum of w / (rrf_k + rank)) or
+                    'weighted' (weighted sum of per-ranking min-max normalized scores)
+            weights: Per-ranking weights (default: equal)
+            rrf_k: RRF rank offset
+        
+        Returns:
+            List of (index, fused_score) tuples, sorted by score descending
+        """
+        if method not in RetrievalService.FUSION_METHODS:
+            raise ValueError(f"Unsupported fusion method: {method}")
+        
+        if weights is None:
+            weights = [1.0] * len(rankings)
+        
+        fused: Dict[int, float] = {}
+        for ranking, weight in zip(rankings, weights):
+            if not ranking:
+                continue
+            if method == 'rrf':
+                for rank, (idx, _) in enumerate(ranking, start=1):
+                    fused[idx] = fused.get(idx, 0.0) + weight / (rrf_k + rank)
+            else:
+                scores = [score for _, score in ranking]
+                low, high = min(scores), max(scores)
+                span = high - low
+                for idx, score in ranking:
+                    normalized = (score - low) / span if span > 0 else 1.0
+                    fused[idx] = fused.get(idx, 0.0) + weight * normalized
+        
+        return sorted(fused.items(), key=lambda item: (-item[1], item[0]))
+    
     @staticmethod
     def cosine_similarity_custom(vec1: List[float], vec2: List[float]) -> float:
         """Calculate cosine similarity between two vectors"""
-        if not HAS_NUMPY:
-            # Manual calculation
-            dot_product = sum(a * b for a, b in zip(vec1, vec2))
-            magnitude1 = math.sqrt(sum(a * a for a in vec1))
-            magnitude2 = math.sqrt(sum(a * a for a in vec2))
-            if magnitude1 == 0 or magnitude2 == 0:
-                return 0.0
-            return dot_product / (magnitude1 * magnitude2)
-        else:
-            vec1_arr = np.array(vec1)
-            vec2_arr = np.array(vec2)
-            return float(np.dot(vec1_arr, vec2_arr) / (np.linalg.norm(vec1_arr) * np.linalg.norm(vec2_arr)))
+        return VectorMath.cosine(vec1, vec2)
     
     @staticmethod
     def search_similar(query_embedding: List[float], 
@@ -50,17 +378,26 @@ class RetrievalService:
         """
         Search for most similar documents using cosine similarity
         
+        document_embeddings may be an EmbeddingSet, in which case the search
+        runs vectorized on its stored (possibly quantized) representation.
+        
         Returns:
             List of (index, similarity_score) tuples, sorted by score descending
         """
-        similarities = []
+        if isinstance(document_embeddings, EmbeddingSet):
+            return document_embeddings.search(query_embedding, top_k)
         
-        for i, doc_emb in enumerate(document_embeddings):
-            if HAS_SKLEARN:
-                sim = float(cosine_similarity([query_embedding], [doc_emb])[0][0])
-            else:
-                sim = RetrievalService.cosine_similarity_custom(query_embedding, doc_emb)
-            similarities.append((i, sim))
+        if HAS_NUMPY:
+            if not len(document_embeddings):
+                return []
+            # Normalize once; every similarity is then one row of a matrix-vector product
+            unit_rows, _ = VectorMath.normalize_rows(document_embeddings)
+            return VectorMath.top_k(unit_rows, VectorMath.normalize(query_embedding), top_k)
+        
+        similarities = [
+            (i, VectorMath.cosine(query_embedding, doc_emb))
+            for i, doc_emb in enumerate(document_embeddings)
+        ]
         
         # Sort by similarity descending
         similarities.sort(key=lambda x: x[1], reverse=True)
@@ -186,86 +523,482 @@ class RetrievalService:
         return dcg / idcg
     
     @staticmethod
-    def evaluate_retrieval_quality(query_embedding: List[float],
-                                   document_embeddings: List[List[float]],
-                                   relevant_doc_indices: Set[int],
-                                   k_values: List[int] = [5, 10],
-                                   relevance_scores: Optional[Dict[int, float]] = None) -> Dict[str, Any]:
+    def score_ranking(ranking: List[Tuple[int, float]],
+                      relevant_doc_indices: Set[int],
+                      k_values: List[int] = [5, 10],
+                      relevance_scores: Optional[Dict[int, float]] = None) -> Dict[str, Any]:
         """
-        Comprehensive retrieval quality evaluation
+        Score a ranking with Precision@K, Recall@K and (optionally) NDCG@K
+        
+        Shared by dense, ANN, BM25 and hybrid retrieval so every mode is measured
+        with the same functions.
         
         Args:
-            query_embedding: Query embedding vector
-            document_embeddings: List of document embedding vectors
+            ranking: List of (index, score) tuples, sorted by score descending
             relevant_doc_indices: Set of indices of relevant documents
-            k_values: List of K values to evaluate (default: [5, 10])
+            k_values: List of K values to evaluate
             relevance_scores: Optional dict mapping doc index to relevance score (for NDCG)
         
         Returns:
-            Dict with evaluation results
+            Dict of metric results plus 'retrieved_documents'
         """
-        try:
-            # Search for similar documents
-            all_similarities = RetrievalService.search_similar(
-                query_embedding, 
-                document_embeddings, 
-                top_k=max(k_values) if k_values else 10
-            )
+        retrieved_indices = [idx for idx, _ in ranking]
+        
+        results = {}
+        
+        # Precision@K and Recall@K
+        for k in k_values:
+            precision = RetrievalService.precision_at_k(retrieved_indices, relevant_doc_indices, k)
+            recall = RetrievalService.recall_at_k(retrieved_indices, relevant_doc_indices, k)
             
-            retrieved_indices = [idx for idx, _ in all_similarities]
+            results[f'precision_at_{k}'] = {
+                'score': round(precision, 4),
+                'thresholds': {
+                    'minimum': 0.5,
+                    'good': 0.6,
+                    'excellent': 0.8
+                },
+                'quality_level': 'EXCELLENT' if precision >= 0.8 else 'GOOD' if precision >= 0.6 else 'ACCEPTABLE' if precision >= 0.5 else 'NEEDS_IMPROVEMENT',
+                'description': f'Precision@K đo lường tỷ lệ documents liên quan trong top-{k} kết quả. Giá trị cao hơn là tốt hơn.'
+            }
             
-            results = {}
+            results[f'recall_at_{k}'] = {
+                'score': round(recall, 4),
+                'thresholds': {
+                    'minimum': 0.6,
+                    'good': 0.7,
+                    'excellent': 0.9
+                },
+                'quality_level': 'EXCELLENT' if recall >= 0.9 else 'GOOD' if recall >= 0.7 else 'ACCEPTABLE' if recall >= 0.6 else 'NEEDS_IMPROVEMENT',
+                'description': f'Recall@K đo lường tỷ lệ documents liên quan được lấy trong top-{k} kết quả. Giá trị cao hơn là tốt hơn.'
+            }
             
-            # Precision@K and Recall@K
-            for k in k_values:
-                precision = RetrievalService.precision_at_k(retrieved_indices, relevant_doc_indices, k)
-                recall = RetrievalService.recall_at_k(retrieved_indices, relevant_doc_indices, k)
-                
-                results[f'precision_at_{k}'] = {
-                    'score': round(precision, 4),
+            # NDCG@K if relevance scores provided
+            if relevance_scores:
+                ndcg = RetrievalService.ndcg_at_k(retrieved_indices, relevance_scores, k)
+                results[f'ndcg_at_{k}'] = {
+                    'score': round(ndcg, 4),
                     'thresholds': {
                         'minimum': 0.5,
-                        'good': 0.6,
-                        'excellent': 0.8
-                    },
-                    'quality_level': 'EXCELLENT' if precision >= 0.8 else 'GOOD' if precision >= 0.6 else 'ACCEPTABLE' if precision >= 0.5 else 'NEEDS_IMPROVEMENT',
-                    'description': f'Precision@K đo lường tỷ lệ documents liên quan trong top-{k} kết quả. Giá trị cao hơn là tốt hơn.'
-                }
-                
-                results[f'recall_at_{k}'] = {
-                    'score': round(recall, 4),
-                    'thresholds': {
-                        'minimum': 0.6,
                         'good': 0.7,
                         'excellent': 0.9
                     },
-                    'quality_level': 'EXCELLENT' if recall >= 0.9 else 'GOOD' if recall >= 0.7 else 'ACCEPTABLE' if recall >= 0.6 else 'NEEDS_IMPROVEMENT',
-                    'description': f'Recall@K đo lường tỷ lệ documents liên quan được lấy trong top-{k} kết quả. Giá trị cao hơn là tốt hơn.'
+                    'quality_level': 'EXCELLENT' if ndcg >= 0.9 else 'GOOD' if ndcg >= 0.7 else 'ACCEPTABLE' if ndcg >= 0.5 else 'NEEDS_IMPROVEMENT',
+                    'description': f'NDCG@K đo lường chất lượng ranking, xét cả mức độ liên quan và vị trí. Giá trị cao hơn là tốt hơn.'
                 }
-                
-                # NDCG@K if relevance scores provided
-                if relevance_scores:
-                    ndcg = RetrievalService.ndcg_at_k(retrieved_indices, relevance_scores, k)
-                    results[f'ndcg_at_{k}'] = {
-                        'score': round(ndcg, 4),
-                        'thresholds': {
-                            'minimum': 0.5,
-                            'good': 0.7,
-                            'excellent': 0.9
-                        },
-                        'quality_level': 'EXCELLENT' if ndcg >= 0.9 else 'GOOD' if ndcg >= 0.7 else 'ACCEPTABLE' if ndcg >= 0.5 else 'NEEDS_IMPROVEMENT',
-                        'description': f'NDCG@K đo lường chất lượng ranking, xét cả mức độ liên quan và vị trí. Giá trị cao hơn là tốt hơn.'
-                    }
+        
+        # Add retrieved results info
+        results['retrieved_documents'] = [
+            {
+                'index': idx,
+                'similarity': round(sim, 4),
+                'is_relevant': idx in relevant_doc_indices
+            }
+            for idx, sim in ranking[:max(k_values) if k_values else 10]
+        ]
+        
+        return results
+    
+    @staticmethod
+    def get_metadata_index(document_metadata) -> MetadataIndex:
+        """
+        Get (or build once and cache) the metadata index for per-row chunk metadata
+        
+        Args:
+            document_metadata: List of dicts (filename, strategy, position) aligned with
+                the document embeddings, or an already built MetadataIndex
+        """
+        from config import EMBEDDING_SET_CACHE_SIZE
+        
+        if isinstance(document_metadata, MetadataIndex):
+            return document_metadata
+        
+        key = MetadataIndex.compute_fingerprint(document_metadata)
+        
+        with RetrievalService._embedding_sets_lock:
+            index = RetrievalService._metadata_indexes.get(key)
+            if index is not None:
+                RetrievalService._metadata_indexes.move_to_end(key)
+                return index
+        
+        index = MetadataIndex(document_metadata)
+        
+        with RetrievalService._embedding_sets_lock:
+            RetrievalService._metadata_indexes[key] = index
+            while len(RetrievalService._metadata_indexes) > max(EMBEDDING_SET_CACHE_SIZE, 1):
+                RetrievalService._metadata_indexes.popitem(last=False)
+        
+        return index
+    
+    @staticmethod
+    def retrieve(query_embedding: Optional[List[float]],
+                 document_embeddings: List[List[float]],
+                 top_k: int = 10,
+                 storage_dtype: Optional[str] = None,
+                 search_method: str = 'exact',
+                 search_params: Optional[Dict[str, Any]] = None,
+                 retrieval_mode: str = 'dense',
+                 query_text: Optional[str] = None,
+                 document_texts: Optional[List[str]] = None,
+                 fusion: str = 'rrf',
+                 alpha: float = 0.5,
+                 filters: Optional[Dict[str, Any]] = None,
+                 document_metadata=None,
+                 mmr_lambda: Optional[float] = None,
+                 mmr_candidates: Optional[int] = None) -> Tuple[List[Tuple[int, float]], Dict[str, Any]]:
+        """
+        Rank documents for one query (dense, BM25 or hybrid, optionally filtered)
+        
+        Args:
+            query_embedding: Query embedding vector (unused in 'bm25' mode)
+            document_embeddings: List of document embedding vectors (or an EmbeddingSet)
+            top_k: Number of results
+            storage_dtype: Search an EmbeddingSet stored as 'float32', 'float16' or 'int8'
+            search_method: 'exact' or an ANN index ('hnsw', 'ivfpq')
+            search_params: Per-query ANN parameters (e.g. {'ef_search': 128} or {'nprobe': 16, 'rerank': 50})
+            retrieval_mode: 'dense', 'bm25' or 'hybrid' (dense + BM25 fused)
+            query_text: Query text for BM25 ('bm25' / 'hybrid')
+            document_texts: Chunk texts aligned with the document embeddings ('bm25' / 'hybrid')
+            fusion: Hybrid fusion, 'rrf' or 'weighted'
+            alpha: Dense weight in hybrid fusion (BM25 gets 1 - alpha)
+            filters: Metadata predicates (filename, strategy, position_min, position_max);
+                only matching rows are scored
+            document_metadata: Per-row metadata (list of dicts or MetadataIndex), required with filters
+            mmr_lambda: Enables MMR re-ranking of the candidates (1.0 = relevance only, 0.0 = diversity only)
+            mmr_candidates: Candidates re-ranked by MMR (default: MMR_CANDIDATES)
+        
+        Returns:
+            Tuple of (ranking, reports) where ranking is a list of (index, score) tuples
+            (by score descending, or in MMR selection order) and reports holds
+            storage / ann / lexical / filter / diversity info
+        """
+        from config import HYBRID_CANDIDATES, HYBRID_RRF_K, MMR_CANDIDATES
+        
+        if retrieval_mode not in RetrievalService.RETRIEVAL_MODES:
+            raise ValueError(f"Unsupported retrieval mode: {retrieval_mode}")
+        
+        reports: Dict[str, Any] = {}
+        
+        metadata_index = None
+        if filters:
+            if document_metadata is None:
+                raise ValueError('document_metadata is required for filtered search')
+            metadata_index = RetrievalService.get_metadata_index(document_metadata)
+        
+        use_mmr = mmr_lambda is not None
+        if use_mmr and not 0.0 <= float(mmr_lambda) <= 1.0:
+            raise ValueError('mmr_lambda must be between 0 and 1')
+        
+        if retrieval_mode != 'bm25' or use_mmr:
+            if document_embeddings is None or len(document_embeddings) == 0:
+                raise ValueError('document embeddings are required for dense retrieval and MMR')
+            document_embeddings = RetrievalService.get_embedding_set(document_embeddings, storage_dtype)
+        
+        bm25_index = None
+        if retrieval_mode != 'dense':
+            if not document_texts:
+                raise ValueError('document_texts are required for bm25 / hybrid retrieval')
+            bm25_index = RetrievalService.get_bm25_index(document_texts)
+        
+        cache_key = RetrievalService._result_cache_key(
+            query_embedding if retrieval_mode != 'bm25' else None,
+            query_text if retrieval_mode != 'dense' else None,
+            document_embeddings if isinstance(document_embeddings, EmbeddingSet) else None,
+            bm25_index, metadata_index, filters, top_k, search_method, search_params,
+            retrieval_mode, fusion, alpha,
+            (float(mmr_lambda), mmr_candidates) if use_mmr else None
+        )
+        cached = RetrievalService._result_cache.get(cache_key)
+        if cached is not None:
+            ranking, reports = cached
+            return list(ranking), dict(reports, cache='hit')
+        
+        # Compile metadata predicates into row ids before any scoring
+        rows = metadata_index.compile(filters) if metadata_index is not None else None
+        if rows is not None:
+            reports['filter'] = {
+                'filters': filters,
+                'rows_scanned': int(len(rows)),
+                'total_rows': metadata_index.n_rows
+            }
+        
+        # MMR re-ranks a deeper candidate list than the K requested
+        n_keep = max(top_k, int(mmr_candidates or MMR_CANDIDATES)) if use_mmr else top_k
+        
+        # Hybrid fuses deeper candidate lists than the K requested
+        depth = max(n_keep, HYBRID_CANDIDATES) if retrieval_mode == 'hybrid' else n_keep
+        
+        # Search for similar documents
+        dense_ranking = []
+        if retrieval_mode != 'bm25':
+            if rows is not None:
+                # ANN indexes cover the whole set, so scoped queries scan only the selected rows exactly
+                dense_ranking = document_embeddings.search(query_embedding, depth, rows=rows)
+                reports['filter']['search_method'] = 'exact'
+            elif search_method != 'exact':
+                dense_ranking, reports['ann'] = RetrievalService.ann_search(
+                    query_embedding,
+                    document_embeddings,
+                    top_k=depth,
+                    method=search_method,
+                    search_params=search_params
+                )
+            else:
+                dense_ranking = RetrievalService.search_similar(
+                    query_embedding, 
+                    document_embeddings, 
+                    top_k=depth
+                )
             
-            # Add retrieved results info
-            results['retrieved_documents'] = [
-                {
-                    'index': idx,
-                    'similarity': round(sim, 4),
-                    'is_relevant': idx in relevant_doc_indices
-                }
-                for idx, sim in all_similarities[:max(k_values) if k_values else 10]
-            ]
+            if isinstance(document_embeddings, EmbeddingSet):
+                reports['storage'] = document_embeddings.storage_info()
+        
+        sparse_ranking = []
+        if bm25_index is not None:
+            sparse_ranking = bm25_index.search(query_text or '', depth, rows=rows)
+            reports['lexical'] = {
+                'retrieval_mode': retrieval_mode,
+                'fusion': fusion if retrieval_mode == 'hybrid' else None,
+                'alpha': alpha if retrieval_mode == 'hybrid' else None,
+                'candidates': depth,
+                'bm25_matches': len(sparse_ranking),
+                'index': bm25_index.info()
+            }
+        
+        if retrieval_mode == 'hybrid':
+            ranking = RetrievalService.fuse_rankings(
+                [dense_ranking, sparse_ranking],
+                method=fusion,
+                weights=[alpha, 1.0 - alpha],
+                rrf_k=HYBRID_RRF_K
+            )[:n_keep]
+        elif retrieval_mode == 'bm25':
+            ranking = sparse_ranking
+        else:
+            ranking = dense_ranking
+        
+        if use_mmr:
+            ranking, reports['diversity'] = RetrievalService.mmr_rerank(
+                query_embedding if retrieval_mode != 'bm25' else None,
+                document_embeddings,
+                ranking,
+                top_k=top_k,
+                lambda_mult=float(mmr_lambda)
+            )
+        
+        # Stale versions never match a key; tagged entries are also dropped on store updates
+        if isinstance(document_embeddings, EmbeddingSet):
+            tag = document_embeddings.fingerprint
+        else:
+            tag = bm25_index.fingerprint
+        RetrievalService._result_cache.put(cache_key, (ranking, reports), tag=tag)
+        
+        return list(ranking), dict(reports, cache='miss')
+    
+    @staticmethod
+    def _result_cache_key(query_embedding, query_text, embedding_set, bm25_index, metadata_index,
+                          filters, top_k, search_method, search_params, retrieval_mode, fusion, alpha,
+                          mmr=None) -> Tuple:
+        """Result cache key: query hash plus everything that can change the ranking"""
+        query_hash = None
+        if query_embedding is not None:
+            query_hash = hashlib.sha1(np.asarray(query_embedding, dtype=np.float32).tobytes()).hexdigest()
+        return (
+            query_hash,
+            query_text,
+            (embedding_set.fingerprint, embedding_set.version, embedding_set.dtype) if embedding_set is not None else None,
+            bm25_index.fingerprint if bm25_index is not None else None,
+            metadata_index.fingerprint if metadata_index is not None else None,
+            json.dumps(filters, sort_keys=True) if filters else None,
+            int(top_k),
+            search_method,
+            json.dumps(search_params, sort_keys=True) if search_params else None,
+            retrieval_mode,
+            fusion if retrieval_mode == 'hybrid' else None,
+            float(alpha) if retrieval_mode == 'hybrid' else None,
+            mmr
+        )
+    
+    @staticmethod
+    def mmr_select(relevance, similarity, top_k: int, lambda_mult: float = 0.5) -> List[int]:
+        """
+        Greedy maximal marginal relevance selection
+        
+        Each step picks argmax(lambda * relevance - (1 - lambda) * max similarity to
+        the already selected candidates); the running max is updated with one row of
+        the precomputed similarity matrix, so a step is O(n) NumPy work.
+        
+        Args:
+            relevance: (n,) candidate relevance to the query
+            similarity: (n, n) candidate-candidate cosine similarity
+            top_k: Number of candidates to select
+            lambda_mult: Relevance / diversity trade-off
+        
+        Returns:
+            Selected candidate positions, in selection order
+        """
+        relevance = np.asarray(relevance, dtype=np.float32)
+        n = len(relevance)
+        top_k = min(int(top_k), n)
+        
+        # -1 is the lowest cosine, so the first pick is by relevance alone
+        max_similarity = np.full(n, -1.0, dtype=np.float32)
+        available = np.ones(n, dtype=bool)
+        selected = []
+        for _ in range(top_k):
+            mmr = lambda_mult * relevance - (1.0 - lambda_mult) * max_similarity
+            mmr[~available] = -np.inf
+            pick = int(np.argmax(mmr))
+            selected.append(pick)
+            available[pick] = False
+            np.maximum(max_similarity, similarity[pick], out=max_similarity)
+        return selected
+    
+    @staticmethod
+    def diversity_metrics(similarity, relevance, duplicate_threshold: float) -> Dict[str, Any]:
+        """Pairwise similarity / near-duplicate statistics of a result list"""
+        n = len(relevance)
+        pairs = similarity[np.triu_indices(n, k=1)]
+        return {
+            'n_results': n,
+            'mean_pairwise_similarity': round(float(pairs.mean()), 4) if len(pairs) else None,
+            'max_pairwise_similarity': round(float(pairs.max()), 4) if len(pairs) else None,
+            'near_duplicate_pairs': int((pairs >= duplicate_threshold).sum()),
+            'mean_relevance': round(float(np.mean(relevance)), 4) if n else None
+        }
+    
+    @staticmethod
+    def mmr_rerank(query_embedding: Optional[List[float]],
+                   embedding_set: EmbeddingSet,
+                   candidates: List[Tuple[int, float]],
+                   top_k: int = 10,
+                   lambda_mult: float = 0.5) -> Tuple[List[Tuple[int, float]], Dict[str, Any]]:
+        """
+        Diversify a ranked candidate list with maximal marginal relevance
+        
+        Args:
+            query_embedding: Query vector; relevance is its cosine to each candidate.
+                When None (BM25), min-max normalized candidate scores are used instead
+            embedding_set: Set holding the candidate vectors
+            candidates: Ranked (index, score) candidates (top-N)
+            top_k: Number of results kept
+            lambda_mult: 1.0 = relevance only, 0.0 = diversity only
+        
+        Returns:
+            Tuple of (re-ranked (index, original score) list, diversity report
+            comparing the plain top-k with the MMR selection)
+        """
+        from config import MMR_DUPLICATE_THRESHOLD
+        
+        report = {
+            'method': 'mmr',
+            'lambda': lambda_mult,
+            'candidates': len(candidates),
+            'duplicate_threshold': MMR_DUPLICATE_THRESHOLD
+        }
+        if not candidates:
+            return [], report
+        
+        ids = np.array([idx for idx, _ in candidates], dtype=np.int64)
+        scores = np.array([score for _, score in candidates], dtype=np.float32)
+        
+        # Candidate vectors are read once; similarities come from one matrix product
+        vectors = np.asarray(embedding_set.reconstruct(ids), dtype=np.float32)
+        if not embedding_set.normalized:
+            vectors, _ = VectorMath.normalize_rows(vectors)
+        similarity = VectorMath.similarity_matrix(vectors)
+        
+        if query_embedding is not None:
+            relevance = vectors @ VectorMath.normalize(query_embedding)
+        else:
+            spread = float(scores.max() - scores.min())
+            relevance = (scores - scores.min()) / spread if spread > 0 else np.ones(len(ids), dtype=np.float32)
+        
+        selected = RetrievalService.mmr_select(relevance, similarity, top_k, lambda_mult)
+        baseline = np.arange(min(top_k, len(ids)))
+        
+        report['baseline'] = RetrievalService.diversity_metrics(
+            similarity[np.ix_(baseline, baseline)], relevance[baseline], MMR_DUPLICATE_THRESHOLD
+        )
+        report['reranked'] = RetrievalService.diversity_metrics(
+            similarity[np.ix_(selected, selected)], relevance[selected], MMR_DUPLICATE_THRESHOLD
+        )
+        report['changed_results'] = len(set(selected) - set(baseline.tolist()))
+        
+        return [(int(ids[i]), float(scores[i])) for i in selected], report
+    
+    @staticmethod
+    def invalidate_cached_results(fingerprint: str) -> int:
+        """Drop cached results computed on the embedding set with this fingerprint"""
+        if not fingerprint:
+            return 0
+        return RetrievalService._result_cache.invalidate(fingerprint)
+    
+    @staticmethod
+    def get_result_cache_info() -> Dict[str, Any]:
+        """Hit-rate statistics of the query result cache"""
+        return RetrievalService._result_cache.stats()
+    
+    @staticmethod
+    def clear_result_cache() -> None:
+        """Drop all cached results"""
+        RetrievalService._result_cache.clear()
+    
+    @staticmethod
+    def evaluate_retrieval_quality(query_embedding: List[float],
+                                   document_embeddings: List[List[float]],
+                                   relevant_doc_indices: Set[int],
+                                   k_values: List[int] = [5, 10],
+                                   relevance_scores: Optional[Dict[int, float]] = None,
+                                   storage_dtype: Optional[str] = None,
+                                   search_method: str = 'exact',
+                                   search_params: Optional[Dict[str, Any]] = None,
+                                   retrieval_mode: str = 'dense',
+                                   query_text: Optional[str] = None,
+                                   document_texts: Optional[List[str]] = None,
+                                   fusion: str = 'rrf',
+                                   alpha: float = 0.5,
+                                   filters: Optional[Dict[str, Any]] = None,
+                                   document_metadata=None,
+                                   mmr_lambda: Optional[float] = None,
+                                   mmr_candidates: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Comprehensive retrieval quality evaluation
+        
+        Args:
+            query_embedding: Query embedding vector (unused in 'bm25' mode)
+            document_embeddings: List of document embedding vectors (or an EmbeddingSet)
+            relevant_doc_indices: Set of indices of relevant documents
+            k_values: List of K values to evaluate (default: [5, 10])
+            relevance_scores: Optional dict mapping doc index to relevance score (for NDCG)
+            storage_dtype, search_method, search_params, retrieval_mode, query_text,
+            document_texts, fusion, alpha, filters, document_metadata, mmr_lambda,
+            mmr_candidates: See retrieve()
+        
+        Returns:
+            Dict with evaluation results
+        """
+        try:
+            ranking, reports = RetrievalService.retrieve(
+                query_embedding,
+                document_embeddings,
+                top_k=max(k_values) if k_values else 10,
+                storage_dtype=storage_dtype,
+                search_method=search_method,
+                search_params=search_params,
+                retrieval_mode=retrieval_mode,
+                query_text=query_text,
+                document_texts=document_texts,
+                fusion=fusion,
+                alpha=alpha,
+                filters=filters,
+                document_metadata=document_metadata,
+                mmr_lambda=mmr_lambda,
+                mmr_candidates=mmr_candidates
+            )
+            
+            results = RetrievalService.score_ranking(ranking, relevant_doc_indices, k_values, relevance_scores)
+            results.update(reports)
             
             return {
                 'success': True,
@@ -282,7 +1015,18 @@ class RetrievalService:
     @staticmethod
     def evaluate_multiple_queries(test_queries: List[Dict[str, Any]],
                                   document_embeddings: List[List[float]],
-                                  k_values: List[int] = [5, 10]) -> Dict[str, Any]:
+                                  k_values: List[int] = [5, 10],
+                                  storage_dtype: Optional[str] = None,
+                                  search_method: str = 'exact',
+                                  search_params: Optional[Dict[str, Any]] = None,
+                                  retrieval_mode: str = 'dense',
+                                  document_texts: Optional[List[str]] = None,
+                                  fusion: str = 'rrf',
+                                  alpha: float = 0.5,
+                                  filters: Optional[Dict[str, Any]] = None,
+                                  document_metadata=None,
+                                  mmr_lambda: Optional[float] = None,
+                                  mmr_candidates: Optional[int] = None) -> Dict[str, Any]:
         """
         Evaluate retrieval quality for multiple test queries
         
@@ -291,24 +1035,53 @@ class RetrievalService:
                 - 'query_embedding': List[float]
                 - 'relevant_doc_indices': Set[int] or List[int]
                 - 'relevance_scores': Optional[Dict[int, float]]
-            document_embeddings: List of document embedding vectors
+                - 'query_text': Optional[str] (for 'bm25' / 'hybrid')
+            document_embeddings: List of document embedding vectors (or an EmbeddingSet)
             k_values: List of K values to evaluate
+            storage_dtype: Search an EmbeddingSet stored as 'float32', 'float16' or 'int8'
+            search_method: 'exact' or an ANN index ('hnsw', 'ivfpq')
+            search_params: Per-query ANN parameters (e.g. {'ef_search': 128} or {'nprobe': 16, 'rerank': 50})
+            retrieval_mode: 'dense', 'bm25' or 'hybrid'
+            document_texts: Chunk texts aligned with the document embeddings ('bm25' / 'hybrid')
+            fusion: Hybrid fusion, 'rrf' or 'weighted'
+            alpha: Dense weight in hybrid fusion
+            filters: Metadata predicates applied to every query (see retrieve())
+            document_metadata: Per-row metadata (list of dicts or MetadataIndex), required with filters
+            mmr_lambda: Enables MMR re-ranking with this relevance / diversity trade-off
+            mmr_candidates: Candidates re-ranked by MMR
         
         Returns:
             Dict with aggregated evaluation results
         """
         try:
+            # Build the (possibly quantized) set, BM25 and metadata indexes once for all queries
+            if retrieval_mode != 'bm25' or (mmr_lambda is not None and len(document_embeddings)):
+                document_embeddings = RetrievalService.get_embedding_set(document_embeddings, storage_dtype)
+            if retrieval_mode != 'dense' and document_texts:
+                document_texts = RetrievalService.get_bm25_index(document_texts)
+            if filters and document_metadata is not None:
+                document_metadata = RetrievalService.get_metadata_index(document_metadata)
+            
             all_precisions = {k: [] for k in k_values}
             all_recalls = {k: [] for k in k_values}
             all_ndcgs = {k: [] for k in k_values}
             reciprocal_ranks = []
+            ann_reports = []
+            lexical_report = None
+            filter_report = None
+            diversity_reports = []
             
             for query_data in test_queries:
                 query_emb = query_data.get('query_embedding')
                 relevant_indices = query_data.get('relevant_doc_indices', [])
                 relevance_scores = query_data.get('relevance_scores')
                 
-                if not query_emb or not relevant_indices:
+                query_text = query_data.get('query_text')
+                
+                if retrieval_mode == 'bm25':
+                    if not query_text or not relevant_indices:
+                        continue
+                elif query_emb is None or len(query_emb) == 0 or not relevant_indices:
                     continue
                 
                 # Convert to set if needed
@@ -321,13 +1094,32 @@ class RetrievalService:
                     document_embeddings,
                     relevant_indices,
                     k_values,
-                    relevance_scores
+                    relevance_scores,
+                    search_method=search_method,
+                    search_params=search_params,
+                    retrieval_mode=retrieval_mode,
+                    query_text=query_text,
+                    document_texts=document_texts,
+                    fusion=fusion,
+                    alpha=alpha,
+                    filters=filters,
+                    document_metadata=document_metadata,
+                    mmr_lambda=mmr_lambda,
+                    mmr_candidates=mmr_candidates
                 )
                 
                 if not query_result.get('success'):
                     continue
                 
                 results = query_result.get('results', {})
+                if 'ann' in results:
+                    ann_reports.append(results['ann'])
+                if 'lexical' in results:
+                    lexical_report = results['lexical']
+                if 'filter' in results:
+                    filter_report = results['filter']
+                if results.get('diversity', {}).get('reranked'):
+                    diversity_reports.append(results['diversity'])
                 
                 # Collect metrics
                 for k in k_values:
@@ -391,6 +1183,39 @@ class RetrievalService:
                     'description': 'Mean Reciprocal Rank đo lường vị trí trung bình của kết quả liên quan đầu tiên. Giá trị cao hơn là tốt hơn.'
                 }
             
+            if isinstance(document_embeddings, EmbeddingSet):
+                aggregated['storage'] = document_embeddings.storage_info()
+            
+            if filter_report is not None:
+                aggregated['filter'] = filter_report
+            
+            if diversity_reports:
+                aggregated['diversity'] = {
+                    key: value for key, value in diversity_reports[0].items()
+                    if key in ('method', 'lambda', 'duplicate_threshold')
+                }
+                for stage in ('baseline', 'reranked'):
+                    aggregated['diversity'][stage] = {}
+                    for metric in ('mean_pairwise_similarity', 'max_pairwise_similarity',
+                                   'near_duplicate_pairs', 'mean_relevance'):
+                        values = [r[stage][metric] for r in diversity_reports if r[stage][metric] is not None]
+                        aggregated['diversity'][stage][metric] = round(float(np.mean(values)), 4) if values else None
+            
+            if lexical_report is not None:
+                aggregated['lexical'] = {key: value for key, value in lexical_report.items() if key != 'bm25_matches'}
+            
+            if ann_reports:
+                recalls = [r['recall_vs_exact'] for r in ann_reports if r['recall_vs_exact'] is not None]
+                aggregated['ann'] = {
+                    'method': search_method,
+                    'search_params': search_params or {},
+                    'mean_recall_vs_exact': round(sum(recalls) / len(recalls), 4) if recalls else None,
+                    'min_recall_vs_exact': round(min(recalls), 4) if recalls else None,
+                    'mean_search_ms': round(sum(r['search_ms'] for r in ann_reports) / len(ann_reports), 3),
+                    'mean_exact_search_ms': round(sum(r['exact_search_ms'] for r in ann_reports) / len(ann_reports), 3),
+                    'index': ann_reports[-1]['index']
+                }
+            
             return {
                 'success': True,
                 'results': aggregated
@@ -402,3 +1227,70 @@ class RetrievalService:
                 'error': str(e),
                 'results': None
             }
+    
+    @staticmethod
+    def quantization_report(document_embeddings: List[List[float]],
+                            query_embeddings: Optional[List[List[float]]] = None,
+                            k: int = 10,
+                            dtypes: Optional[List[str]] = None,
+                            n_sample_queries: int = 100) -> Dict[str, Any]:
+        """
+        Compare storage dtypes: memory footprint, search latency and recall@k vs float32
+        
+        Args:
+            document_embeddings: List of document embedding vectors
+            query_embeddings: Query vectors (default: a sample of the documents themselves)
+            k: Number of neighbors for recall@k
+            dtypes: Storage dtypes to compare (default: all supported)
+            n_sample_queries: Number of documents sampled as queries when none are given
+        
+        Returns:
+            Dict with one entry per dtype
+        """
+        if not HAS_NUMPY:
+            return {
+                'success': False,
+                'error': 'numpy not available',
+                'results': None
+            }
+        
+        try:
+            if dtypes is None:
+                dtypes = list(EmbeddingSet.SUPPORTED_DTYPES)
+            
+            reference = RetrievalService.get_embedding_set(document_embeddings, 'float32')
+            
+            if query_embeddings is None or len(query_embeddings) == 0:
+                rng = np.random.default_rng(42)
+                sample = rng.choice(len(reference), size=min(n_sample_queries, len(reference)), replace=False)
+                queries = reference.reconstruct(np.sort(sample))
+            else:
+                queries = np.asarray(query_embeddings, dtype=np.float32)
+            
+            results = {}
+            for dtype in dtypes:
+                embedding_set = RetrievalService.get_embedding_set(reference, dtype)
+                
+                start = time.perf_counter()
+                for q in queries:
+                    embedding_set.search(q, k)
+                elapsed = time.perf_counter() - start
+                
+                report = embedding_set.storage_info()
+                report['recall_vs_float32'] = embedding_set.recall_against(reference, queries, k)
+                report['avg_search_ms'] = round(elapsed / max(len(queries), 1) * 1000, 3)
+                results[dtype] = report
+            
+            return {
+                'success': True,
+                'results': results,
+                'k': k,
+                'n_queries': len(queries)
+            }
+        except Exception as e:
+            logger.error(f"Error building quantization report: {e}")
+            return {
+                'success': False,
+                'error': str(e),
+                'results': None
+            }
@@ -0,0 +1,306 @@
+"""
+Sharded Search - Exact cosine search split across worker processes
+
+The embedding matrix is partitioned into contiguous row shards, one per worker.
+Workers read their rows in place instead of receiving copies per query:
+- sets backed by np.memmap files (vector stores) are re-mapped from the same files
+- in-memory sets are copied once into multiprocessing.shared_memory blocks
+
+Each query batch is scored on every shard in parallel (per-shard top-k) and the
+sorted shard results are merged with a heap.
+
+Worker processes are started once per (pool size, start method) and shared by
+every searcher: a new searcher only attaches its shard layout, and a closed one
+tells the workers to detach it along with their next tasks.
+"""
+import atexit
+import heapq
+import itertools
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict, deque
+from multiprocessing import shared_memory
+from typing import List, Dict, Any, Optional, Tuple
+
+from services.embedding_set import EmbeddingSet
+
+logger = logging.getLogger(__name__)
+
+# Optional dependencies
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+    logger.warning("numpy not available, sharded search will not work")
+
+
+# Worker-side shard views keyed by (layout key, shard), LRU order
+_worker_shards: "OrderedDict[Tuple[str, int], Tuple[EmbeddingSet, int, List[Any]]]" = OrderedDict()
+_WORKER_SHARD_CACHE_SIZE = 32
+
+
+def _attach_array(spec: Dict[str, Any]):
+    """Open the array described by spec; returns (array, handle keeping it alive)"""
+    if spec['kind'] == 'memmap':
+        array = np.memmap(spec['path'], dtype=spec['dtype'], mode='r', offset=spec['offset'], shape=tuple(spec['shape']))
+        return array, None
+    block = shared_memory.SharedMemory(name=spec['name'])
+    array = np.ndarray(tuple(spec['shape']), dtype=spec['dtype'], buffer=block.buf)
+    return array, block
+
+
+def _shard_set(layout: Dict[str, Any], shard: int) -> Tuple[EmbeddingSet, int]:
+    """EmbeddingSet view over one shard, attached once per worker"""
+    key = (layout['key'], shard)
+    cached = _worker_shards.get(key)
+    if cached is not None:
+        _worker_shards.move_to_end(key)
+        return cached[0], cached[1]
+    
+    data, data_handle = _attach_array(layout['data'])
+    norms, norms_handle = _attach_array(layout['norms'])
+    start, stop = layout['bounds'][shard], layout['bounds'][shard + 1]
+    embedding_set = EmbeddingSet.from_stored(
+        data[start:stop], norms[start:stop], layout['dtype'],
+        scale=layout['scale'], offset=layout['offset'], fingerprint=layout['key'],
+        normalized=layout['normalized']
+    )
+    
+    _worker_shards[key] = (embedding_set, start, [data_handle, norms_handle])
+    while len(_worker_shards) > _WORKER_SHARD_CACHE_SIZE:
+        _worker_shards.popitem(last=False)
+    return embedding_set, start
+
+
+def _detach_layouts(keys) -> None:
+    """Drop the shard views of closed searchers (runs in a worker process)"""
+    detached = set(keys)
+    for key in [key for key in _worker_shards if key[0] in detached]:
+        embedding_set, _, handles = _worker_shards.pop(key)
+        # The views must go before their shared-memory blocks can be closed
+        del embedding_set
+        for handle in handles:
+            if handle is not None:
+                handle.close()
+
+
+def _run_task(job):
+    """Detach closed layouts, then run one task (runs in a worker process)"""
+    func, detached, task = job
+    if detached:
+        _detach_layouts(detached)
+    return func(task)
+
+
+def _attach_shard(task) -> int:
+    """Attach a shard ahead of the first query (runs in a worker process)"""
+    layout, shard = task
+    return len(_shard_set(layout, shard)[0])
+
+
+def _search_shard(task) -> List[List[Tuple[int, float]]]:
+    """Per-shard top-k for every query (runs in a worker process)"""
+    layout, shard, queries, top_k = task
+    embedding_set, start = _shard_set(layout, shard)
+    return [
+        [(start + idx, score) for idx, score in embedding_set.search(query, top_k)]
+        for query in queries
+    ]
+
+
+class WorkerPool:
+    """Long-lived worker processes shared by all searchers of one size and start method"""
+    
+    # Closed layout keys sent along with tasks, for workers that have not dropped them yet
+    MAX_DETACHED = 256
+    
+    _pools: Dict[Tuple[int, str], 'WorkerPool'] = {}
+    _pools_lock = threading.Lock()
+    
+    def __init__(self, n_workers: int, start_method: str):
+        """
+        Args:
+            n_workers: Number of worker processes
+            start_method: multiprocessing start method for the workers
+        """
+        self.n_workers = n_workers
+        self.start_method = start_method
+        self._lock = threading.Lock()
+        self._detached = deque(maxlen=WorkerPool.MAX_DETACHED)
+        start = time.perf_counter()
+        self._pool = multiprocessing.get_context(start_method).Pool(n_workers)
+        self.start_seconds = round(time.perf_counter() - start, 3)
+    
+    @staticmethod
+    def get(n_workers: int, start_method: str) -> 'WorkerPool':
+        """Shared pool of this size and start method, started on first use"""
+        key = (n_workers, start_method)
+        with WorkerPool._pools_lock:
+            pool = WorkerPool._pools.get(key)
+            if pool is None:
+                pool = WorkerPool(n_workers, start_method)
+                WorkerPool._pools[key] = pool
+                logger.info(f"Started {n_workers} sharded search workers ({start_method})")
+            return pool
+    
+    def map(self, func, tasks) -> List[Any]:
+        """Run func over tasks, one task per worker call"""
+        with self._lock:
+            detached = tuple(self._detached)
+        return self._pool.map(_run_task, [(func, detached, task) for task in tasks], chunksize=1)
+    
+    def detach(self, layout_key: str):
+        """Have workers drop a closed searcher's shard views with their next tasks"""
+        with self._lock:
+            self._detached.append(layout_key)
+    
+    @staticmethod
+    def shutdown_all():
+        """Stop every shared pool's workers"""
+        with WorkerPool._pools_lock:
+            pools = list(WorkerPool._pools.values())
+            WorkerPool._pools.clear()
+        for pool in pools:
+            pool._pool.terminate()
+            pool._pool.join()
+
+
+atexit.register(WorkerPool.shutdown_all)
+
+
+class ShardedSearcher:
+    """Exact search over row shards of an EmbeddingSet in a shared process pool"""
+    
+    # Layout keys are unique per searcher, also when a closed searcher's id is reused
+    _layout_ids = itertools.count()
+    
+    def __init__(self, embedding_set: EmbeddingSet, n_shards: Optional[int] = None,
+                 start_method: str = 'spawn'):
+        """
+        Args:
+            embedding_set: Set to search (float32 / float16 / int8, in memory or memory-mapped)
+            n_shards: Number of shards and worker processes (default: CPU count);
+                searchers with the same n_shards and start_method share their workers
+            start_method: multiprocessing start method for the workers
+        """
+        self.embedding_set = embedding_set
+        self.fingerprint = embedding_set.fingerprint
+        self.storage_dtype = embedding_set.dtype
+        self.n_vectors = len(embedding_set)
+        self.dim = embedding_set.dim
+        self.n_shards = max(1, min(int(n_shards or os.cpu_count() or 1), max(self.n_vectors, 1)))
+        self.start_method = start_method
+        self._blocks: List[shared_memory.SharedMemory] = []
+        
+        start = time.perf_counter()
+        bounds = np.linspace(0, self.n_vectors, self.n_shards + 1).astype(np.int64)
+        self.layout = {
+            'key': f'{self.fingerprint}:{self.storage_dtype}:{next(ShardedSearcher._layout_ids)}',
+            'dtype': self.storage_dtype,
+            'data': self._share(embedding_set.data),
+            'norms': self._share(embedding_set.norms),
+            'scale': embedding_set.scale,
+            'offset': embedding_set.offset,
+            'normalized': embedding_set.normalized,
+            'bounds': bounds.tolist()
+        }
+        self.sharing = 'shared_memory' if self._blocks else 'memmap'
+        self.shared_bytes = int(sum(block.size for block in self._blocks))
+        # Workers start (and import this package) with the first searcher of this size only
+        self._pool = WorkerPool.get(self.n_shards, start_method)
+        self._finalizer = weakref.finalize(self, ShardedSearcher._release, self._pool, self.layout['key'], self._blocks)
+        self._pool.map(_attach_shard, [(self.layout, shard) for shard in range(self.n_shards)])
+        self.build_seconds = round(time.perf_counter() - start, 3)
+        
+        logger.info(f"Started sharded search over {self.n_vectors} vectors with {self.n_shards} workers "
+                    f"({self.sharing}) in {self.build_seconds}s")
+    
+    def __len__(self) -> int:
+        return self.n_vectors
+    
+    def _share(self, array) -> Dict[str, Any]:
+        """Describe how workers can map an array without per-query copies"""
+        if isinstance(array, np.memmap) and array.filename and array.flags.c_contiguous:
+            return {
+                'kind': 'memmap',
+                'path': array.filename,
+                'offset': array.offset,
+                'dtype': array.dtype.str,
+                'shape': list(array.shape)
+            }
+        array = np.ascontiguousarray(array)
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+        self._blocks.append(block)
+        return {'kind': 'shm', 'name': block.name, 'dtype': array.dtype.str, 'shape': list(array.shape)}
+    
+    @staticmethod
+    def _release(pool: WorkerPool, layout_key: str, blocks: List[shared_memory.SharedMemory]):
+        pool.detach(layout_key)
+        # Workers still mapping a block keep it alive until they detach
+        for block in blocks:
+            block.close()
+            block.unlink()
+        blocks.clear()
+    
+    def close(self):
+        """Detach the shard layout from the shared workers and free shared memory"""
+        self._finalizer()
+    
+    def __enter__(self) -> 'ShardedSearcher':
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+    
+    def search_batch(self, queries, top_k: int = 5) -> List[List[Tuple[int, float]]]:
+        """
+        Exact cosine search for several queries in one round trip to the workers
+        
+        Returns:
+            One list of (index, similarity_score) tuples per query, sorted by score descending
+        """
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        if not self.n_vectors or top_k <= 0:
+            return [[] for _ in queries]
+        
+        tasks = [(self.layout, shard, queries, int(top_k)) for shard in range(self.n_shards)]
+        shard_results = self._pool.map(_search_shard, tasks)
+        
+        # Shard lists are sorted, so a heap merge only touches the first top_k entries
+        return [
+            list(itertools.islice(
+                heapq.merge(*(results[i] for results in shard_results), key=lambda item: -item[1]),
+                top_k
+            ))
+            for i in range(len(queries))
+        ]
+    
+    def search(self, query, top_k: int = 5) -> List[Tuple[int, float]]:
+        """
+        Exact cosine search across all shards
+        
+        Returns:
+            List of (index, similarity_score) tuples, sorted by score descending
+        """
+        return self.search_batch([query], top_k)[0]
+    
+    def info(self) -> Dict[str, Any]:
+        """Describe the shard layout and workers"""
+        return {
+            'method': 'sharded',
+            'n_vectors': self.n_vectors,
+            'dim': self.dim,
+            'storage_dtype': self.storage_dtype,
+            'n_shards': self.n_shards,
+            'rows_per_shard': int(np.ceil(self.n_vectors / self.n_shards)) if self.n_vectors else 0,
+            'sharing': self.sharing,
+            'start_method': self.start_method,
+            'shared_bytes': self.shared_bytes,
+            'build_seconds': self.build_seconds
+        }
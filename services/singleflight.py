@@ -0,0 +1,95 @@
+"""
+Single Flight - Coalesce duplicate work across a batch and across concurrent callers
+
+run_batch(keys, compute) computes each distinct key once:
+- duplicate keys inside one batch are computed once and fanned out
+- keys another thread is already computing are joined (waited on) instead of recomputed
+Nothing is cached: once a computation finishes its key is forgotten, so later
+calls compute again (caching is the QueryCache's job).
+"""
+import logging
+import threading
+from concurrent.futures import Future
+from typing import List, Dict, Any, Optional, Callable, Hashable
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """Deduplicate in-batch keys and join concurrent computations of the same key"""
+    
+    def __init__(self, name: str):
+        """
+        Args:
+            name: Name shown in stats
+        """
+        self.name = name
+        self._lock = threading.Lock()
+        self._in_flight: Dict[Hashable, Future] = {}
+        self._stats = {'batches': 0, 'keys': 0, 'in_batch_duplicates': 0, 'joined': 0, 'computed': 0}
+    
+    def run_batch(self, keys: List[Hashable], compute: Callable[[List[Hashable]], Optional[List[Any]]]) -> Optional[List[Any]]:
+        """
+        Values for keys, computing each distinct key at most once
+        
+        Args:
+            keys: Keys in request order (may repeat)
+            compute: Called with the distinct keys this call leads; returns one value per key,
+                or None on failure (every key it led then fails)
+        
+        Returns:
+            One value per key in request order, or None if any key failed
+        """
+        unique = list(dict.fromkeys(keys))
+        leading = []
+        futures = {}
+        with self._lock:
+            for key in unique:
+                future = self._in_flight.get(key)
+                if future is None:
+                    future = Future()
+                    self._in_flight[key] = future
+                    leading.append(key)
+                futures[key] = future
+            self._stats['batches'] += 1
+            self._stats['keys'] += len(keys)
+            self._stats['in_batch_duplicates'] += len(keys) - len(unique)
+            self._stats['joined'] += len(unique) - len(leading)
+            self._stats['computed'] += len(leading)
+        
+        if leading:
+            try:
+                values = compute(leading)
+                if values is not None and len(values) != len(leading):
+                    logger.warning(f"{self.name}: expected {len(leading)} values, got {len(values)}")
+                    values = None
+            except BaseException:
+                # Joined callers see a failure (None); the exception stays with this caller
+                self._finish(leading, futures, None)
+                raise
+            self._finish(leading, futures, values)
+        
+        results = {}
+        for key in unique:
+            value = futures[key].result()
+            if value is None:
+                return None
+            results[key] = value
+        return [results[key] for key in keys]
+    
+    def _finish(self, leading, futures, values):
+        with self._lock:
+            for key in leading:
+                del self._in_flight[key]
+        for i, key in enumerate(leading):
+            futures[key].set_result(values[i] if values is not None else None)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Counters since start; saved = keys - computed"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['in_flight'] = len(self._in_flight)
+        stats['name'] = self.name
+        stats['saved'] = stats['keys'] - stats['computed']
+        stats['saved_ratio'] = round(stats['saved'] / stats['keys'], 4) if stats['keys'] else 0.0
+        return stats
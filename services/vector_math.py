@@ -0,0 +1,116 @@
+"""
+Vector Math - Shared L2 normalization and dot-product similarity
+
+Embeddings are L2-normalized once when they enter the system (embedding sets,
+vector stores, semantic chunking, RAGAS); from then on cosine similarity is a
+plain dot product, so no hot loop recomputes norms. Zero vectors stay zero and
+score 0 against everything.
+"""
+import logging
+import math
+from typing import List, Tuple, Optional
+
+logger = logging.getLogger(__name__)
+
+# Optional dependencies
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+    logger.warning("numpy not available, vector math falls back to pure Python")
+
+
+class VectorMath:
+    """L2 normalization and dot-product similarity on normalized vectors"""
+    
+    # Largest |norm - 1| still treated as unit length (float16 storage rounds to ~1e-4)
+    UNIT_NORM_TOLERANCE = 2e-3
+    
+    @staticmethod
+    def normalize_rows(X) -> Tuple['np.ndarray', 'np.ndarray']:
+        """
+        L2-normalize the rows of a matrix (zero rows stay zero)
+        
+        Args:
+            X: 2-D array-like of vectors
+        
+        Returns:
+            Tuple of (float32 unit-row matrix, float32 original row norms)
+        """
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2:
+            raise ValueError(f'Expected 2-D matrix, got shape {X.shape}')
+        norms = np.linalg.norm(X, axis=1).astype(np.float32)
+        unit = np.divide(X, norms[:, None], out=np.zeros_like(X), where=norms[:, None] > 0)
+        return unit, norms
+    
+    @staticmethod
+    def normalize(vector) -> 'np.ndarray':
+        """L2-normalized float32 copy of one vector (zero stays zero)"""
+        v = np.asarray(vector, dtype=np.float32).reshape(-1)
+        norm = float(np.linalg.norm(v))
+        return v / norm if norm > 0 else np.zeros_like(v)
+    
+    @staticmethod
+    def is_unit_norm(norms) -> bool:
+        """Whether every norm is ~1 (or 0, for zero vectors)"""
+        norms = np.asarray(norms, dtype=np.float32)
+        if not len(norms):
+            return True
+        deviation = np.abs(norms - 1.0)
+        return bool(np.all((deviation <= VectorMath.UNIT_NORM_TOLERANCE) | (norms == 0)))
+    
+    @staticmethod
+    def dot(vec1, vec2) -> float:
+        """Dot product (cosine similarity when both vectors are normalized)"""
+        if HAS_NUMPY:
+            return float(np.dot(np.asarray(vec1, dtype=np.float32), np.asarray(vec2, dtype=np.float32)))
+        return float(sum(a * b for a, b in zip(vec1, vec2)))
+    
+    @staticmethod
+    def cosine(vec1, vec2) -> float:
+        """Cosine similarity of two raw vectors (0 if either is zero)"""
+        if HAS_NUMPY:
+            return VectorMath.dot(VectorMath.normalize(vec1), VectorMath.normalize(vec2))
+        magnitude1 = math.sqrt(sum(a * a for a in vec1))
+        magnitude2 = math.sqrt(sum(b * b for b in vec2))
+        if magnitude1 == 0 or magnitude2 == 0:
+            return 0.0
+        return VectorMath.dot(vec1, vec2) / (magnitude1 * magnitude2)
+    
+    @staticmethod
+    def adjacent_similarities(unit_rows) -> List[float]:
+        """Dot product of each normalized row with the next one (n - 1 values)"""
+        unit_rows = np.asarray(unit_rows, dtype=np.float32)
+        if len(unit_rows) < 2:
+            return []
+        return np.einsum('ij,ij->i', unit_rows[:-1], unit_rows[1:]).tolist()
+    
+    @staticmethod
+    def similarity_matrix(unit_rows, other_unit_rows: Optional['np.ndarray'] = None) -> 'np.ndarray':
+        """Pairwise dot products of normalized rows (with themselves, or with other rows)"""
+        A = np.asarray(unit_rows, dtype=np.float32)
+        B = A if other_unit_rows is None else np.asarray(other_unit_rows, dtype=np.float32)
+        return A @ B.T
+    
+    @staticmethod
+    def cosine_distances(unit_rows, other_unit_rows: Optional['np.ndarray'] = None) -> 'np.ndarray':
+        """1 - cosine similarity of normalized rows, clipped to [0, 2]"""
+        return np.clip(1.0 - VectorMath.similarity_matrix(unit_rows, other_unit_rows), 0.0, 2.0)
+    
+    @staticmethod
+    def top_k_from_scores(scores, top_k: int) -> List[Tuple[int, float]]:
+        """Select top-k (index, score) pairs, sorted by score descending"""
+        top_k = min(int(top_k), len(scores))
+        if top_k <= 0:
+            return []
+        candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+        order = candidates[np.argsort(-scores[candidates], kind='stable')]
+        return [(int(i), float(scores[i])) for i in order]
+    
+    @staticmethod
+    def top_k(unit_rows, unit_query, top_k: int) -> List[Tuple[int, float]]:
+        """Top-k (index, cosine) of a normalized query against normalized rows, best first"""
+        scores = np.asarray(unit_rows, dtype=np.float32) @ np.asarray(unit_query, dtype=np.float32)
+        return VectorMath.top_k_from_scores(scores, top_k)
@@ -0,0 +1,330 @@
+"""
+Vector Store - Persistent, memory-mapped embedding store
+
+Each named store in VECTOR_STORE_DIR consists of:
+- <name>.f32: little-endian float32 rows (n_vectors x dim), L2-normalized when
+  appended, opened with np.memmap
+- <name>.norms.f32: float32 norms of the stored rows (1, or 0 for zero vectors; raw
+  norms in stores written before normalization), so opening needs no pass over the data
+- <name>.sqlite: sidecar with store metadata and row -> (filename, strategy, position, text hash)
+
+Opening a store only maps the files, so startup cost does not depend on its size
+and several worker processes share the same pages through the OS page cache.
+Sidecar connections come from a pooled WAL ConnectionManager: an append holds
+the sidecar write lock from reading the row count to its commit, while searches
+and metadata reads keep running against the last committed version.
+"""
+import hashlib
+import logging
+import os
+import re
+import threading
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+
+from database import ConnectionManager
+from services.embedding_set import EmbeddingSet
+from services.metadata_index import MetadataIndex
+from services.vector_math import VectorMath
+
+logger = logging.getLogger(__name__)
+
+# Optional dependencies
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+    logger.warning("numpy not available, vector store will not work")
+
+
+class VectorStore:
+    """Named on-disk embedding matrix with a SQLite row sidecar"""
+    
+    NAME_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+    
+    # Opened stores shared by all requests of this process
+    _open_stores: Dict[str, 'VectorStore'] = {}
+    _lock = threading.Lock()
+    
+    def __init__(self, name: str, directory: Optional[Path] = None):
+        """
+        Args:
+            name: Store name (letters, digits, '_' and '-')
+            directory: Storage directory (default: VECTOR_STORE_DIR)
+        """
+        if not VectorStore.NAME_PATTERN.match(name or ''):
+            raise ValueError(f'Invalid vector store name: {name}')
+        
+        if directory is None:
+            from config import VECTOR_STORE_DIR
+            directory = VECTOR_STORE_DIR
+        
+        self.name = name
+        self.directory = Path(directory)
+        self.vectors_path = self.directory / f'{name}.f32'
+        self.norms_path = self.directory / f'{name}.norms.f32'
+        self.sidecar_path = self.directory / f'{name}.sqlite'
+        self._write_lock = threading.Lock()
+        self._db = ConnectionManager.for_path(self.sidecar_path)
+        
+        self.dim = 0
+        self.n_vectors = 0
+        self.version = 0
+        self.fingerprint = ''
+        self.normalized = False
+        self.vectors = None
+        self.norms = None
+        self._embedding_set = None
+        self._metadata_index = None
+        
+        self._load()
+    
+    @staticmethod
+    def _init_sidecar(conn):
+        cursor = conn.cursor()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS rows (
+                row_id INTEGER PRIMARY KEY,
+                filename TEXT,
+                position INTEGER,
+                text_hash TEXT,
+                strategy TEXT
+            )
+        ''')
+        # Sidecars created before the strategy column existed
+        columns = {row[1] for row in cursor.execute('PRAGMA table_info(rows)')}
+        if 'strategy' not in columns:
+            cursor.execute('ALTER TABLE rows ADD COLUMN strategy TEXT')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_rows_filename_position ON rows(filename, position)')
+    
+    @staticmethod
+    def _read_meta(conn) -> Dict[str, str]:
+        return {row['key']: row['value'] for row in conn.execute('SELECT key, value FROM meta')}
+    
+    def _load(self):
+        """Read metadata and memory-map the vector / norm files (no data is read)"""
+        if not self.sidecar_path.exists():
+            return
+        
+        with self._db.connection() as conn:
+            meta = VectorStore._read_meta(conn)
+        
+        if self.fingerprint and self.fingerprint != meta.get('fingerprint', ''):
+            VectorStore._invalidate_results(self.fingerprint)
+        
+        self.dim = int(meta.get('dim', 0))
+        self.n_vectors = int(meta.get('n_vectors', 0))
+        self.version = int(meta.get('version', 0))
+        self.fingerprint = meta.get('fingerprint', '')
+        self.normalized = meta.get('normalized') == '1'
+        self._embedding_set = None
+        self._metadata_index = None
+        
+        if self.n_vectors and self.dim:
+            self.vectors = np.memmap(self.vectors_path, dtype='<f4', mode='r', shape=(self.n_vectors, self.dim))
+            self.norms = np.memmap(self.norms_path, dtype='<f4', mode='r', shape=(self.n_vectors,))
+        else:
+            self.vectors = None
+            self.norms = None
+    
+    @staticmethod
+    def _invalidate_results(fingerprint: str):
+        """Drop cached retrieval results computed on a previous version of a store"""
+        from services.retrieval_service import RetrievalService
+        RetrievalService.invalidate_cached_results(fingerprint)
+    
+    def _stored_version(self) -> int:
+        if not self.sidecar_path.exists():
+            return 0
+        row = self._db.fetch_one("SELECT value FROM meta WHERE key = 'version'")
+        return int(row['value']) if row else 0
+    
+    @staticmethod
+    def open(name: str, create: bool = False) -> 'VectorStore':
+        """
+        Get an opened store, reloading it if another writer appended since
+        
+        Args:
+            name: Store name
+            create: Create an empty store if it does not exist
+        
+        Raises:
+            ValueError: If the name is invalid or the store does not exist
+        """
+        with VectorStore._lock:
+            store = VectorStore._open_stores.get(name)
+            if store is None:
+                store = VectorStore(name)
+                if not create and not store.sidecar_path.exists():
+                    raise ValueError(f'Vector store not found: {name}')
+                VectorStore._open_stores[name] = store
+            elif store._stored_version() != store.version:
+                store._load()
+            return store
+    
+    @staticmethod
+    def list_stores() -> List[Dict[str, Any]]:
+        """Info for every store in VECTOR_STORE_DIR"""
+        from config import VECTOR_STORE_DIR
+        
+        stores = []
+        for sidecar in sorted(Path(VECTOR_STORE_DIR).glob('*.sqlite')):
+            try:
+                stores.append(VectorStore.open(sidecar.stem).info())
+            except ValueError:
+                continue
+        return stores
+    
+    @staticmethod
+    def text_hash(text: str) -> str:
+        """Hash identifying a chunk's text"""
+        return hashlib.sha1((text or '').encode('utf-8')).hexdigest()
+    
+    def append(self, embeddings, rows: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """
+        Append vectors (and their row metadata) to the store
+        
+        Vectors are L2-normalized before they are written, so searches score them
+        with plain dot products. Vectors and norms are written and fsynced before
+        the sidecar commit that makes them visible, so a crash never exposes
+        partial rows.
+        
+        Args:
+            embeddings: 2-D array-like of embedding vectors
+            rows: Optional list (same length) of dicts with filename, strategy, position and text or text_hash
+        
+        Returns:
+            Store info after the append
+        """
+        X = np.asarray(embeddings, dtype='<f4')
+        if X.ndim != 2 or not len(X):
+            raise ValueError('Expected a non-empty 2-D embedding matrix')
+        if rows is not None and len(rows) != len(X):
+            raise ValueError(f'Row metadata count ({len(rows)}) does not match embeddings ({len(X)})')
+        
+        with self._write_lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            # BEGIN IMMEDIATE: other writers (also in other processes) wait until the commit
+            with self._db.transaction() as conn:
+                VectorStore._init_sidecar(conn)
+                meta = VectorStore._read_meta(conn)
+                dim = int(meta.get('dim', 0)) or X.shape[1]
+                n_vectors = int(meta.get('n_vectors', 0))
+                if X.shape[1] != dim:
+                    raise ValueError(f'Embedding dimension {X.shape[1]} does not match store dimension {dim}')
+                
+                # Normalize once at ingest; the stored rows then have norm 1 (0 for zero vectors)
+                X, raw_norms = VectorMath.normalize_rows(X)
+                X = np.ascontiguousarray(X, dtype='<f4')
+                norms = (raw_norms > 0).astype('<f4')
+                # Stores written before normalization keep dividing by their stored norms
+                normalized = n_vectors == 0 or meta.get('normalized') == '1'
+                
+                # Drop bytes left by an append that crashed before its commit
+                for path, row_bytes, data in ((self.vectors_path, dim * 4, X), (self.norms_path, 4, norms)):
+                    with open(path, 'ab') as f:
+                        f.truncate(n_vectors * row_bytes)
+                        f.write(data.tobytes())
+                        f.flush()
+                        os.fsync(f.fileno())
+                
+                # Chained fingerprint: cheap to extend, identifies the exact contents
+                digest = hashlib.sha1(meta.get('fingerprint', '').encode('utf-8'))
+                digest.update(X.tobytes())
+                
+                rows = rows or [{} for _ in range(len(X))]
+                conn.executemany(
+                    'INSERT OR REPLACE INTO rows (row_id, filename, position, text_hash, strategy) VALUES (?, ?, ?, ?, ?)',
+                    [
+                        (
+                            n_vectors + i,
+                            row.get('filename'),
+                            row.get('position'),
+                            row.get('text_hash') or (VectorStore.text_hash(row['text']) if 'text' in row else None),
+                            row.get('strategy')
+                        )
+                        for i, row in enumerate(rows)
+                    ]
+                )
+                conn.executemany(
+                    'INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)',
+                    [
+                        ('dim', str(dim)),
+                        ('n_vectors', str(n_vectors + len(X))),
+                        ('version', str(int(meta.get('version', 0)) + 1)),
+                        ('fingerprint', digest.hexdigest()),
+                        ('normalized', '1' if normalized else '0')
+                    ]
+                )
+            
+            self._load()
+        
+        logger.info(f"Appended {len(X)} vectors to vector store '{self.name}' ({self.n_vectors} total)")
+        return self.info()
+    
+    def embedding_set(self) -> EmbeddingSet:
+        """EmbeddingSet backed by the memory-mapped vectors (no copy, no re-hash)"""
+        if self.vectors is None:
+            raise ValueError(f"Vector store '{self.name}' is empty")
+        if self._embedding_set is None:
+            self._embedding_set = EmbeddingSet.from_float32(
+                self.vectors, self.norms, self.fingerprint, version=self.version, normalized=self.normalized
+            )
+        return self._embedding_set
+    
+    def metadata_index(self) -> MetadataIndex:
+        """Metadata index over all rows, built once per store version"""
+        if self._metadata_index is None or self._metadata_index.n_rows != self.n_vectors:
+            metadata = [{} for _ in range(self.n_vectors)]
+            if self.n_vectors:
+                for rows in self._db.fetch_batches(
+                    'SELECT row_id, filename, strategy, position FROM rows WHERE row_id < ?', (self.n_vectors,)
+                ):
+                    for row in rows:
+                        metadata[row['row_id']] = dict(row)
+            self._metadata_index = MetadataIndex(metadata)
+        return self._metadata_index
+    
+    def get_rows(self, indices: List[int]) -> Dict[int, Dict[str, Any]]:
+        """Sidecar metadata for the given row indices"""
+        indices = [int(i) for i in indices]
+        if not indices or not self.sidecar_path.exists():
+            return {}
+        
+        rows = self._db.fetch_in(
+            'SELECT row_id, filename, strategy, position, text_hash FROM rows WHERE row_id IN ({placeholders})', indices
+        )
+        return {row['row_id']: dict(row) for row in rows}
+    
+    def delete(self):
+        """Remove the store files"""
+        with VectorStore._lock, self._write_lock:
+            VectorStore._open_stores.pop(self.name, None)
+            VectorStore._invalidate_results(self.fingerprint)
+            self.vectors = None
+            self.norms = None
+            self._embedding_set = None
+            self._metadata_index = None
+            self._db.close()
+            sidecar_files = [self.sidecar_path.with_name(self.sidecar_path.name + suffix) for suffix in ('-wal', '-shm')]
+            for path in [self.vectors_path, self.norms_path, self.sidecar_path] + sidecar_files:
+                if path.exists():
+                    path.unlink()
+    
+    def info(self) -> Dict[str, Any]:
+        """Describe the store"""
+        return {
+            'name': self.name,
+            'n_vectors': self.n_vectors,
+            'dim': self.dim,
+            'version': self.version,
+            'fingerprint': self.fingerprint[:16],
+            'size_bytes': self.n_vectors * self.dim * 4
+        }
@@ -2,8 +2,14 @@
 Visualization Service - UMAP and t-SNE for Embedding Visualization
 Based on guide: "Evaluating Embedding Quality Before Ingesting into Vector Database"
 """
+import base64
+import hashlib
+import json
 import logging
-from typing import List, Dict, Any, Optional
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
@@ -29,32 +35,248 @@ except ImportError:
     HAS_TSNE = False
     logger.warning("sklearn not available, t-SNE visualization will not work")
 
+try:
+    from sklearn.decomposition import PCA
+    HAS_PCA = True
+except ImportError:
+    HAS_PCA = False
+    logger.warning("sklearn not available, PCA pre-reduction will be skipped")
+
 
 class VisualizationService:
     """Service for embedding visualization using UMAP and t-SNE"""
     
+    # Fitted projections keyed by (matrix fingerprint, reducer params).
+    # Kept in LRU order so repeated /api/visualization/reduce calls on the same
+    # embedding set skip the UMAP fit and new points can use transform().
+    _projection_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+    _projection_lock = threading.Lock()
+    
+    # Pre-reduction stages keyed without n_components / reducer settings: the
+    # PCA-projected matrix and, per (n_neighbors, metric), UMAP's kNN graph.
+    # Changing n_components or min_dist only reruns the final embedding step.
+    _stage_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+    
+    # Views of a projection: the fit entry plus one request's labels / chunk
+    # metadata, keyed by the projection_id returned to the client. Requests that
+    # share a fit but send different metadata get separate records.
+    _view_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+    
+    CACHE_DISABLED_ERROR = ('Projection caching is disabled (VISUALIZATION_CACHE_SIZE=0): '
+                            'zoomed views, point details and transform need a cached projection')
+    
+    # UMAP computes exact pairwise distances below this many rows; the kNN graph
+    # is only precomputed (and shared) above it
+    UMAP_EXACT_KNN_ROWS = 4096
+    
+    @staticmethod
+    def _matrix_fingerprint(X) -> str:
+        """Stable fingerprint of an embedding matrix (shape + float32 bytes)"""
+        digest = hashlib.sha1()
+        digest.update(str(X.shape).encode('utf-8'))
+        digest.update(np.ascontiguousarray(X, dtype=np.float32).tobytes())
+        return digest.hexdigest()
+    
+    @staticmethod
+    def _projection_key(fingerprint: str, params: Dict[str, Any]) -> str:
+        """Build cache key from matrix fingerprint and reducer params"""
+        param_str = ','.join(f"{k}={params[k]}" for k in sorted(params))
+        return hashlib.sha1(f"{fingerprint}|{param_str}".encode('utf-8')).hexdigest()[:16]
+    
+    @staticmethod
+    def _get_cached_projection(key: str, cache: Optional["OrderedDict[str, Dict[str, Any]]"] = None) -> Optional[Dict[str, Any]]:
+        """Get projection (or stage) from cache and mark it as recently used"""
+        cache = VisualizationService._projection_cache if cache is None else cache
+        with VisualizationService._projection_lock:
+            entry = cache.get(key)
+            if entry is not None:
+                cache.move_to_end(key)
+            return entry
+    
+    @staticmethod
+    def _store_projection(key: str, entry: Dict[str, Any], cache: Optional["OrderedDict[str, Dict[str, Any]]"] = None) -> None:
+        """Store projection (or stage) in cache, evicting least recently used entries"""
+        from config import VISUALIZATION_CACHE_SIZE
+        
+        cache = VisualizationService._projection_cache if cache is None else cache
+        with VisualizationService._projection_lock:
+            cache[key] = entry
+            cache.move_to_end(key)
+            while len(cache) > max(VISUALIZATION_CACHE_SIZE, 0):
+                evicted_key, _ = cache.popitem(last=False)
+                logger.info(f"Evicted cached projection {evicted_key}")
+    
+    @staticmethod
+    def caching_enabled() -> bool:
+        """Whether projections are kept (VISUALIZATION_CACHE_SIZE > 0)"""
+        from config import VISUALIZATION_CACHE_SIZE
+        return VISUALIZATION_CACHE_SIZE > 0
+    
+    @staticmethod
+    def _store_view(fit_id: str, entry: Dict[str, Any], labels: Optional[List[str]],
+                    chunks: Optional[List[Dict[str, Any]]]) -> str:
+        """Keep one request's labels / chunks with a fitted projection; returns the view's projection_id"""
+        metadata = json.dumps([labels, chunks], sort_keys=True, default=str)
+        view_id = hashlib.sha1(f"{fit_id}|{metadata}".encode('utf-8')).hexdigest()[:16]
+        VisualizationService._store_projection(
+            view_id, {'fit_id': fit_id, 'entry': entry, 'labels': labels, 'chunks': chunks},
+            VisualizationService._view_cache
+        )
+        return view_id
+    
+    @staticmethod
+    def _get_view(projection_id: str) -> Optional[Dict[str, Any]]:
+        """View record of a projection_id from prepare_visualization_data, or a bare fit without metadata"""
+        view = VisualizationService._get_cached_projection(projection_id, VisualizationService._view_cache)
+        if view is not None:
+            return view
+        entry = VisualizationService._get_cached_projection(projection_id)
+        if entry is not None:
+            return {'fit_id': projection_id, 'entry': entry, 'labels': None, 'chunks': None}
+        return None
+    
+    @staticmethod
+    def _not_found_error(projection_id: str) -> str:
+        if not VisualizationService.caching_enabled():
+            return VisualizationService.CACHE_DISABLED_ERROR
+        return f'Projection {projection_id} not found (expired or never fitted)'
+    
+    @staticmethod
+    def clear_projection_cache() -> None:
+        """Drop all cached projections, views and pre-reduction stages"""
+        with VisualizationService._projection_lock:
+            VisualizationService._projection_cache.clear()
+            VisualizationService._stage_cache.clear()
+            VisualizationService._view_cache.clear()
+    
+    @staticmethod
+    def get_projection_cache_info() -> Dict[str, Any]:
+        """Describe cached projections (for debugging / UI)"""
+        with VisualizationService._projection_lock:
+            return {
+                'size': len(VisualizationService._projection_cache),
+                'stages': len(VisualizationService._stage_cache),
+                'views': len(VisualizationService._view_cache),
+                'projections': [
+                    {
+                        'projection_id': key,
+                        'method': entry['method'],
+                        'n_samples': entry['n_samples'],
+                        'params': entry['params'],
+                        'fit_seconds': entry['fit_seconds']
+                    }
+                    for key, entry in VisualizationService._projection_cache.items()
+                ]
+            }
+    
+    @staticmethod
+    def _preproject(X, pca_components: Optional[int], random_state: Optional[int]) -> Tuple[Any, Any, Dict[str, float]]:
+        """
+        Convert to float32 and optionally run randomized PCA before the reducer
+        
+        The reducers' kNN step dominates on 768/1024-dim vectors; projecting to
+        ~50 dims first keeps neighborhoods nearly intact at a fraction of the cost.
+        
+        Returns:
+            (projected matrix, fitted PCA or None, stage timings in seconds)
+        """
+        timings = {}
+        
+        start = time.perf_counter()
+        X = np.asarray(X, dtype=np.float32)
+        timings['prepare_seconds'] = round(time.perf_counter() - start, 4)
+        
+        pca = None
+        n_samples, n_features = X.shape
+        if pca_components and HAS_PCA and n_features > pca_components and n_samples > pca_components:
+            start = time.perf_counter()
+            pca = PCA(n_components=pca_components, svd_solver='randomized', random_state=random_state)
+            X = pca.fit_transform(X).astype(np.float32, copy=False)
+            timings['pca_seconds'] = round(time.perf_counter() - start, 4)
+        
+        return X, pca, timings
+    
+    @staticmethod
+    def _get_stage(X, fingerprint: str, pca_components: Optional[int], random_state: Optional[int],
+                   use_cache: bool = True) -> Tuple[Dict[str, Any], bool]:
+        """
+        PCA pre-reduction of a matrix, shared by every method / n_components
+        
+        Returns:
+            (stage dict with 'X', 'pca', 'timings' and 'knn' graphs, whether it was cached)
+        """
+        key = VisualizationService._projection_key(
+            fingerprint, {'stage': 'pca', 'pca_components': pca_components, 'random_state': random_state}
+        )
+        stage = VisualizationService._get_cached_projection(key, VisualizationService._stage_cache) if use_cache else None
+        if stage is not None:
+            return stage, True
+        
+        X_reduced, pca, timings = VisualizationService._preproject(X, pca_components, random_state)
+        stage = {'X': X_reduced, 'pca': pca, 'timings': timings, 'knn': {}}
+        if use_cache:
+            VisualizationService._store_projection(key, stage, VisualizationService._stage_cache)
+        return stage, False
+    
+    @staticmethod
+    def _get_knn(stage: Dict[str, Any], n_neighbors: int, metric: str, random_state: Optional[int],
+                 n_jobs: int) -> Tuple[Tuple[Any, Any, Any], Optional[float]]:
+        """
+        UMAP's approximate kNN graph and search index over a stage matrix
+        
+        Returns:
+            ((knn_indices, knn_dists, search_index), build seconds or None when reused)
+        """
+        key = (n_neighbors, metric)
+        knn = stage['knn'].get(key)
+        if knn is not None:
+            return knn, None
+        
+        from sklearn.utils import check_random_state
+        
+        start = time.perf_counter()
+        knn = umap.umap_.nearest_neighbors(
+            stage['X'], n_neighbors, metric, {}, False, check_random_state(random_state), n_jobs=n_jobs
+        )
+        seconds = round(time.perf_counter() - start, 4)
+        stage['knn'][key] = knn
+        return knn, seconds
+    
     @staticmethod
     def umap_reduction(embeddings: List[List[float]], 
                       n_components: int = 2,
                       n_neighbors: int = 15,
                       min_dist: float = 0.1,
                       metric: str = 'cosine',
-                      random_state: int = 42) -> Dict[str, Any]:
+                      random_state: Optional[int] = 42,
+                      use_cache: bool = True,
+                      pca_components: Optional[int] = None,
+                      n_jobs: Optional[int] = None) -> Dict[str, Any]:
         """
         Reduce embedding dimensions using UMAP
         
         Recommended by guide: Fast, scalable, preserves global structure
         
+        Fitted reducers are cached by matrix fingerprint and UMAP params, so a
+        repeated call on the same embeddings returns the stored projection and
+        new points can be placed with transform_points() instead of a refit.
+        The PCA pre-projection and (from UMAP_EXACT_KNN_ROWS rows) the kNN graph
+        are cached separately, so a new n_components or min_dist only reruns
+        the embedding step.
+        
         Args:
             embeddings: List of embedding vectors
             n_components: Number of dimensions for output (2 for visualization, 10+ for clustering)
             n_neighbors: Number of neighbors (15 for viz, 30 for clustering)
             min_dist: Minimum distance between points (0.1 for viz, 0.0 for clustering)
             metric: Distance metric ('cosine', 'euclidean', etc.)
-            random_state: Random seed for reproducibility
+            random_state: Random seed for reproducibility (None enables parallel kNN / SGD)
+            use_cache: Reuse / store fitted reducer in the projection cache
+            pca_components: Randomized-PCA pre-projection size (0 disables, default from config)
+            n_jobs: Worker threads for neighbor search (default from config, -1 = all cores)
         
         Returns:
-            Dict with 2D/3D coordinates and metadata
+            Dict with 2D/3D coordinates, per-stage timings and metadata
         """
         if not HAS_UMAP or not HAS_NUMPY:
             return {
@@ -64,22 +286,84 @@ class VisualizationService:
             }
         
         try:
-            X = np.array(embeddings)
-            
-            # Create UMAP reducer
-            reducer = umap.UMAP(
-                n_neighbors=n_neighbors,
-                min_dist=min_dist,
-                n_components=n_components,
-                metric=metric,
-                random_state=random_state
-            )
+            from config import VISUALIZATION_PCA_COMPONENTS, VISUALIZATION_N_JOBS
+            
+            if pca_components is None:
+                pca_components = VISUALIZATION_PCA_COMPONENTS
+            if n_jobs is None:
+                n_jobs = VISUALIZATION_N_JOBS
+            # UMAP forces single-threaded execution when seeded; numba caps the thread count
+            if random_state is not None:
+                effective_n_jobs = 1
+            else:
+                import numba
+                max_threads = numba.config.NUMBA_NUM_THREADS
+                effective_n_jobs = max_threads if n_jobs < 1 else min(n_jobs, max_threads)
+            
+            total_start = time.perf_counter()
+            X = np.asarray(embeddings, dtype=np.float32)
+            fingerprint = VisualizationService._matrix_fingerprint(X)
+            
+            params = {
+                'method': 'umap',
+                'n_components': n_components,
+                'n_neighbors': n_neighbors,
+                'min_dist': min_dist,
+                'metric': metric,
+                'random_state': random_state,
+                'pca_components': pca_components
+            }
+            projection_id = VisualizationService._projection_key(fingerprint, params)
             
-            # Fit and transform
-            embedding_2d = reducer.fit_transform(X)
+            entry = VisualizationService._get_cached_projection(projection_id) if use_cache else None
+            cached = entry is not None
+            
+            if entry is None:
+                # PCA and the kNN graph do not depend on n_components / min_dist: reuse them
+                stage, stage_cached = VisualizationService._get_stage(X, fingerprint, pca_components, random_state, use_cache)
+                timings = {} if stage_cached else dict(stage['timings'])
+                
+                umap_params = {
+                    'n_neighbors': min(n_neighbors, max(2, len(X) - 1)),
+                    'min_dist': min_dist,
+                    'n_components': n_components,
+                    'metric': metric,
+                    'random_state': random_state,
+                    'n_jobs': effective_n_jobs
+                }
+                if len(X) >= VisualizationService.UMAP_EXACT_KNN_ROWS:
+                    knn, knn_seconds = VisualizationService._get_knn(
+                        stage, umap_params['n_neighbors'], metric, random_state, effective_n_jobs
+                    )
+                    if knn_seconds is not None:
+                        timings['knn_seconds'] = knn_seconds
+                    umap_params['precomputed_knn'] = knn
+                
+                # Create UMAP reducer
+                reducer = umap.UMAP(**umap_params)
+                
+                # Fit and transform
+                start = time.perf_counter()
+                embedding_2d = reducer.fit_transform(stage['X'])
+                timings['reduce_seconds'] = round(time.perf_counter() - start, 4)
+                
+                entry = {
+                    'method': 'UMAP',
+                    'reducer': reducer,
+                    'pca': stage['pca'],
+                    'coordinates': embedding_2d,
+                    'n_samples': len(X),
+                    'n_features': X.shape[1],
+                    'params': params,
+                    'timings': timings,
+                    'stage_cached': stage_cached,
+                    'fit_seconds': round(sum(timings.values()), 4)
+                }
+                if use_cache:
+                    VisualizationService._store_projection(projection_id, entry)
             
             # Convert to list of lists for JSON serialization
-            coordinates = embedding_2d.tolist()
+            coordinates = entry['coordinates'].tolist()
             
             return {
                 'success': True,
@@ -90,6 +374,13 @@ class VisualizationService:
                 'min_dist': min_dist,
                 'metric': metric,
                 'n_samples': len(embeddings),
+                'pca_components': entry['pca'].n_components_ if entry['pca'] is not None else None,
+                'n_jobs': effective_n_jobs,
+                'projection_id': projection_id if use_cache and VisualizationService.caching_enabled() else None,
+                'cached': cached,
+                'stage_cached': entry['stage_cached'],
+                'fit_seconds': entry['fit_seconds'],
+                'timings': dict(entry['timings'], total_seconds=round(time.perf_counter() - total_start, 4)),
                 'description': 'UMAP dimensionality reduction. Preserves both local and global structure. Fast and scalable.'
             }
         except Exception as e:
@@ -104,22 +395,31 @@ class VisualizationService:
     def tsne_reduction(embeddings: List[List[float]],
                       n_components: int = 2,
                       perplexity: float = 30.0,
-                      random_state: int = 42,
-                      n_iter: int = 1000) -> Dict[str, Any]:
+                      random_state: Optional[int] = 42,
+                      n_iter: int = 1000,
+                      use_cache: bool = True,
+                      pca_components: Optional[int] = None,
+                      n_jobs: Optional[int] = None) -> Dict[str, Any]:
         """
         Reduce embedding dimensions using t-SNE
         
         Note from guide: Slower than UMAP, mainly preserves local structure
         
+        Uses Barnes-Hut approximation with PCA initialization. t-SNE cannot
+        place new points, so cached entries only store coordinates.
+        
         Args:
             embeddings: List of embedding vectors
-            n_components: Number of dimensions (typically 2)
+            n_components: Number of dimensions (typically 2, Barnes-Hut supports < 4)
             perplexity: Balance between local/global structure (typically 5-50)
             random_state: Random seed
             n_iter: Number of iterations
+            use_cache: Reuse / store coordinates in the projection cache
+            pca_components: Randomized-PCA pre-projection size (0 disables, default from config)
+            n_jobs: Worker threads for neighbor search (default from config, -1 = all cores)
         
         Returns:
-            Dict with 2D coordinates and metadata
+            Dict with 2D coordinates, per-stage timings and metadata
         """
         if not HAS_TSNE or not HAS_NUMPY:
             return {
@@ -129,27 +429,76 @@ class VisualizationService:
             }
         
         try:
-            X = np.array(embeddings)
+            from config import VISUALIZATION_PCA_COMPONENTS, VISUALIZATION_N_JOBS
+            
+            if pca_components is None:
+                pca_components = VISUALIZATION_PCA_COMPONENTS
+            if n_jobs is None:
+                n_jobs = VISUALIZATION_N_JOBS
+            
+            total_start = time.perf_counter()
+            X = np.asarray(embeddings, dtype=np.float32)
+            fingerprint = VisualizationService._matrix_fingerprint(X)
             
             # Limit perplexity based on sample size
             n_samples = len(embeddings)
             if perplexity >= n_samples:
-                perplexity = max(5, n_samples - 1)
-            
-            # Create t-SNE reducer
-            reducer = TSNE(
-                n_components=n_components,
-                perplexity=perplexity,
-                random_state=random_state,
-                n_iter=n_iter,
-                metric='cosine'
-            )
+                perplexity = max(1, n_samples - 1)
+            
+            params = {
+                'method': 'tsne',
+                'n_components': n_components,
+                'perplexity': perplexity,
+                'random_state': random_state,
+                'n_iter': n_iter,
+                'pca_components': pca_components
+            }
+            projection_id = VisualizationService._projection_key(fingerprint, params)
+            
+            entry = VisualizationService._get_cached_projection(projection_id) if use_cache else None
+            cached = entry is not None
             
-            # Fit and transform
-            embedding_2d = reducer.fit_transform(X)
+            if entry is None:
+                stage, stage_cached = VisualizationService._get_stage(X, fingerprint, pca_components, random_state, use_cache)
+                timings = {} if stage_cached else dict(stage['timings'])
+                
+                # Create t-SNE reducer (scikit-learn renamed n_iter to max_iter in 1.5)
+                tsne_params = {
+                    'n_components': n_components,
+                    'perplexity': perplexity,
+                    'random_state': random_state,
+                    'metric': 'cosine',
+                    'method': 'barnes_hut' if n_components < 4 else 'exact',
+                    'init': 'pca',
+                    'n_jobs': n_jobs
+                }
+                try:
+                    reducer = TSNE(max_iter=n_iter, **tsne_params)
+                except TypeError:
+                    reducer = TSNE(n_iter=n_iter, **tsne_params)
+                
+                # Fit and transform
+                start = time.perf_counter()
+                embedding_2d = reducer.fit_transform(stage['X'])
+                timings['reduce_seconds'] = round(time.perf_counter() - start, 4)
+                
+                entry = {
+                    'method': 't-SNE',
+                    'reducer': None,
+                    'pca': stage['pca'],
+                    'coordinates': embedding_2d,
+                    'n_samples': n_samples,
+                    'n_features': X.shape[1],
+                    'params': params,
+                    'timings': timings,
+                    'stage_cached': stage_cached,
+                    'fit_seconds': round(sum(timings.values()), 4)
+                }
+                if use_cache:
+                    VisualizationService._store_projection(projection_id, entry)
             
             # Convert to list of lists
-            coordinates = embedding_2d.tolist()
+            coordinates = entry['coordinates'].tolist()
             
             return {
                 'success': True,
@@ -158,7 +507,14 @@ class VisualizationService:
                 'n_components': n_components,
                 'perplexity': perplexity,
                 'n_iter': n_iter,
-                'n_samples': len(embeddings),
+                'n_samples': n_samples,
+                'pca_components': entry['pca'].n_components_ if entry['pca'] is not None else None,
+                'n_jobs': n_jobs,
+                'projection_id': projection_id if use_cache and VisualizationService.caching_enabled() else None,
+                'cached': cached,
+                'stage_cached': entry['stage_cached'],
+                'fit_seconds': entry['fit_seconds'],
+                'timings': dict(entry['timings'], total_seconds=round(time.perf_counter() - total_start, 4)),
                 'description': 't-SNE dimensionality reduction. Preserves local structure well. Slower than UMAP for large datasets.'
             }
         except Exception as e:
@@ -169,12 +525,237 @@ class VisualizationService:
                 'coordinates': None
             }
     
+    @staticmethod
+    def transform_points(projection_id: str, embeddings: List[List[float]]) -> Dict[str, Any]:
+        """
+        Place new points (queries, freshly ingested chunks) into a cached projection
+        
+        Uses the fitted reducer's transform() instead of refitting on the whole set.
+        
+        Args:
+            projection_id: Id returned by umap_reduction / prepare_visualization_data
+            embeddings: New embedding vectors (same dimension as the fitted set)
+        
+        Returns:
+            Dict with coordinates of the new points
+        """
+        if not HAS_UMAP or not HAS_NUMPY:
+            return {
+                'success': False,
+                'error': 'umap-learn or numpy not available',
+                'coordinates': None
+            }
+        
+        view = VisualizationService._get_view(projection_id)
+        if view is None:
+            return {
+                'success': False,
+                'error': VisualizationService._not_found_error(projection_id),
+                'coordinates': None
+            }
+        entry = view['entry']
+        
+        if entry.get('reducer') is None:
+            return {
+                'success': False,
+                'error': f"{entry['method']} projection does not support transforming new points",
+                'coordinates': None
+            }
+        
+        try:
+            X = np.asarray(embeddings, dtype=np.float32)
+            if X.ndim == 1:
+                X = X.reshape(1, -1)
+            
+            if X.ndim != 2 or X.shape[1] != entry['n_features']:
+                got = X.shape[1] if X.ndim == 2 else None
+                return {
+                    'success': False,
+                    'error': f"Projection {projection_id} was fitted on {entry['n_features']}-dimensional embeddings, got {got}",
+                    'expected_dim': entry['n_features'],
+                    'got_dim': got,
+                    'coordinates': None
+                }
+            
+            start = time.perf_counter()
+            if entry.get('pca') is not None:
+                X = entry['pca'].transform(X).astype(np.float32, copy=False)
+            coordinates = entry['reducer'].transform(X)
+            
+            return {
+                'success': True,
+                'coordinates': coordinates.tolist(),
+                'projection_id': projection_id,
+                'n_samples': len(X),
+                'transform_seconds': round(time.perf_counter() - start, 4)
+            }
+        except Exception as e:
+            logger.error(f"Error transforming points with projection {projection_id}: {e}")
+            return {
+                'success': False,
+                'error': str(e),
+                'coordinates': None
+            }
+    
+    @staticmethod
+    def level_of_detail(coordinates, max_points: Optional[int] = None,
+                        viewport: Optional[Dict[str, float]] = None) -> Tuple[Any, Any]:
+        """
+        Density-aware downsampling of projected points
+        
+        Points are binned on a grid over the (visible) projection. Each occupied
+        cell keeps one representative - the point closest to the cell centroid -
+        weighted by the number of points it stands for. The grid resolution is
+        chosen as the finest one that keeps at most max_points cells, so sparse
+        regions keep every point while dense clusters collapse.
+        
+        Args:
+            coordinates: (n, d) array of projected coordinates
+            max_points: Maximum number of points to return (None = no limit)
+            viewport: Optional bounds {'x_min', 'x_max', 'y_min', 'y_max'} for zoomed views
+        
+        Returns:
+            (selected original indices, weights) as int arrays
+        """
+        coords = np.asarray(coordinates, dtype=np.float32)
+        indices = np.arange(len(coords))
+        
+        if viewport:
+            mask = np.ones(len(coords), dtype=bool)
+            for axis, column in (('x', 0), ('y', 1)):
+                if viewport.get(f'{axis}_min') is not None:
+                    mask &= coords[:, column] >= float(viewport[f'{axis}_min'])
+                if viewport.get(f'{axis}_max') is not None:
+                    mask &= coords[:, column] <= float(viewport[f'{axis}_max'])
+            indices = indices[mask]
+        
+        if not max_points or len(indices) <= max_points:
+            return indices, np.ones(len(indices), dtype=np.int32)
+        
+        points = coords[indices, :min(coords.shape[1], 3)]
+        lower = points.min(axis=0)
+        span = np.maximum(points.max(axis=0) - lower, 1e-9)
+        n_dims = points.shape[1]
+        
+        def assign_cells(grid_size: int):
+            cell_coords = np.minimum(((points - lower) / span * grid_size).astype(np.int64), grid_size - 1)
+            return np.ravel_multi_index(cell_coords.T, (grid_size,) * n_dims)
+        
+        # Finest grid whose number of occupied cells still fits in max_points
+        grid_lo, grid_hi = 1, max(2, int(np.ceil(max_points ** (1.0 / n_dims))) * 8)
+        while grid_lo < grid_hi:
+            grid_mid = (grid_lo + grid_hi + 1) // 2
+            if len(np.unique(assign_cells(grid_mid))) <= max_points:
+                grid_lo = grid_mid
+            else:
+                grid_hi = grid_mid - 1
+        
+        cells = assign_cells(grid_lo)
+        _, inverse, counts = np.unique(cells, return_inverse=True, return_counts=True)
+        
+        # Representative = point nearest to its cell centroid
+        centroids = np.stack(
+            [np.bincount(inverse, weights=points[:, d]) / counts for d in range(n_dims)], axis=1
+        )
+        distances = np.sum((points - centroids[inverse]) ** 2, axis=1)
+        order = np.lexsort((distances, inverse))
+        first_in_cell = order[np.r_[0, np.flatnonzero(np.diff(inverse[order])) + 1]]
+        
+        return indices[first_in_cell], counts.astype(np.int32)
+    
+    @staticmethod
+    def _encode_column(values, dtype) -> str:
+        """Encode a numeric column as base64 little-endian bytes (decoded into typed arrays on the client)"""
+        return base64.b64encode(np.ascontiguousarray(values, dtype=np.dtype(dtype).newbyteorder('<')).tobytes()).decode('ascii')
+    
+    @staticmethod
+    def _build_view(coordinates, selected, weights,
+                    labels: Optional[List[str]] = None,
+                    chunks: Optional[List[Dict[str, Any]]] = None,
+                    output_format: str = 'points') -> Dict[str, Any]:
+        """
+        Build the point payload for the selected indices
+        
+        'points' keeps the per-point dicts the UI has always used. 'columnar'
+        returns base64 float32/int32 columns plus dictionary-encoded filenames
+        and labels; chunk text is left out and fetched on demand by index.
+        """
+        coords = np.asarray(coordinates, dtype=np.float32)
+        n_components = coords.shape[1] if coords.ndim == 2 else 0
+        
+        if output_format == 'columnar':
+            view = {
+                'format': 'columnar',
+                'encoding': 'base64',
+                'n_points': int(len(selected)),
+                'dtype': {'coordinates': 'float32', 'indices': 'int32', 'weights': 'int32'},
+                'x': VisualizationService._encode_column(coords[selected, 0], np.float32),
+                'y': VisualizationService._encode_column(coords[selected, 1], np.float32) if n_components > 1 else None,
+                'z': VisualizationService._encode_column(coords[selected, 2], np.float32) if n_components > 2 else None,
+                'indices': VisualizationService._encode_column(selected, np.int32),
+                'weights': VisualizationService._encode_column(weights, np.int32)
+            }
+            
+            if labels:
+                label_values, label_codes = np.unique(
+                    np.array([str(labels[i]) if i < len(labels) else '' for i in selected], dtype=object),
+                    return_inverse=True
+                )
+                view['labels'] = {'values': label_values.tolist(), 'codes': VisualizationService._encode_column(label_codes, np.int32)}
+            
+            if chunks:
+                filenames = np.array([chunks[i].get('filename', '') if i < len(chunks) else '' for i in selected], dtype=object)
+                filename_values, filename_codes = np.unique(filenames, return_inverse=True)
+                view['filenames'] = {'values': filename_values.tolist(), 'codes': VisualizationService._encode_column(filename_codes, np.int32)}
+                view['positions'] = VisualizationService._encode_column(
+                    [chunks[i].get('position', 0) if i < len(chunks) else 0 for i in selected], np.int32
+                )
+                view['dtype']['positions'] = 'int32'
+            
+            return view
+        
+        # Prepare data points
+        data_points = []
+        for i, weight in zip(selected.tolist(), weights.tolist()):
+            coord = coords[i]
+            point = {
+                'x': float(coord[0]) if n_components > 0 else 0,
+                'y': float(coord[1]) if n_components > 1 else 0,
+                'z': float(coord[2]) if n_components > 2 else None,  # 3D if available
+                'index': i
+            }
+            if weight != 1:
+                point['weight'] = weight
+            
+            # Add label if provided
+            if labels and i < len(labels):
+                point['label'] = labels[i]
+            
+            # Add chunk metadata if provided
+            if chunks and i < len(chunks):
+                chunk = chunks[i]
+                point['chunk_id'] = chunk.get('chunk_id', i)
+                point['filename'] = chunk.get('filename', '')
+                point['text_preview'] = chunk.get('text', '')[:200] if chunk.get('text') else ''
+                point['full_text'] = chunk.get('text', '')  # Full text for tooltip
+                point['position'] = chunk.get('position', 0)
+            
+            data_points.append(point)
+        
+        return {'format': 'points', 'points': data_points}
+    
     @staticmethod
     def prepare_visualization_data(embeddings: List[List[float]], 
                                   labels: Optional[List[str]] = None,
                                   chunks: Optional[List[Dict[str, Any]]] = None,
                                   method: str = 'umap',
-                                  n_components: int = 2) -> Dict[str, Any]:
+                                  n_components: int = 2,
+                                  pca_components: Optional[int] = None,
+                                  n_jobs: Optional[int] = None,
+                                  random_state: Optional[int] = 42,
+                                  output_format: str = 'points',
+                                  max_points: Optional[int] = None,
+                                  viewport: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
         """
         Prepare data for visualization with metadata
         
@@ -183,56 +764,85 @@ class VisualizationService:
             labels: Optional cluster labels or category labels
             chunks: Optional chunk metadata (for tooltips/hover info)
             method: 'umap' (recommended) or 'tsne'
+            n_components: Output dimensions (2 or 3)
+            pca_components: Randomized-PCA pre-projection size (0 disables, default from config)
+            n_jobs: Worker threads for neighbor search (default from config)
+            random_state: Random seed; None gives up reproducibility so UMAP can run on n_jobs threads
+                (a seeded UMAP runs single-threaded)
+            output_format: 'points' (per-point dicts) or 'columnar' (base64 typed columns, no text)
+            max_points: Level-of-detail limit; larger sets are density-downsampled
+            viewport: Optional x/y bounds to restrict the view (zoomed-in level of detail)
         
         Returns:
             Dict with coordinates, labels, and metadata for frontend visualization
         """
         try:
-            # Reduce dimensions - Always use UMAP
-            reduction_result = VisualizationService.umap_reduction(
-                embeddings,
-                n_components=n_components
-            )
+            if output_format not in ('points', 'columnar'):
+                return {
+                    'success': False,
+                    'error': f'Unknown output format: {output_format}. Supported: points, columnar',
+                    'data': None
+                }
+            
+            # Reduce dimensions
+            if method == 'tsne':
+                reduction_result = VisualizationService.tsne_reduction(
+                    embeddings,
+                    n_components=n_components,
+                    random_state=random_state,
+                    pca_components=pca_components,
+                    n_jobs=n_jobs
+                )
+            elif method == 'umap':
+                reduction_result = VisualizationService.umap_reduction(
+                    embeddings,
+                    n_components=n_components,
+                    random_state=random_state,
+                    pca_components=pca_components,
+                    n_jobs=n_jobs
+                )
+            else:
+                return {
+                    'success': False,
+                    'error': f'Unknown method: {method}. Supported: umap, tsne',
+                    'data': None
+                }
             
             if not reduction_result.get('success'):
                 return reduction_result
             
-            coordinates = reduction_result.get('coordinates', [])
+            coordinates = np.asarray(reduction_result.get('coordinates', []), dtype=np.float32)
+            fit_id = reduction_result.get('projection_id')
             
-            # Prepare data points
-            data_points = []
-            for i, coord in enumerate(coordinates):
-                point = {
-                    'x': coord[0] if len(coord) > 0 else 0,
-                    'y': coord[1] if len(coord) > 1 else 0,
-                    'z': coord[2] if len(coord) > 2 else None,  # 3D if available
-                    'index': i
-                }
-                
-                # Add label if provided
-                if labels and i < len(labels):
-                    point['label'] = labels[i]
-                
-                # Add chunk metadata if provided
-                if chunks and i < len(chunks):
-                    chunk = chunks[i]
-                    point['chunk_id'] = chunk.get('chunk_id', i)
-                    point['filename'] = chunk.get('filename', '')
-                    point['text_preview'] = chunk.get('text', '')[:200] if chunk.get('text') else ''
-                    point['full_text'] = chunk.get('text', '')  # Full text for tooltip
-                    point['position'] = chunk.get('position', 0)
-                
-                data_points.append(point)
+            # Keep this request's labels / chunk metadata in its own view record so
+            # zoomed views and on-demand text lookups don't need the client to resend them
+            entry = VisualizationService._get_cached_projection(fit_id) if fit_id else None
+            projection_id = VisualizationService._store_view(fit_id, entry, labels, chunks) if entry is not None else None
+            
+            selected, weights = VisualizationService.level_of_detail(coordinates, max_points, viewport)
+            view = VisualizationService._build_view(coordinates, selected, weights, labels, chunks, output_format)
+            
+            data = {
+                'method': reduction_result.get('method'),
+                'n_components': reduction_result.get('n_components', 2),
+                'n_samples': len(embeddings),
+                'n_points': int(len(selected)),
+                'downsampled': bool(len(selected) < len(coordinates)),
+                'projection_id': projection_id,
+                'projection_error': None if projection_id else VisualizationService.CACHE_DISABLED_ERROR,
+                'cached': reduction_result.get('cached', False),
+                'fit_seconds': reduction_result.get('fit_seconds'),
+                'timings': reduction_result.get('timings'),
+                'pca_components': reduction_result.get('pca_components'),
+                'n_jobs': reduction_result.get('n_jobs'),
+                'random_state': random_state,
+                'description': reduction_result.get('description', '')
+            }
+            data.update(view)
             
             return {
                 'success': True,
-                'data': {
-                    'points': data_points,
-                    'method': reduction_result.get('method'),
-                    'n_components': reduction_result.get('n_components', 2),
-                    'n_samples': len(embeddings),
-                    'description': reduction_result.get('description', '')
-                }
+                'data': data
             }
         except Exception as e:
             logger.error(f"Error preparing visualization data: {e}")
@@ -241,3 +851,91 @@ class VisualizationService:
                 'error': str(e),
                 'data': None
             }
+    
+    @staticmethod
+    def get_projection_view(projection_id: str,
+                            max_points: Optional[int] = None,
+                            viewport: Optional[Dict[str, float]] = None,
+                            output_format: str = 'columnar') -> Dict[str, Any]:
+        """
+        Re-sample a cached projection (e.g. after zooming) without re-sending embeddings
+        
+        Args:
+            projection_id: Id returned by prepare_visualization_data
+            max_points: Level-of-detail limit for the visible region
+            viewport: Optional x/y bounds of the visible region
+            output_format: 'columnar' or 'points'
+        
+        Returns:
+            Dict with the same payload shape as prepare_visualization_data
+        """
+        record = VisualizationService._get_view(projection_id)
+        if record is None:
+            return {
+                'success': False,
+                'error': VisualizationService._not_found_error(projection_id),
+                'data': None
+            }
+        entry = record['entry']
+        
+        try:
+            coordinates = entry['coordinates']
+            selected, weights = VisualizationService.level_of_detail(coordinates, max_points, viewport)
+            view = VisualizationService._build_view(
+                coordinates, selected, weights, record['labels'], record['chunks'], output_format
+            )
+            
+            data = {
+                'method': entry['method'],
+                'n_components': int(coordinates.shape[1]),
+                'n_samples': entry['n_samples'],
+                'n_points': int(len(selected)),
+                'downsampled': bool(len(selected) < len(coordinates)),
+                'projection_id': projection_id,
+                'cached': True
+            }
+            data.update(view)
+            
+            return {
+                'success': True,
+                'data': data
+            }
+        except Exception as e:
+            logger.error(f"Error building projection view: {e}")
+            return {
+                'success': False,
+                'error': str(e),
+                'data': None
+            }
+    
+    @staticmethod
+    def get_point_details(projection_id: str, index: int) -> Dict[str, Any]:
+        """Get chunk text / metadata for one point of a cached projection (on-demand tooltips)"""
+        record = VisualizationService._get_view(projection_id)
+        if record is None:
+            return {
+                'success': False,
+                'error': VisualizationService._not_found_error(projection_id)
+            }
+        entry = record['entry']
+        
+        if index < 0 or index >= entry['n_samples']:
+            return {
+                'success': False,
+                'error': f'Point index {index} out of range (0-{entry["n_samples"] - 1})'
+            }
+        
+        chunks = record['chunks'] or []
+        labels = record['labels'] or []
+        chunk = chunks[index] if index < len(chunks) else {}
+        
+        return {
+            'success': True,
+            'index': index,
+            'chunk_id': chunk.get('chunk_id', index),
+            'filename': chunk.get('filename', ''),
+            'position': chunk.get('position', 0),
+            'label': labels[index] if index < len(labels) else None,
+            'text': chunk.get('text', '')
+        }
+
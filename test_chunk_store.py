@@ -0,0 +1,109 @@
+"""
+Unit tests for persisted chunks and their keyset pagination
+Run: python3 -m pytest test_chunk_store.py
+"""
+import pytest
+
+import database
+from services.chunk_store import ChunkStore
+
+
+@pytest.fixture(autouse=True)
+def app_db(tmp_path, monkeypatch):
+    # A fresh app database per test
+    monkeypatch.setattr(database, 'DATABASE_PATH', tmp_path / 'app.db')
+    monkeypatch.setattr(ChunkStore, '_schema_ready', False)
+    yield
+    database.get_manager().close()
+
+
+def make_chunks(filenames, count, prefix=''):
+    return [
+        {'filename': filename, 'position': position, 'text': f'{prefix}{filename} {position}', 'len_chars': 10}
+        for filename in filenames for position in range(count)
+    ]
+
+
+def all_pages(limit, **filters):
+    chunks, cursor, pages = [], None, 0
+    while True:
+        page = ChunkStore.list_chunks(cursor=cursor, limit=limit, **filters)
+        chunks.extend(page['chunks'])
+        pages += 1
+        cursor = page['next_cursor']
+        if cursor is None:
+            return chunks, pages
+
+
+def keys(chunks):
+    return [(chunk['doc_id'], chunk['strategy'], chunk['position']) for chunk in chunks]
+
+
+def test_save_run_assigns_ids():
+    chunks = make_chunks(['none-a.txt', 'none-b.txt'], 3)
+    result = ChunkStore.save_run(chunks, 'fixed', {'size': 10})
+    assert result['documents'] == 2 and result['chunks'] == 6
+    assert set(result['doc_ids']) == {'none-a.txt', 'none-b.txt'}
+    assert all(chunk['chunk_id'] is not None for chunk in chunks)
+    assert len({chunk['chunk_id'] for chunk in chunks}) == 6
+    assert ChunkStore.save_run([], 'fixed', {})['chunks'] == 0
+
+
+def test_pages_cover_every_chunk_once_in_order():
+    filenames = ['none-a.txt', 'none-b.txt', 'none-c.txt']
+    ChunkStore.save_run(make_chunks(filenames, 7), 'fixed', {})
+    ChunkStore.save_run(make_chunks(filenames[:2], 5), 'sentence', {})
+    
+    everything = ChunkStore.list_chunks(limit=100)
+    assert everything['next_cursor'] is None
+    assert len(everything['chunks']) == 31
+    assert keys(everything['chunks']) == sorted(keys(everything['chunks']))
+    
+    for limit in (1, 4, 31):
+        chunks, pages = all_pages(limit)
+        assert keys(chunks) == keys(everything['chunks'])
+        assert pages == -(-31 // limit)
+    
+    # Filtered by strategy, the cursor seeks (doc_id, position) within it
+    chunks, _ = all_pages(3, strategy='sentence')
+    assert [(chunk['filename'], chunk['position']) for chunk in chunks] == [
+        (filename, position) for filename in filenames[:2] for position in range(5)
+    ]
+    
+    chunks, _ = all_pages(2, filename='none-b.txt')
+    assert len(chunks) == 12 and {chunk['filename'] for chunk in chunks} == {'none-b.txt'}
+
+
+def test_rows_added_behind_the_cursor_do_not_shift_pages():
+    ChunkStore.save_run(make_chunks(['none-a.txt', 'none-b.txt'], 4), 'fixed', {})
+    first = ChunkStore.list_chunks(strategy='fixed', limit=5)
+    
+    # Re-chunking the first document (already read) must not repeat or skip rows of the second
+    ChunkStore.save_run(make_chunks(['none-a.txt'], 6, prefix='v2 '), 'fixed', {})
+    second = ChunkStore.list_chunks(strategy='fixed', cursor=first['next_cursor'], limit=5)
+    assert [(chunk['filename'], chunk['position']) for chunk in second['chunks']] == [
+        ('none-b.txt', 1), ('none-b.txt', 2), ('none-b.txt', 3)
+    ]
+    assert second['next_cursor'] is None
+
+
+def test_save_run_replaces_earlier_chunks_of_the_strategy():
+    ChunkStore.save_run(make_chunks(['none-a.txt'], 5), 'fixed', {})
+    ChunkStore.save_run(make_chunks(['none-a.txt'], 2), 'sentence', {})
+    ChunkStore.save_run(make_chunks(['none-a.txt'], 3, prefix='v2 '), 'fixed', {})
+    
+    fixed = ChunkStore.list_chunks(strategy='fixed')['chunks']
+    assert [chunk['text'] for chunk in fixed] == ['v2 none-a.txt 0', 'v2 none-a.txt 1', 'v2 none-a.txt 2']
+    assert len(ChunkStore.list_chunks(strategy='sentence')['chunks']) == 2
+
+
+def test_cursor_round_trip_and_limits():
+    cursor = ChunkStore.encode_cursor(3, 'fixed', 12)
+    assert ChunkStore.decode_cursor(cursor) == (3, 'fixed', 12)
+    with pytest.raises(ValueError, match='Invalid cursor'):
+        ChunkStore.decode_cursor('bm90IGpzb24=')
+    with pytest.raises(ValueError, match='Invalid cursor'):
+        ChunkStore.list_chunks(cursor='!!!')
+    
+    assert ChunkStore.list_chunks(limit=0)['limit'] == 1
+    assert ChunkStore.list_chunks(limit=10 ** 6)['limit'] == ChunkStore.MAX_PAGE_SIZE
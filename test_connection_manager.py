@@ -0,0 +1,136 @@
+"""
+Unit tests for the pooled SQLite connection manager
+Run: python3 -m pytest test_connection_manager.py
+"""
+import threading
+
+import pytest
+
+from database import ConnectionManager
+
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = ConnectionManager(tmp_path / 'pool.db', pool_size=2)
+    manager.execute('CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)')
+    yield manager
+    manager.close()
+
+
+def test_connections_are_tuned(manager):
+    with manager.connection() as conn:
+        assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+        assert conn.execute('PRAGMA synchronous').fetchone()[0] == 1  # NORMAL
+        assert conn.isolation_level is None
+
+
+def test_connections_are_reused(manager):
+    with manager.connection() as first:
+        pass
+    with manager.connection() as second:
+        assert second is first
+    stats = manager.stats()
+    assert stats['opened'] == 1 and stats['reused'] >= 1
+    assert stats['idle'] == 1 and stats['in_use'] == 0
+
+
+def test_nested_blocks_share_the_connection(manager):
+    with manager.connection() as outer:
+        with manager.connection() as inner:
+            assert inner is outer
+        with manager.transaction() as conn:
+            assert conn is outer
+        assert manager.stats()['in_use'] == 1
+
+
+def test_threads_get_their_own_connection_and_the_pool_is_bounded(manager):
+    held = threading.Barrier(4)
+    release = threading.Event()
+    connections = []
+    
+    def hold():
+        with manager.connection() as conn:
+            connections.append(conn)
+            held.wait(5)
+            release.wait(5)
+    
+    threads = [threading.Thread(target=hold) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    held.wait(5)
+    assert manager.stats()['in_use'] == 3
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    
+    assert len({id(conn) for conn in connections}) == 3
+    stats = manager.stats()
+    assert stats['peak_in_use'] == 3
+    # Only pool_size connections are kept; the third is closed on release
+    assert stats['idle'] == 2 and stats['closed'] == 1
+
+
+def test_transaction_commits_or_rolls_back(manager):
+    with manager.transaction() as conn:
+        conn.execute("INSERT INTO items (name) VALUES ('kept')")
+        # A nested block joins the outer transaction
+        with manager.transaction() as inner:
+            inner.execute("INSERT INTO items (name) VALUES ('joined')")
+    
+    with pytest.raises(RuntimeError):
+        with manager.transaction() as conn:
+            conn.execute("INSERT INTO items (name) VALUES ('lost')")
+            raise RuntimeError('abort')
+    
+    assert [row['name'] for row in manager.fetch_all('SELECT name FROM items ORDER BY id')] == ['kept', 'joined']
+    
+    # An abandoned explicit BEGIN is rolled back when the connection is released
+    with manager.connection() as conn:
+        conn.execute('BEGIN')
+        conn.execute("INSERT INTO items (name) VALUES ('abandoned')")
+    with manager.connection() as conn:
+        assert not conn.in_transaction
+    assert manager.fetch_one('SELECT COUNT(*) AS n FROM items')['n'] == 2
+
+
+def test_fetch_in_batches_long_lists(manager):
+    count = ConnectionManager.MAX_VARIABLES * 2 + 5
+    assert manager.execute_many('INSERT INTO items (id, name) VALUES (?, ?)', [(i, f'item {i}') for i in range(count)]) == count
+    
+    wanted = list(range(count)) + [count + 100]
+    rows = manager.fetch_in('SELECT id FROM items WHERE name != ? AND id IN ({placeholders})', wanted, params=['item 0'])
+    assert sorted(row['id'] for row in rows) == list(range(1, count))
+    assert manager.fetch_in('SELECT id FROM items WHERE id IN ({placeholders})', []) == []
+
+
+def test_fetch_batches(manager):
+    manager.execute_many('INSERT INTO items (name) VALUES (?)', [(str(i),) for i in range(25)])
+    sizes = [len(rows) for rows in manager.fetch_batches('SELECT * FROM items', batch_size=10)]
+    assert sizes == [10, 10, 5]
+
+
+def test_close_drops_idle_and_checked_out_connections(manager):
+    with manager.connection():
+        pass
+    with manager.connection():
+        manager.close()
+        assert manager.stats()['idle'] == 0
+    # Checked out before close(): closed on release instead of pooled
+    stats = manager.stats()
+    assert stats['idle'] == 0 and stats['in_use'] == 0
+    
+    with manager.connection() as conn:
+        assert conn.execute('SELECT 1').fetchone()[0] == 1
+    assert manager.stats()['idle'] == 1
+
+
+def test_for_path_shares_one_manager_per_file(tmp_path):
+    path = tmp_path / 'shared.db'
+    manager = ConnectionManager.for_path(path)
+    try:
+        assert ConnectionManager.for_path(str(path)) is manager
+        assert ConnectionManager.for_path(tmp_path / '.' / 'shared.db') is manager
+        assert manager.path in ConnectionManager.get_all_stats()
+    finally:
+        manager.close()
+        ConnectionManager._managers.pop(manager.path, None)
@@ -0,0 +1,80 @@
+"""
+Unit tests for the binary embedding transport
+Run: python3 -m pytest test_embedding_codec.py
+"""
+import gzip
+import io
+
+import numpy as np
+import pytest
+
+from services.embedding_codec import EmbeddingCodec
+
+
+@pytest.fixture
+def matrix():
+    return np.random.RandomState(0).randn(20, 8).astype(np.float32)
+
+
+@pytest.mark.parametrize('mimetype', [EmbeddingCodec.MIME_F32, EmbeddingCodec.MIME_NPY])
+@pytest.mark.parametrize('compress', [False, True])
+def test_round_trip(matrix, mimetype, compress):
+    body = EmbeddingCodec.encode(matrix, mimetype, compress=compress)
+    decoded = EmbeddingCodec.decode(body, mimetype, 'gzip' if compress else None)
+    assert decoded.dtype == np.float32
+    np.testing.assert_array_equal(decoded, matrix)
+
+
+def test_f32_header_and_zero_copy(matrix):
+    body = EmbeddingCodec.encode(matrix)
+    assert body[:4] == EmbeddingCodec.MAGIC
+    assert len(body) == EmbeddingCodec.HEADER.size + matrix.nbytes
+    # Uncompressed payloads are wrapped, not copied
+    assert not EmbeddingCodec.decode(body, EmbeddingCodec.MIME_F32).flags.writeable
+
+
+def test_npy_other_dtypes_are_converted():
+    stream = io.BytesIO()
+    np.save(stream, np.arange(6, dtype=np.float64).reshape(2, 3))
+    decoded = EmbeddingCodec.decode(stream.getvalue(), EmbeddingCodec.MIME_NPY)
+    assert decoded.dtype == np.float32
+    assert decoded.tolist() == [[0, 1, 2], [3, 4, 5]]
+
+
+@pytest.mark.parametrize('body, message', [
+    (b'EMB', 'too short'),
+    (b'XXXX' + bytes(8), 'magic'),
+    (EmbeddingCodec.HEADER.pack(EmbeddingCodec.MAGIC, 2, 4) + bytes(16), 'size mismatch'),
+])
+def test_malformed_f32_payloads(body, message):
+    with pytest.raises(ValueError, match=message):
+        EmbeddingCodec.decode(body, EmbeddingCodec.MIME_F32)
+
+
+def test_unknown_content_type(matrix):
+    with pytest.raises(ValueError, match='Unsupported'):
+        EmbeddingCodec.decode(EmbeddingCodec.encode(matrix), 'application/octet-stream')
+
+
+def test_corrupt_gzip_is_a_value_error(matrix):
+    body = EmbeddingCodec.encode(matrix, compress=True)
+    for corrupt in (b'not gzip', body[:len(body) // 2]):
+        with pytest.raises(ValueError, match='Invalid gzip payload'):
+            EmbeddingCodec.decode(corrupt, EmbeddingCodec.MIME_F32, 'gzip')
+
+
+def test_gzip_output_is_capped():
+    rows, dim = 1024, 256
+    body = gzip.compress(EmbeddingCodec.HEADER.pack(EmbeddingCodec.MAGIC, rows, dim) + bytes(rows * dim * 4))
+    assert len(body) < 4096
+    with pytest.raises(ValueError, match='exceeds'):
+        EmbeddingCodec.decode(body, EmbeddingCodec.MIME_F32, 'gzip', max_size=64 * 1024)
+    # Exactly at the limit is accepted
+    limit = EmbeddingCodec.HEADER.size + rows * dim * 4
+    assert EmbeddingCodec.decode(body, EmbeddingCodec.MIME_F32, 'gzip', max_size=limit).shape == (rows, dim)
+
+
+def test_negotiate():
+    assert EmbeddingCodec.negotiate('application/json') is None
+    assert EmbeddingCodec.negotiate('application/json, application/x-npy;q=0.9') == EmbeddingCodec.MIME_NPY
+    assert EmbeddingCodec.is_binary_mimetype('application/x-embedding-f32; charset=binary')
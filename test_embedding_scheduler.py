@@ -0,0 +1,128 @@
+"""
+Unit tests for EmbeddingScheduler admission order
+Run: python3 -m pytest test_embedding_scheduler.py
+"""
+import threading
+import time
+
+from services.embedding_scheduler import EmbeddingScheduler
+from services.job_service import JobService
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.005)
+
+
+class Waiters:
+    """Threads that take a slot, record their name and hold it until released"""
+    
+    def __init__(self, scheduler):
+        self.scheduler = scheduler
+        self.granted = []
+        self.releases = {}
+        self.threads = []
+    
+    def add(self, name, priority, flow):
+        release = threading.Event()
+        self.releases[name] = release
+        
+        def run():
+            with self.scheduler.slot(priority, flow):
+                self.granted.append(name)
+                release.wait(5)
+        
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        self.threads.append(thread)
+        return thread
+    
+    def total_waiting(self):
+        classes = self.scheduler.stats()['classes']
+        return classes['interactive']['waiting'] + classes['bulk']['waiting']
+    
+    def drain(self, holder):
+        """Release the holder, then each granted waiter in turn; returns the grant order"""
+        self.releases[holder].set()
+        for i in range(1, len(self.threads)):
+            wait_until(lambda: len(self.granted) > i)
+            self.releases[self.granted[i]].set()
+        for thread in self.threads:
+            thread.join(5)
+        return self.granted[1:]
+
+
+def hold(waiters, priority='bulk'):
+    waiters.add('holder', priority, 'holder')
+    wait_until(lambda: waiters.granted == ['holder'])
+
+
+def enqueue(waiters, name, priority, flow):
+    before = waiters.total_waiting()
+    waiters.add(name, priority, flow)
+    wait_until(lambda: waiters.total_waiting() == before + 1)
+
+
+def test_bulk_cannot_use_reserved_slots():
+    scheduler = EmbeddingScheduler('test', max_in_flight=2, interactive_reserved=1)
+    waiters = Waiters(scheduler)
+    hold(waiters, 'bulk')
+    enqueue(waiters, 'bulk-2', 'bulk', 'b')
+    
+    # The free slot is reserved: the second bulk call waits, an interactive one does not
+    waiters.add('interactive', 'interactive', 'i')
+    wait_until(lambda: 'interactive' in waiters.granted)
+    assert 'bulk-2' not in waiters.granted
+    assert scheduler.stats()['classes']['bulk']['waiting'] == 1
+    
+    waiters.releases['interactive'].set()
+    waiters.releases['holder'].set()
+    wait_until(lambda: 'bulk-2' in waiters.granted)
+    waiters.releases['bulk-2'].set()
+    for thread in waiters.threads:
+        thread.join(5)
+
+
+def test_interactive_burst_admits_one_bulk_call():
+    scheduler = EmbeddingScheduler('test', max_in_flight=1, interactive_reserved=0, interactive_burst=2)
+    waiters = Waiters(scheduler)
+    hold(waiters, 'bulk')
+    enqueue(waiters, 'bulk-1', 'bulk', 'b')
+    for i in range(1, 5):
+        enqueue(waiters, f'interactive-{i}', 'interactive', f'i{i}')
+    
+    assert waiters.drain('holder') == ['interactive-1', 'interactive-2', 'bulk-1', 'interactive-3', 'interactive-4']
+
+
+def test_flows_are_served_round_robin():
+    scheduler = EmbeddingScheduler('test', max_in_flight=1, interactive_reserved=0)
+    waiters = Waiters(scheduler)
+    hold(waiters, 'bulk')
+    for name, flow in [('a1', 'a'), ('a2', 'a'), ('a3', 'a'), ('b1', 'b'), ('b2', 'b')]:
+        enqueue(waiters, name, 'bulk', flow)
+    
+    assert waiters.drain('holder') == ['a1', 'b1', 'a2', 'b2', 'a3']
+
+
+def test_cancelled_job_leaves_the_queue():
+    scheduler = EmbeddingScheduler('test', max_in_flight=1, interactive_reserved=0)
+    waiters = Waiters(scheduler)
+    hold(waiters, 'bulk')
+    
+    def job():
+        with scheduler.slot('bulk', 'job'):
+            return 'granted'
+    
+    cancelled = JobService.submit('test', job)
+    wait_until(lambda: waiters.total_waiting() == 1)
+    enqueue(waiters, 'after', 'bulk', 'other')
+    
+    JobService.cancel(cancelled.job_id)
+    cancelled.future.result(timeout=5)
+    assert cancelled.status == 'cancelled'
+    assert waiters.total_waiting() == 1
+    
+    assert waiters.drain('holder') == ['after']
+    assert scheduler.stats()['classes']['bulk']['in_flight'] == 0
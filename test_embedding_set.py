@@ -0,0 +1,77 @@
+"""
+Unit tests for float32 / float16 / int8 embedding storage
+Run: python3 -m pytest test_embedding_set.py
+"""
+import numpy as np
+import pytest
+
+from services.embedding_set import EmbeddingSet
+
+
+@pytest.fixture(scope='module')
+def corpus():
+    # Clustered vectors, like chunk embeddings of a few documents
+    rng = np.random.RandomState(0)
+    centers = rng.randn(20, 64).astype(np.float32)
+    X = centers[rng.randint(0, 20, 2000)] + 0.5 * rng.randn(2000, 64).astype(np.float32)
+    queries = X[rng.choice(2000, 50, replace=False)] + 0.1 * rng.randn(50, 64).astype(np.float32)
+    return X, queries
+
+
+@pytest.fixture(scope='module')
+def reference(corpus):
+    return EmbeddingSet(corpus[0], dtype='float32')
+
+
+def test_float32_matches_brute_force(corpus, reference):
+    X, queries = corpus
+    unit = X / np.linalg.norm(X, axis=1, keepdims=True)
+    for query in queries[:10]:
+        scores = unit @ (query / np.linalg.norm(query))
+        expected = np.argsort(-scores)[:10].tolist()
+        results = reference.search(query, 10)
+        assert [idx for idx, _ in results] == expected
+        np.testing.assert_allclose([score for _, score in results], scores[expected], atol=1e-5)
+
+
+@pytest.mark.parametrize('dtype, min_recall, compression', [('float16', 0.99, 2.0), ('int8', 0.9, 4.0)])
+def test_quantized_recall_and_memory(corpus, reference, dtype, min_recall, compression):
+    X, queries = corpus
+    quantized = EmbeddingSet(X, dtype=dtype)
+    assert quantized.data.dtype == np.dtype(dtype)
+    assert quantized.storage_info()['compression_vs_float32'] == compression
+    assert quantized.memory_bytes() < reference.memory_bytes()
+    
+    recall = quantized.recall_against(reference, queries, k=10)
+    assert recall['n_queries'] == len(queries)
+    assert recall['mean_recall'] >= min_recall
+
+
+def test_int8_reconstruction_error_is_bounded(corpus):
+    X, _ = corpus
+    quantized = EmbeddingSet(X, dtype='int8')
+    unit = X / np.linalg.norm(X, axis=1, keepdims=True)
+    # One quantization step per dimension at most half a step off
+    assert np.max(np.abs(quantized.reconstruct() - unit) / quantized.scale) <= 0.5 + 1e-3
+
+
+def test_rows_restrict_the_search(reference, corpus):
+    _, queries = corpus
+    rows = np.arange(0, 2000, 7)
+    results = reference.search(queries[0], 5, rows=rows)
+    assert all(idx % 7 == 0 for idx, _ in results)
+    scores = [score for _, score in results]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_unsupported_dtype_and_shape():
+    with pytest.raises(ValueError, match='Unsupported storage dtype'):
+        EmbeddingSet(np.zeros((2, 3)), dtype='int4')
+    with pytest.raises(ValueError, match='2-D'):
+        EmbeddingSet(np.zeros(3))
+
+
+def test_fingerprint_follows_content(corpus):
+    X, _ = corpus
+    assert EmbeddingSet(X[:100]).fingerprint == EmbeddingSet(X[:100], dtype='int8').fingerprint
+    assert EmbeddingSet(X[:100]).fingerprint != EmbeddingSet(X[1:101]).fingerprint
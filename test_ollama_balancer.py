@@ -0,0 +1,110 @@
+"""
+Unit tests for OllamaBalancer ejection, re-admission and fail-open
+Run: python3 -m pytest test_ollama_balancer.py
+"""
+import pytest
+import requests
+
+from services import ollama_balancer
+from services.ollama_balancer import OllamaBalancer
+
+A = 'http://ollama-a:11434'
+B = 'http://ollama-b:11434'
+
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+class FakeServers:
+    """Stands in for requests.post / requests.get; each server is up, down or returns an HTTP status"""
+    
+    def __init__(self, monkeypatch, **status):
+        self.status = {A: 200, B: 200}
+        self.status.update(status)
+        self.posts = []
+        monkeypatch.setattr(ollama_balancer.requests, 'post', self.post)
+        monkeypatch.setattr(ollama_balancer.requests, 'get', self.get)
+    
+    def _answer(self, url):
+        server = A if url.startswith(A) else B
+        if self.status[server] is None:
+            raise requests.exceptions.ConnectionError(f'{server} is down')
+        return server, FakeResponse(self.status[server])
+    
+    def post(self, url, json=None, timeout=None):
+        server, response = self._answer(url)
+        self.posts.append(server)
+        return response
+    
+    def get(self, url, timeout=None):
+        return self._answer(url)[1]
+
+
+def endpoint(balancer, url):
+    return next(e for e in balancer.endpoints if e.url == url)
+
+
+def test_requests_go_to_the_least_outstanding_server(monkeypatch):
+    servers = FakeServers(monkeypatch)
+    balancer = OllamaBalancer([A, B], health_interval=0, eject_after=2)
+    endpoint(balancer, A).outstanding = 1
+    
+    balancer.post('/api/embeddings', {})
+    assert servers.posts == [B]
+
+
+def test_failing_server_is_retried_elsewhere_then_ejected(monkeypatch):
+    servers = FakeServers(monkeypatch, **{A: None})
+    balancer = OllamaBalancer([A, B], health_interval=0, eject_after=2)
+    
+    # A wins the tie on the first call and, once B has a latency, on the second:
+    # each call fails on A and is retried on B
+    for _ in range(2):
+        assert balancer.post('/api/embeddings', {}).status_code == 200
+    assert servers.posts == [B, B]
+    assert endpoint(balancer, A).failures == 2
+    assert not endpoint(balancer, A).healthy
+    assert balancer.stats()['healthy'] == 1
+    
+    # Ejected: the next call goes straight to B
+    balancer.post('/api/embeddings', {})
+    assert servers.posts == [B, B, B]
+    assert endpoint(balancer, A).failures == 2
+
+
+def test_probe_ejects_and_readmits(monkeypatch):
+    servers = FakeServers(monkeypatch, **{B: 503})
+    balancer = OllamaBalancer([A, B], health_interval=0, eject_after=3)
+    
+    balancer.probe()
+    assert not endpoint(balancer, B).healthy
+    assert endpoint(balancer, B).ejections == 1
+    
+    servers.status[B] = 200
+    balancer.probe()
+    assert endpoint(balancer, B).healthy
+    assert endpoint(balancer, B).consecutive_failures == 0
+
+
+def test_all_ejected_fails_open_on_the_longest_ejected(monkeypatch):
+    servers = FakeServers(monkeypatch)
+    balancer = OllamaBalancer([A, B], health_interval=0, eject_after=1)
+    for url, ejected_at in [(A, 200.0), (B, 100.0)]:
+        ejected = endpoint(balancer, url)
+        ejected.healthy = False
+        ejected.ejected_at = ejected_at
+    
+    assert balancer.post('/api/embeddings', {}).status_code == 200
+    assert servers.posts == [B]
+    # A successful request re-admits the server
+    assert endpoint(balancer, B).healthy
+
+
+def test_no_server_reachable_raises(monkeypatch):
+    FakeServers(monkeypatch, **{A: None, B: None})
+    balancer = OllamaBalancer([A, B], health_interval=0, eject_after=5)
+    with pytest.raises(requests.exceptions.ConnectionError):
+        balancer.post('/api/embeddings', {})
+    assert [endpoint(balancer, url).failures for url in (A, B)] == [1, 1]
@@ -0,0 +1,102 @@
+"""
+Unit tests for SingleFlight coalescing
+Run: python3 -m pytest test_singleflight.py
+"""
+import threading
+
+import pytest
+
+from services.singleflight import SingleFlight
+
+
+def test_duplicate_keys_in_a_batch_are_computed_once():
+    flight = SingleFlight('test')
+    calls = []
+    
+    def compute(keys):
+        calls.append(list(keys))
+        return [key * 10 for key in keys]
+    
+    assert flight.run_batch([1, 2, 1, 3, 2], compute) == [10, 20, 10, 30, 20]
+    assert calls == [[1, 2, 3]]
+    assert flight.stats()['saved'] == 2
+
+
+def test_concurrent_caller_joins_the_leader():
+    flight = SingleFlight('test')
+    started = threading.Event()
+    finish = threading.Event()
+    calls = []
+    
+    def slow(keys):
+        calls.append(list(keys))
+        started.set()
+        finish.wait(5)
+        return [key.upper() for key in keys]
+    
+    results = {}
+    leader = threading.Thread(target=lambda: results.update(leader=flight.run_batch(['a'], slow)))
+    leader.start()
+    assert started.wait(5)
+    
+    joiner = threading.Thread(target=lambda: results.update(joiner=flight.run_batch(['a', 'b'], slow)))
+    joiner.start()
+    # The joiner computes only 'b' and then waits on the leader's 'a'
+    while len(calls) < 2:
+        threading.Event().wait(0.005)
+    assert calls == [['a'], ['b']]
+    assert flight.stats()['joined'] == 1
+    
+    finish.set()
+    leader.join(5)
+    joiner.join(5)
+    assert results == {'leader': ['A'], 'joiner': ['A', 'B']}
+    assert flight.stats()['in_flight'] == 0
+
+
+def test_leader_failure_reaches_joined_callers():
+    flight = SingleFlight('test')
+    started = threading.Event()
+    finish = threading.Event()
+    
+    def failing(keys):
+        started.set()
+        finish.wait(5)
+        raise RuntimeError('backend down')
+    
+    errors = []
+    
+    def lead():
+        try:
+            flight.run_batch(['a'], failing)
+        except RuntimeError as e:
+            errors.append(str(e))
+    
+    leader = threading.Thread(target=lead)
+    leader.start()
+    assert started.wait(5)
+    
+    results = {}
+    joiner = threading.Thread(target=lambda: results.update(joiner=flight.run_batch(['a'], lambda keys: ['unused'])))
+    joiner.start()
+    while flight.stats()['joined'] < 1:
+        threading.Event().wait(0.005)
+    
+    finish.set()
+    leader.join(5)
+    joiner.join(5)
+    # The exception stays with the leader; the joined caller sees a failed key (None)
+    assert errors == ['backend down']
+    assert results == {'joiner': None}
+    
+    # Nothing is cached: the next call computes again
+    assert flight.run_batch(['a'], lambda keys: ['ok']) == ['ok']
+
+
+def test_wrong_number_of_values_fails_the_batch():
+    flight = SingleFlight('test')
+    assert flight.run_batch(['a', 'b'], lambda keys: ['only one']) is None
+    assert flight.run_batch(['a'], lambda keys: None) is None
+    with pytest.raises(ValueError):
+        flight.run_batch(['a'], lambda keys: (_ for _ in ()).throw(ValueError('bad')))
+    assert flight.stats()['in_flight'] == 0
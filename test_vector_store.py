@@ -0,0 +1,100 @@
+"""
+Unit tests for the memory-mapped vector store
+Run: python3 -m pytest test_vector_store.py
+"""
+import numpy as np
+import pytest
+
+from services.vector_store import VectorStore
+
+
+@pytest.fixture
+def vectors():
+    return np.random.RandomState(0).randn(30, 8).astype(np.float32)
+
+
+def unit(X):
+    return X / np.linalg.norm(X, axis=1, keepdims=True)
+
+
+def test_append_normalizes_and_persists(tmp_path, vectors):
+    store = VectorStore('docs', tmp_path)
+    rows = [{'filename': 'a.md', 'strategy': 'fixed', 'position': i, 'text': f'chunk {i}'} for i in range(20)]
+    info = store.append(vectors[:20], rows)
+    assert info['n_vectors'] == 20 and info['dim'] == 8 and info['version'] == 1
+    store.append(vectors[20:])
+    
+    reopened = VectorStore('docs', tmp_path)
+    assert (reopened.n_vectors, reopened.version, reopened.normalized) == (30, 2, True)
+    assert isinstance(reopened.vectors, np.memmap)
+    np.testing.assert_allclose(reopened.vectors, unit(vectors), atol=1e-6)
+    assert (tmp_path / 'docs.f32').stat().st_size == 30 * 8 * 4
+    
+    details = reopened.get_rows([3, 25])
+    assert details[3]['filename'] == 'a.md' and details[3]['position'] == 3
+    assert details[3]['text_hash'] == VectorStore.text_hash('chunk 3')
+    assert details[25]['filename'] is None
+    
+    assert reopened.embedding_set().search(vectors[25], 1)[0][0] == 25
+
+
+def test_fingerprint_is_chained_over_appends(tmp_path, vectors):
+    first = VectorStore('first', tmp_path)
+    second = VectorStore('second', tmp_path)
+    first.append(vectors[:10])
+    fingerprint = first.fingerprint
+    first.append(vectors[10:])
+    assert first.fingerprint != fingerprint
+    
+    # Same appends in the same order give the same fingerprint
+    second.append(vectors[:10])
+    assert second.fingerprint == fingerprint
+    second.append(vectors[10:])
+    assert second.fingerprint == first.fingerprint
+    
+    third = VectorStore('third', tmp_path)
+    third.append(vectors[:10])
+    third.append(vectors[10:] * 2)  # same after normalization
+    third.append(vectors[:1])
+    assert third.fingerprint != first.fingerprint
+
+
+def test_bytes_of_a_crashed_append_are_dropped(tmp_path, vectors):
+    store = VectorStore('docs', tmp_path)
+    store.append(vectors[:10])
+    
+    # A writer died after writing part of its rows but before the sidecar commit
+    with open(tmp_path / 'docs.f32', 'ab') as f:
+        f.write(b'\xff' * (8 * 4 * 3 + 5))
+    with open(tmp_path / 'docs.norms.f32', 'ab') as f:
+        f.write(b'\xff' * 7)
+    
+    reopened = VectorStore('docs', tmp_path)
+    assert reopened.n_vectors == 10
+    np.testing.assert_allclose(reopened.vectors, unit(vectors[:10]), atol=1e-6)
+    
+    reopened.append(vectors[10:12])
+    assert (tmp_path / 'docs.f32').stat().st_size == 12 * 8 * 4
+    assert (tmp_path / 'docs.norms.f32').stat().st_size == 12 * 4
+    np.testing.assert_allclose(VectorStore('docs', tmp_path).vectors, unit(vectors[:12]), atol=1e-6)
+
+
+def test_invalid_appends_leave_the_store_unchanged(tmp_path, vectors):
+    store = VectorStore('docs', tmp_path)
+    store.append(vectors[:5])
+    with pytest.raises(ValueError, match='dimension'):
+        store.append(np.zeros((2, 4), dtype=np.float32))
+    with pytest.raises(ValueError, match='does not match'):
+        store.append(vectors[5:7], rows=[{}])
+    with pytest.raises(ValueError, match='non-empty'):
+        store.append(np.zeros((0, 8), dtype=np.float32))
+    assert (store.n_vectors, store.version) == (5, 1)
+    with pytest.raises(ValueError, match='Invalid vector store name'):
+        VectorStore('../escape', tmp_path)
+
+
+def test_delete_removes_the_files(tmp_path, vectors):
+    store = VectorStore('docs', tmp_path)
+    store.append(vectors[:5])
+    store.delete()
+    assert not list(tmp_path.glob('docs*'))
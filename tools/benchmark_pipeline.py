@@ -0,0 +1,137 @@
+"""
+Pipeline benchmark - chunk -> embed -> evaluate on the data/ corpus, fully offline
+
+Chunks every document with each strategy, embeds the chunks with the
+deterministic hashing backend and evaluates retrieval on generated queries:
+each query is a word span sampled from a chunk, and its relevant chunks are
+all chunks (of that strategy) containing the span. Stage timings and
+retrieval metrics are printed per strategy and optionally written as JSON.
+
+Usage (from the repository root):
+    python tools/benchmark_pipeline.py
+    python tools/benchmark_pipeline.py --strategies fixed_size,recursive,semantic --queries 200 --output pipeline.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from services.chunking_service import ChunkingService
+from services.document_service import DocumentService
+from services.embedding_service import EmbeddingService
+from services.hashing_embedder import HashingEmbedder
+from services.retrieval_service import RetrievalService
+
+STRATEGIES = ('fixed_size', 'markdown_header', 'recursive', 'paragraph', 'sliding_window', 'semantic')
+
+
+def make_queries(texts, n_queries: int, span_words: int, rng) -> list:
+    """Word spans sampled from chunks; relevant = every chunk containing the span"""
+    normalized = [HashingEmbedder.normalize(text) for text in texts]
+    candidates = [i for i, text in enumerate(texts) if len(text.split()) >= span_words]
+    queries = []
+    if not candidates:
+        return queries
+    for i in rng.choice(candidates, n_queries, replace=len(candidates) < n_queries):
+        words = texts[i].split()
+        start = int(rng.integers(0, len(words) - span_words + 1))
+        span = ' '.join(words[start:start + span_words])
+        needle = HashingEmbedder.normalize(span).strip()
+        relevant = [j for j, text in enumerate(normalized) if needle in text]
+        queries.append({'query_text': span, 'relevant_doc_indices': relevant or [int(i)]})
+    return queries
+
+
+def run_strategy(strategy: str, filenames, args, rng) -> dict:
+    params = {'model': 'hashing'} if strategy == 'semantic' else {}
+    
+    start = time.perf_counter()
+    chunks = ChunkingService.chunk_multiple_documents(filenames, strategy, params)
+    chunk_seconds = time.perf_counter() - start
+    texts = [chunk['text'] for chunk in chunks]
+    
+    start = time.perf_counter()
+    embeddings = EmbeddingService.get_embeddings_hashing(texts)
+    embed_seconds = time.perf_counter() - start
+    throughput = EmbeddingService.get_throughput(texts, embed_seconds)
+    
+    queries = make_queries(texts, args.queries, args.span_words, rng)
+    start = time.perf_counter()
+    embedder = EmbeddingService.get_hashing_embedder()
+    for query, vector in zip(queries, embedder.embed([q['query_text'] for q in queries])):
+        query['query_embedding'] = vector
+    query_embed_seconds = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    evaluation = RetrievalService.evaluate_multiple_queries(queries, embeddings, k_values=args.k_values)
+    evaluate_seconds = time.perf_counter() - start
+    
+    metrics = evaluation.get('results', evaluation).get('metrics', {})
+    row = {
+        'strategy': strategy,
+        'n_chunks': len(chunks),
+        'avg_chunk_chars': round(float(np.mean([len(t) for t in texts])), 1) if texts else 0,
+        'n_queries': len(queries),
+        'chunk_seconds': round(chunk_seconds, 3),
+        'embed_seconds': round(embed_seconds, 3),
+        'query_embed_seconds': round(query_embed_seconds, 3),
+        'evaluate_seconds': round(evaluate_seconds, 3),
+        'chunks_per_second': throughput['chunks_per_second'],
+        'chars_per_second': throughput['chars_per_second'],
+        'metrics': {
+            name: value.get('mean', value.get('score'))
+            for name, value in metrics.items() if isinstance(value, dict)
+        }
+    }
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark chunk -> embed -> evaluate with hashing embeddings')
+    parser.add_argument('--strategies', default=','.join(STRATEGIES), help=f"Comma-separated subset of {', '.join(STRATEGIES)}")
+    parser.add_argument('--queries', type=int, default=100, help='Generated queries per strategy')
+    parser.add_argument('--span-words', type=int, default=8, help='Words per generated query')
+    parser.add_argument('--k-values', default='5,10')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='Write results to this JSON file')
+    args = parser.parse_args()
+    
+    strategies = [s.strip() for s in args.strategies.split(',') if s.strip()]
+    unknown = set(strategies) - set(STRATEGIES)
+    if unknown:
+        parser.error(f"Unknown strategies: {', '.join(sorted(unknown))}")
+    args.k_values = [int(k) for k in args.k_values.split(',') if k.strip()]
+    
+    filenames = [doc.filename for doc in DocumentService.get_all_documents()]
+    embedder = EmbeddingService.get_hashing_embedder()
+    print(f"{len(filenames)} documents, embedder {embedder.model_name}")
+    
+    rows = []
+    for strategy in strategies:
+        rng = np.random.default_rng(args.seed)
+        rows.append(run_strategy(strategy, filenames, args, rng))
+    
+    metric_names = [f'precision_at_{args.k_values[0]}'] + [f'recall_at_{k}' for k in args.k_values] + ['mrr']
+    header = (f"{'strategy':<17}{'chunks':>8}{'avg chars':>10}{'chunk s':>9}{'embed s':>9}{'chunks/s':>10}{'chars/s':>12}{'eval s':>8}"
+              + ''.join(f"{name:>15}" for name in metric_names))
+    print(header)
+    print('-' * len(header))
+    for row in rows:
+        print(f"{row['strategy']:<17}{row['n_chunks']:>8}{row['avg_chunk_chars']:>10}{row['chunk_seconds']:>9}"
+              f"{row['embed_seconds']:>9}{str(row['chunks_per_second']):>10}{str(row['chars_per_second']):>12}{row['evaluate_seconds']:>8}"
+              + ''.join(f"{str(row['metrics'].get(name, '-')):>15}" for name in metric_names))
+    
+    if args.output:
+        report = {'config': vars(args), 'embedder': embedder.info(), 'results': rows}
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {args.output}")
+
+
+if __name__ == '__main__':
+    main()
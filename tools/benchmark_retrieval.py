@@ -0,0 +1,270 @@
+"""
+Retrieval benchmark - latency percentiles, QPS, memory and recall@k vs exact search
+
+Builds embedding sets at several sizes / dimensions (seeded synthetic clusters,
+a .npy matrix or a vector store) and runs every search backend on the same queries:
+- loop: one VectorMath.cosine call per document on Python lists, then a full sort
+  (the pre-vectorization search, kept as the baseline)
+- vectorized: EmbeddingSet.search in each storage dtype
+- hnsw / ivfpq: ANN indexes built with the app's config
+- sharded: exact search across worker processes
+
+Results are printed as a table and optionally written as JSON. With --baseline,
+p50 latency and recall are compared to a previous JSON run and the script exits
+with status 1 on regressions.
+
+Usage (from the repository root):
+    python tools/benchmark_retrieval.py --sizes 10000,100000 --dims 384 --output bench.json
+    python tools/benchmark_retrieval.py --sizes 1000000 --backends vectorized,ivfpq,sharded
+    python tools/benchmark_retrieval.py --output new.json --baseline bench.json --max-regression 0.2
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from services.embedding_set import EmbeddingSet
+from services.retrieval_service import RetrievalService
+from services.vector_math import VectorMath
+from services.vector_store import VectorStore
+
+BACKENDS = ('loop', 'vectorized', 'hnsw', 'ivfpq', 'sharded')
+
+
+def synthetic_embeddings(n_vectors: int, dim: int, rng, n_clusters: int = 256, block_rows: int = 65536):
+    """Clustered float32 vectors (topic-like structure, so neighbors are meaningful)"""
+    centers = rng.standard_normal((n_clusters, dim), dtype=np.float32)
+    X = np.empty((n_vectors, dim), dtype=np.float32)
+    for start in range(0, n_vectors, block_rows):
+        stop = min(start + block_rows, n_vectors)
+        labels = rng.integers(0, n_clusters, stop - start)
+        X[start:stop] = centers[labels] + 0.5 * rng.standard_normal((stop - start, dim), dtype=np.float32)
+    return X
+
+
+def make_queries(X, n_queries: int, rng):
+    """Perturbed corpus vectors, so each query has close neighbors"""
+    rows = rng.choice(len(X), n_queries, replace=len(X) < n_queries)
+    noise = 0.1 * rng.standard_normal((n_queries, X.shape[1]), dtype=np.float32)
+    return np.asarray(X[rows], dtype=np.float32) + noise
+
+
+def summarize(latencies, results, exact, top_k: int) -> dict:
+    latencies_ms = np.asarray(latencies) * 1000
+    recalls = [
+        len({idx for idx, _ in got} & {idx for idx, _ in want}) / len(want)
+        for got, want in zip(results, exact) if want
+    ]
+    return {
+        'n_queries': len(latencies),
+        'p50_ms': round(float(np.percentile(latencies_ms, 50)), 3),
+        'p95_ms': round(float(np.percentile(latencies_ms, 95)), 3),
+        'p99_ms': round(float(np.percentile(latencies_ms, 99)), 3),
+        'qps': round(len(latencies) / (latencies_ms.sum() / 1000), 1) if latencies_ms.sum() else None,
+        f'recall_at_{top_k}': round(float(np.mean(recalls)), 4) if recalls else None
+    }
+
+
+def loop_search(query, document_embeddings, top_k: int):
+    """Per-document cosine over Python lists, sorted descending (no matrix operations)"""
+    similarities = [(i, VectorMath.cosine(query, doc_emb)) for i, doc_emb in enumerate(document_embeddings)]
+    similarities.sort(key=lambda x: x[1], reverse=True)
+    return similarities[:top_k]
+
+
+def timed_search(search, queries, top_k: int):
+    latencies = []
+    results = []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(search(query, top_k))
+        latencies.append(time.perf_counter() - start)
+    return latencies, results
+
+
+def peak_rss_bytes() -> int:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return int(peak if platform.system() == 'Darwin' else peak * 1024)
+
+
+def run_size(X, queries, args) -> list:
+    """Benchmark every requested backend on one embedding matrix"""
+    rows = []
+    n_vectors, dim = X.shape
+    reference = EmbeddingSet(X, dtype='float32')
+    
+    # Exact float32 results are the recall reference for every backend
+    _, exact = timed_search(reference.search, queries, args.top_k)
+    
+    def record(backend, variant, latencies, results, memory_bytes, build_seconds=0.0):
+        row = {
+            'backend': backend,
+            'variant': variant,
+            'n_vectors': n_vectors,
+            'dim': dim,
+            'build_seconds': round(build_seconds, 3),
+            'memory_bytes': int(memory_bytes),
+            'peak_rss_bytes': peak_rss_bytes()
+        }
+        row.update(summarize(latencies, results, exact[:len(results)], args.top_k))
+        rows.append(row)
+        print(f"  {backend:<11}{variant:<22}p50 {row['p50_ms']:>9} ms  recall {row[f'recall_at_{args.top_k}']}")
+    
+    if 'loop' in args.backends:
+        if n_vectors <= args.loop_max_vectors:
+            X_list = X.tolist()
+            loop_queries = queries[:args.loop_queries]
+            latencies, results = timed_search(
+                lambda q, k: loop_search(q.tolist(), X_list, k), loop_queries, args.top_k
+            )
+            record('loop', 'python-lists', latencies, results, memory_bytes=0)
+            del X_list
+        else:
+            print(f"  loop       skipped (n_vectors > --loop-max-vectors {args.loop_max_vectors})")
+    
+    if 'vectorized' in args.backends:
+        for dtype in args.dtypes:
+            start = time.perf_counter()
+            embedding_set = reference if dtype == 'float32' else EmbeddingSet(X, dtype=dtype)
+            build_seconds = time.perf_counter() - start if dtype != 'float32' else 0.0
+            latencies, results = timed_search(embedding_set.search, queries, args.top_k)
+            record('vectorized', dtype, latencies, results, embedding_set.memory_bytes(), build_seconds)
+    
+    for method in ('hnsw', 'ivfpq', 'sharded'):
+        if method not in args.backends:
+            continue
+        start = time.perf_counter()
+        index = RetrievalService.get_ann_index(reference, method)
+        build_seconds = time.perf_counter() - start
+        index.search(queries[0], args.top_k)
+        latencies, results = timed_search(index.search, queries, args.top_k)
+        info = index.info()
+        memory_bytes = info.get('memory_bytes', info.get('shared_bytes', 0))
+        if method == 'hnsw':
+            variant = f"{info['backend']} M={info['M']}"
+        elif method == 'ivfpq':
+            variant = f"m={info['m']} nprobe={info['nprobe']}"
+        else:
+            variant = f"{info['n_shards']} workers ({info['sharing']})"
+        record(method, variant, latencies, results, memory_bytes, build_seconds)
+    
+    # Release indexes (and sharded workers) before the next size
+    RetrievalService.clear_ann_indexes()
+    return rows
+
+
+def check_regressions(rows, baseline_rows, top_k: int, max_regression: float) -> list:
+    """Rows whose p50 latency grew, or recall dropped, by more than max_regression"""
+    recall_key = f'recall_at_{top_k}'
+    baseline = {(r['backend'], r['variant'], r['n_vectors'], r['dim']): r for r in baseline_rows}
+    regressions = []
+    for row in rows:
+        previous = baseline.get((row['backend'], row['variant'], row['n_vectors'], row['dim']))
+        if previous is None:
+            continue
+        if previous['p50_ms'] and row['p50_ms'] > previous['p50_ms'] * (1 + max_regression):
+            regressions.append(f"{row['backend']}/{row['variant']} n={row['n_vectors']} d={row['dim']}: "
+                               f"p50 {previous['p50_ms']} -> {row['p50_ms']} ms")
+        if previous.get(recall_key) and row.get(recall_key) is not None \
+                and row[recall_key] < previous[recall_key] * (1 - max_regression):
+            regressions.append(f"{row['backend']}/{row['variant']} n={row['n_vectors']} d={row['dim']}: "
+                               f"recall {previous[recall_key]} -> {row[recall_key]}")
+    return regressions
+
+
+def print_table(rows, top_k: int):
+    recall_key = f'recall_at_{top_k}'
+    header = (f"{'backend':<11}{'variant':<28}{'n':>9}{'dim':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+              f"{'QPS':>10}{'recall':>8}{'MiB':>9}{'build s':>9}")
+    print(header)
+    print('-' * len(header))
+    for row in rows:
+        print(f"{row['backend']:<11}{row['variant']:<28}{row['n_vectors']:>9}{row['dim']:>6}"
+              f"{row['p50_ms']:>10}{row['p95_ms']:>10}{row['p99_ms']:>10}{str(row['qps']):>10}"
+              f"{str(row[recall_key]):>8}{row['memory_bytes'] / 2 ** 20:>9.1f}{row['build_seconds']:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark RetrievalService search backends')
+    parser.add_argument('--sizes', default='10000,100000', help='Comma-separated corpus sizes')
+    parser.add_argument('--dims', default='384', help='Comma-separated dimensions (synthetic data only)')
+    parser.add_argument('--embeddings', help='.npy matrix to sample corpora from instead of synthetic data')
+    parser.add_argument('--vector-store', help='Vector store to sample corpora from instead of synthetic data')
+    parser.add_argument('--backends', default=','.join(BACKENDS), help=f"Comma-separated subset of {', '.join(BACKENDS)}")
+    parser.add_argument('--dtypes', default='float32,float16,int8', help='Storage dtypes for the vectorized backend')
+    parser.add_argument('--queries', type=int, default=100)
+    parser.add_argument('--top-k', type=int, default=10)
+    parser.add_argument('--loop-queries', type=int, default=5, help='Queries for the (slow) loop backend')
+    parser.add_argument('--loop-max-vectors', type=int, default=20000, help='Skip the loop backend above this size')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='Write results to this JSON file')
+    parser.add_argument('--baseline', help='Previous JSON results to compare against')
+    parser.add_argument('--max-regression', type=float, default=0.2, help='Allowed relative p50 / recall regression')
+    args = parser.parse_args()
+    
+    args.backends = [b.strip() for b in args.backends.split(',') if b.strip()]
+    unknown = set(args.backends) - set(BACKENDS)
+    if unknown:
+        parser.error(f"Unknown backends: {', '.join(sorted(unknown))}")
+    args.dtypes = [d.strip() for d in args.dtypes.split(',') if d.strip()]
+    sizes = [int(s) for s in args.sizes.split(',') if s.strip()]
+    dims = [int(d) for d in args.dims.split(',') if d.strip()]
+    
+    rng = np.random.default_rng(args.seed)
+    source = None
+    if args.embeddings:
+        source = np.load(args.embeddings, mmap_mode='r')
+    elif args.vector_store:
+        source = VectorStore.open(args.vector_store).vectors
+    if source is not None:
+        dims = [source.shape[1]]
+    
+    rows = []
+    for dim in dims:
+        for n_vectors in sizes:
+            if source is not None:
+                n_vectors = min(n_vectors, len(source))
+                picked = np.sort(rng.choice(len(source), n_vectors, replace=False))
+                X = np.asarray(source[picked], dtype=np.float32)
+            else:
+                X = synthetic_embeddings(n_vectors, dim, rng)
+            queries = make_queries(X, args.queries, rng)
+            print(f"n_vectors={n_vectors} dim={dim}")
+            rows.extend(run_size(X, queries, args))
+            del X
+    
+    print()
+    print_table(rows, args.top_k)
+    
+    report = {
+        'config': vars(args),
+        'machine': {'platform': platform.platform(), 'python': platform.python_version(), 'cpus': os.cpu_count()},
+        'results': rows
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {args.output}")
+    
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline_rows = json.load(f)['results']
+        regressions = check_regressions(rows, baseline_rows, args.top_k, args.max_regression)
+        if regressions:
+            print('\nRegressions:')
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print('\nNo regressions against baseline')
+
+
+if __name__ == '__main__':
+    main()
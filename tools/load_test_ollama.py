@@ -0,0 +1,281 @@
+"""
+Load test - end-to-end throughput of Ollama-backed endpoints against the Ollama stub
+
+Starts tools/ollama_stub.py in-process (--stubs N starts N of them, or
+--stub-url lists running ones), points the app at them through
+OLLAMA_BASE_URL (load balanced when there are several), serves the Flask app
+on a threaded local server
+(or uses --app-url) and drives concurrent clients against:
+- embeddings: POST /api/embeddings/generate (method "ollama") with --batch chunks
+  of the data/ corpus per request
+- chunking: POST /api/chunking/run with strategy "semantic" (model "ollama"),
+  one document per request
+- mixed: the embeddings workload plus one client sending single-query
+  POST /api/retrieval/evaluate requests (interactive priority) back to back;
+  reports query latency percentiles under bulk load
+
+Each (workload, concurrency) run reports requests/s, items/s (chunks embedded
+or produced), latency percentiles, failures and what the stubs saw (Ollama
+calls per stub, injected errors, peak concurrency, queue wait).
+
+Usage (from the repository root):
+    python tools/load_test_ollama.py --concurrency 1,4,16 --requests 40
+    python tools/load_test_ollama.py --workloads mixed --concurrency 8 --max-concurrency 4
+    python tools/load_test_ollama.py --workloads embeddings --latency lognormal:0.03,0.6 --error-rate 0.02 --output load.json
+    python tools/load_test_ollama.py --stubs 1,2,4 --workloads embeddings --concurrency 8 --latency fixed:0.05 --max-concurrency 2
+    python tools/load_test_ollama.py --stub-url http://localhost:11435 --app-url http://localhost:5000
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import requests
+
+from ollama_stub import add_stub_arguments, settings_from_args, start_stub, validate_settings
+
+WORKLOADS = ('embeddings', 'chunking', 'mixed')
+
+
+def start_app(stub_urls) -> str:
+    """Serve the Flask app on a local threaded server wired to the stubs"""
+    # Services read OLLAMA_BASE_URL when they call Ollama
+    os.environ['OLLAMA_BASE_URL'] = ','.join(stub_urls)
+    from werkzeug.serving import make_server
+    from app import create_app
+    
+    server = make_server('127.0.0.1', 0, create_app(), threaded=True)
+    threading.Thread(target=server.serve_forever, name='app', daemon=True).start()
+    return f'http://127.0.0.1:{server.server_port}'
+
+
+def corpus_chunks(app_url: str, filenames, chunk_size: int) -> list:
+    """Fixed-size chunks of the corpus, used as embedding request payloads"""
+    response = requests.post(f'{app_url}/api/chunking/run', json={
+        'filenames': filenames, 'strategy': 'fixed_size', 'params': {'chunk_size': chunk_size, 'overlap': 0}
+    }, timeout=120)
+    return response.json().get('chunks', [])
+
+
+def make_requests(workload: str, n_requests: int, chunks, filenames, args) -> list:
+    """(path, payload) per request, cycling through the corpus"""
+    payloads = []
+    for i in range(n_requests):
+        if workload in ('embeddings', 'mixed'):
+            start = (i * args.batch) % max(len(chunks), 1)
+            batch = (chunks[start:] + chunks[:start])[:args.batch]
+            payloads.append(('/api/embeddings/generate', {
+                'method': 'ollama',
+                'chunks': [{'text': c['text'], 'filename': c['filename'], 'position': c['position']} for c in batch]
+            }))
+        else:
+            payloads.append(('/api/chunking/run', {
+                'filenames': [filenames[i % len(filenames)]],
+                'strategy': 'semantic',
+                'params': {'model': 'ollama', 'chunk_size': args.chunk_size}
+            }))
+    return payloads
+
+
+def count_items(workload: str, body: dict) -> int:
+    if workload in ('embeddings', 'mixed'):
+        return int(body.get('total') or len(body.get('embeddings', [])))
+    return len(body.get('chunks', []))
+
+
+def run_level(workload: str, concurrency: int, payloads, app_url: str, stub_urls, args) -> dict:
+    """Send all payloads with `concurrency` client threads"""
+    for stub_url in stub_urls:
+        requests.post(f'{stub_url}/stub/reset', timeout=10)
+    local = threading.local()
+    
+    def send(item):
+        path, payload = item
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        start = time.perf_counter()
+        try:
+            response = session.post(f'{app_url}{path}', json=payload, timeout=args.client_timeout)
+            body = response.json()
+            ok = response.status_code == 200 and body.get('success', False)
+            items = count_items(workload, body) if ok else 0
+        except (requests.exceptions.RequestException, ValueError):
+            ok, items = False, 0
+        return time.perf_counter() - start, ok, items
+    
+    done = threading.Event()
+    query_latencies = []
+    
+    def probe():
+        """Single-query retrieval requests (one query embedding each) until the bulk load is done"""
+        session = requests.Session()
+        dim = int(requests.get(f'{stub_urls[0]}/stub/config', timeout=10).json().get('dim', 768))
+        documents = np.random.default_rng(0).standard_normal((4, dim)).round(4).tolist()
+        i = 0
+        while not done.is_set():
+            start = time.perf_counter()
+            try:
+                response = session.post(f'{app_url}/api/retrieval/evaluate', json={
+                    'query_text': f'load test query {i} {time.time()}',
+                    'embedding_method': 'ollama',
+                    'document_embeddings': documents,
+                    'relevant_doc_indices': [0],
+                    'k': 2
+                }, timeout=args.client_timeout)
+                ok = response.status_code == 200 and response.json().get('success', False)
+            except (requests.exceptions.RequestException, ValueError):
+                ok = False
+            query_latencies.append((time.perf_counter() - start, ok))
+            i += 1
+    
+    prober = threading.Thread(target=probe, name='probe', daemon=True) if workload == 'mixed' else None
+    start = time.perf_counter()
+    if prober is not None:
+        prober.start()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(send, payloads))
+    wall_seconds = time.perf_counter() - start
+    done.set()
+    if prober is not None:
+        prober.join()
+    
+    latencies_ms = np.asarray([r[0] for r in results]) * 1000
+    n_ok = sum(1 for r in results if r[1])
+    n_items = sum(r[2] for r in results)
+    stub_stats = [requests.get(f'{stub_url}/stub/stats', timeout=10).json() for stub_url in stub_urls]
+    row = {
+        'workload': workload,
+        'stubs': len(stub_urls),
+        'concurrency': concurrency,
+        'requests': len(results),
+        'ok': n_ok,
+        'failed': len(results) - n_ok,
+        'wall_seconds': round(wall_seconds, 3),
+        'requests_per_second': round(len(results) / wall_seconds, 2),
+        'items_per_second': round(n_items / wall_seconds, 1),
+        'p50_ms': round(float(np.percentile(latencies_ms, 50)), 1),
+        'p95_ms': round(float(np.percentile(latencies_ms, 95)), 1),
+        'p99_ms': round(float(np.percentile(latencies_ms, 99)), 1),
+        'stub': {
+            'calls': sum(sum(stats['requests'].values()) for stats in stub_stats),
+            'injected_errors': sum(stats['injected_errors'] for stats in stub_stats),
+            'injected_hangs': sum(stats['injected_hangs'] for stats in stub_stats),
+            'rejected_busy': sum(stats['rejected_busy'] for stats in stub_stats),
+            'peak_in_flight': max(stats['peak_in_flight'] for stats in stub_stats),
+            'per_stub': [
+                {
+                    'url': stub_url,
+                    'calls': sum(stats['requests'].values()),
+                    'peak_in_flight': stats['peak_in_flight'],
+                    'queue_wait_ms': stats['queue_wait_ms']
+                }
+                for stub_url, stats in zip(stub_urls, stub_stats)
+            ]
+        }
+    }
+    try:
+        # Admission scheduler and load balancer counters of the app (cumulative since it started)
+        app_stats = requests.get(f'{app_url}/api/embeddings/stats', timeout=10).json()
+        row['scheduler'] = app_stats.get('scheduler')
+        row['ollama_servers'] = app_stats.get('ollama_servers')
+    except (requests.exceptions.RequestException, ValueError):
+        row['scheduler'] = row['ollama_servers'] = None
+    if query_latencies:
+        query_ms = np.asarray([q[0] for q in query_latencies]) * 1000
+        row['queries'] = {
+            'count': len(query_latencies),
+            'failed': sum(1 for q in query_latencies if not q[1]),
+            'p50_ms': round(float(np.percentile(query_ms, 50)), 1),
+            'p95_ms': round(float(np.percentile(query_ms, 95)), 1),
+            'p99_ms': round(float(np.percentile(query_ms, 99)), 1),
+            'max_ms': round(float(query_ms.max()), 1)
+        }
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test Ollama-backed endpoints against the Ollama stub')
+    parser.add_argument('--workloads', default=','.join(WORKLOADS), help=f"Comma-separated subset of {', '.join(WORKLOADS)}")
+    parser.add_argument('--concurrency', default='1,4,16', help='Comma-separated client concurrency levels')
+    parser.add_argument('--requests', type=int, default=32, help='Requests per concurrency level')
+    parser.add_argument('--batch', type=int, default=16, help='Chunks per /api/embeddings/generate request')
+    parser.add_argument('--chunk-size', type=int, default=500)
+    parser.add_argument('--client-timeout', type=float, default=300.0)
+    parser.add_argument('--stubs', default='1', help='Comma-separated numbers of stub servers to balance over (e.g. 1,2,4)')
+    parser.add_argument('--stub-url', help='Use running stubs (comma-separated URLs) instead of starting them (their settings are left as they are)')
+    parser.add_argument('--app-url', help='Use a running app instead of starting one (must already point at the stubs)')
+    parser.add_argument('--output', help='Write results to this JSON file')
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+    
+    workloads = [w.strip() for w in args.workloads.split(',') if w.strip()]
+    unknown = set(workloads) - set(WORKLOADS)
+    if unknown:
+        parser.error(f"Unknown workloads: {', '.join(sorted(unknown))}")
+    levels = [int(c) for c in args.concurrency.split(',') if c.strip()]
+    stub_levels = [int(n) for n in args.stubs.split(',') if n.strip()]
+    if any(n < 1 for n in stub_levels):
+        parser.error('--stubs must be >= 1')
+    try:
+        settings = validate_settings(settings_from_args(args))
+    except ValueError as e:
+        parser.error(str(e))
+    
+    if args.stub_url:
+        stub_urls = [url.strip().rstrip('/') for url in args.stub_url.split(',') if url.strip()]
+        stub_levels = [len(stub_urls)]
+    else:
+        stub_urls = [f'http://127.0.0.1:{start_stub(**settings).server_port}' for _ in range(max(stub_levels))]
+    if args.app_url and len(stub_levels) > 1:
+        parser.error('--stubs with several levels needs the in-process app (no --app-url)')
+    app_url = args.app_url or start_app(stub_urls[:stub_levels[0]])
+    stub_settings = requests.get(f'{stub_urls[0]}/stub/config', timeout=10).json()
+    print(f"stubs {', '.join(stub_urls)} {json.dumps(stub_settings)}")
+    print(f"app   {app_url}")
+    
+    filenames = [doc['filename'] for doc in requests.get(f'{app_url}/api/documents', timeout=30).json().get('documents', [])]
+    if not filenames:
+        sys.exit('No documents found in the data directory')
+    chunks = corpus_chunks(app_url, filenames, args.chunk_size)
+    
+    rows = []
+    for n_stubs in stub_levels:
+        if not args.app_url:
+            # The in-process app reads OLLAMA_BASE_URL per call
+            os.environ['OLLAMA_BASE_URL'] = ','.join(stub_urls[:n_stubs])
+        for workload in workloads:
+            for concurrency in levels:
+                payloads = make_requests(workload, args.requests, chunks, filenames, args)
+                row = run_level(workload, concurrency, payloads, app_url, stub_urls[:n_stubs], args)
+                rows.append(row)
+                print(f"  {workload:<11} stubs={n_stubs:<3} c={concurrency:<4} {row['requests_per_second']:>8} req/s "
+                      f"{row['items_per_second']:>9} items/s  p95 {row['p95_ms']:>9} ms  failed {row['failed']}")
+                if 'queries' in row:
+                    print(f"  {'':<11} {'':<9} {'':<6} {row['queries']['count']:>5} queries  p50 {row['queries']['p50_ms']} ms  "
+                          f"p99 {row['queries']['p99_ms']} ms  max {row['queries']['max_ms']} ms  failed {row['queries']['failed']}")
+    
+    header = (f"{'workload':<12}{'stubs':>6}{'conc':>5}{'req/s':>9}{'items/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+              f"{'failed':>8}{'ollama calls':>14}{'peak in-flight':>16}")
+    print()
+    print(header)
+    print('-' * len(header))
+    for row in rows:
+        print(f"{row['workload']:<12}{row['stubs']:>6}{row['concurrency']:>5}{row['requests_per_second']:>9}{row['items_per_second']:>10}"
+              f"{row['p50_ms']:>10}{row['p95_ms']:>10}{row['p99_ms']:>10}{row['failed']:>8}"
+              f"{row['stub']['calls']:>14}{row['stub']['peak_in_flight']:>16}")
+    
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'config': vars(args), 'stub_settings': stub_settings, 'results': rows}, f, indent=2)
+        print(f"\nWrote {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,400 @@
+"""
+Ollama stub server - local stand-in for Ollama with latency and failure injection
+
+Implements the endpoints the app (and Ollama clients in general) call:
+- POST /api/embeddings  {"model", "prompt"} -> {"embedding": [...]}
+- POST /api/embed       {"model", "input": str | [str]} -> {"embeddings": [[...]]}
+- POST /api/generate    {"model", "prompt", "stream"} -> response (NDJSON when streaming)
+- GET  /api/tags, GET /
+
+Embeddings are deterministic hashing n-gram vectors (HashingEmbedder), so
+semantic chunking and retrieval behave like with a real model. Every request
+goes through the same simulation:
+- admission: at most max_queue requests waiting, otherwise 503 (like OLLAMA_MAX_QUEUE)
+- concurrency: at most max_concurrency requests served at once (like OLLAMA_NUM_PARALLEL)
+- latency: sampled from a distribution, plus per_item latency per embedded input
+- failures: error_rate of requests answer 500, hang_rate of requests stall for
+  hang_seconds (to trigger client timeouts)
+
+Settings can be changed while running: GET/POST /stub/config, GET /stub/stats,
+POST /stub/reset.
+
+Latency specs: "fixed:0.05", "uniform:0.02,0.1", "normal:0.05,0.01",
+"lognormal:0.05,0.5" (median, sigma), "exponential:0.05" (mean), all in seconds.
+
+Usage (from the repository root):
+    python tools/ollama_stub.py --port 11435 --latency lognormal:0.04,0.5 --max-concurrency 4 --error-rate 0.01
+    OLLAMA_BASE_URL=http://localhost:11435 python app.py
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from services.hashing_embedder import HashingEmbedder
+
+logger = logging.getLogger('ollama_stub')
+
+LATENCY_KINDS = ('fixed', 'uniform', 'normal', 'lognormal', 'exponential')
+
+DEFAULT_SETTINGS = {
+    'latency': 'fixed:0.02',
+    'per_item_latency': 'fixed:0',
+    'generate_latency': 'fixed:0.2',
+    'max_concurrency': 4,
+    'max_queue': 512,
+    'error_rate': 0.0,
+    'hang_rate': 0.0,
+    'hang_seconds': 120.0,
+    'dim': 768,
+    'seed': 0
+}
+
+
+def sample_latency(spec: str, rng: random.Random) -> float:
+    """Draw one latency (seconds) from a "kind:param[,param]" spec"""
+    kind, _, params = spec.partition(':')
+    values = [float(v) for v in params.split(',') if v.strip()] if params else [0.0]
+    if kind == 'fixed':
+        value = values[0]
+    elif kind == 'uniform':
+        value = rng.uniform(values[0], values[1])
+    elif kind == 'normal':
+        value = rng.gauss(values[0], values[1])
+    elif kind == 'lognormal':
+        value = values[0] * rng.lognormvariate(0.0, values[1])
+    elif kind == 'exponential':
+        value = rng.expovariate(1.0 / values[0]) if values[0] > 0 else 0.0
+    else:
+        raise ValueError(f"Unknown latency distribution: {kind} (expected one of {', '.join(LATENCY_KINDS)})")
+    return max(value, 0.0)
+
+
+def validate_settings(settings: Dict[str, Any]) -> Dict[str, Any]:
+    """Coerce and check settings (raises ValueError on bad values)"""
+    unknown = set(settings) - set(DEFAULT_SETTINGS)
+    if unknown:
+        raise ValueError(f"Unknown settings: {', '.join(sorted(unknown))}")
+    checked = {}
+    for key, value in settings.items():
+        checked[key] = type(DEFAULT_SETTINGS[key])(value)
+    for key in ('latency', 'per_item_latency', 'generate_latency'):
+        if key in checked:
+            sample_latency(checked[key], random.Random(0))
+    for key in ('error_rate', 'hang_rate'):
+        if key in checked and not 0.0 <= checked[key] <= 1.0:
+            raise ValueError(f"{key} must be between 0 and 1")
+    for key in ('max_concurrency', 'dim'):
+        if key in checked and checked[key] < 1:
+            raise ValueError(f"{key} must be >= 1")
+    return checked
+
+
+class OllamaStub:
+    """Simulation state shared by all request handler threads"""
+    
+    def __init__(self, **settings):
+        self.settings = dict(DEFAULT_SETTINGS)
+        self.settings.update(validate_settings(settings))
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.settings['max_concurrency'])
+        self._embedder = None
+        self._rng = random.Random(self.settings['seed'])
+        self.reset_stats()
+    
+    def configure(self, **settings) -> Dict[str, Any]:
+        """Update settings; a new max_concurrency applies to requests admitted afterwards"""
+        checked = validate_settings(settings)
+        with self._lock:
+            self.settings.update(checked)
+            if 'max_concurrency' in checked:
+                self._slots = threading.BoundedSemaphore(self.settings['max_concurrency'])
+            if 'dim' in checked:
+                self._embedder = None
+            if 'seed' in checked:
+                self._rng = random.Random(self.settings['seed'])
+            return dict(self.settings)
+    
+    def reset_stats(self):
+        with self._lock:
+            self._stats = {
+                'requests': {},
+                'status': {},
+                'inputs_embedded': 0,
+                'injected_errors': 0,
+                'injected_hangs': 0,
+                'rejected_busy': 0,
+                'in_flight': 0,
+                'peak_in_flight': 0,
+                'waiting': 0,
+                'peak_waiting': 0
+            }
+            self._queue_waits = []
+            self._service_times = []
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = json.loads(json.dumps(self._stats))
+            queue_waits = np.asarray(self._queue_waits) * 1000
+            service_times = np.asarray(self._service_times) * 1000
+        for name, values in (('queue_wait_ms', queue_waits), ('service_ms', service_times)):
+            stats[name] = {
+                'p50': round(float(np.percentile(values, 50)), 3),
+                'p95': round(float(np.percentile(values, 95)), 3),
+                'max': round(float(values.max()), 3)
+            } if len(values) else None
+        return stats
+    
+    @property
+    def embedder(self) -> HashingEmbedder:
+        if self._embedder is None:
+            self._embedder = HashingEmbedder(dim=self.settings['dim'], seed=self.settings['seed'])
+        return self._embedder
+    
+    def _count(self, key: str, value: Any, amount: int = 1):
+        bucket = self._stats[key]
+        bucket[value] = bucket.get(value, 0) + amount
+    
+    def handle(self, endpoint: str, n_inputs: int, work):
+        """
+        Run one request through admission, concurrency limit, latency and failure injection
+        
+        Args:
+            endpoint: Endpoint name (for stats)
+            n_inputs: Number of inputs (scales per_item_latency)
+            work: Callable producing the response payload
+        
+        Returns:
+            Tuple of (HTTP status, payload dict)
+        """
+        with self._lock:
+            self._count('requests', endpoint)
+            settings = dict(self.settings)
+            slots = self._slots
+            if self._stats['waiting'] >= settings['max_queue']:
+                self._stats['rejected_busy'] += 1
+                self._count('status', '503')
+                return 503, {'error': 'server busy, please try again.  maximum pending requests exceeded'}
+            self._stats['waiting'] += 1
+            self._stats['peak_waiting'] = max(self._stats['peak_waiting'], self._stats['waiting'])
+            # Draw everything random up front, under the lock, so runs are reproducible per seed
+            base = settings['generate_latency'] if endpoint == 'generate' else settings['latency']
+            latency = sample_latency(base, self._rng)
+            latency += sum(sample_latency(settings['per_item_latency'], self._rng) for _ in range(n_inputs))
+            fail = self._rng.random() < settings['error_rate']
+            hang = self._rng.random() < settings['hang_rate']
+        
+        queued_at = time.perf_counter()
+        slots.acquire()
+        started = time.perf_counter()
+        with self._lock:
+            self._stats['waiting'] -= 1
+            self._stats['in_flight'] += 1
+            self._stats['peak_in_flight'] = max(self._stats['peak_in_flight'], self._stats['in_flight'])
+            self._queue_waits.append(started - queued_at)
+        
+        try:
+            time.sleep(latency)
+            if hang:
+                with self._lock:
+                    self._stats['injected_hangs'] += 1
+                time.sleep(settings['hang_seconds'])
+            if fail:
+                with self._lock:
+                    self._stats['injected_errors'] += 1
+                status, payload = 500, {'error': 'stub: injected failure'}
+            else:
+                status, payload = 200, work()
+                with self._lock:
+                    self._stats['inputs_embedded'] += n_inputs if endpoint != 'generate' else 0
+        except Exception as e:
+            status, payload = 500, {'error': str(e)}
+        finally:
+            slots.release()
+            with self._lock:
+                self._stats['in_flight'] -= 1
+                self._service_times.append(time.perf_counter() - started)
+        
+        with self._lock:
+            self._count('status', str(status))
+        return status, payload
+    
+    def embed(self, texts) -> list:
+        return self.embedder.embed(list(texts)).tolist()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """HTTP front end; the OllamaStub instance is attached to the server"""
+    
+    protocol_version = 'HTTP/1.1'
+    
+    @property
+    def stub(self) -> OllamaStub:
+        return self.server.stub
+    
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+    
+    def _read_json(self) -> Optional[Dict[str, Any]]:
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            return json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            return None
+    
+    def _send_json(self, status: int, payload: Dict[str, Any]):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def _send_ndjson(self, lines):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for line in lines:
+            data = (json.dumps(line) + '\n').encode('utf-8')
+            self.wfile.write(f'{len(data):x}\r\n'.encode('ascii') + data + b'\r\n')
+        self.wfile.write(b'0\r\n\r\n')
+    
+    def do_GET(self):
+        if self.path == '/':
+            body = b'Ollama is running'
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif self.path == '/api/tags':
+            self._send_json(200, {'models': [{'name': 'nomic-embed-text:latest'}, {'name': 'llama3.2:3b'}]})
+        elif self.path == '/stub/config':
+            self._send_json(200, self.stub.settings)
+        elif self.path == '/stub/stats':
+            self._send_json(200, self.stub.stats())
+        else:
+            self._send_json(404, {'error': 'not found'})
+    
+    def do_POST(self):
+        data = self._read_json()
+        if data is None:
+            self._send_json(400, {'error': 'invalid JSON'})
+            return
+        
+        if self.path == '/stub/config':
+            try:
+                self._send_json(200, self.stub.configure(**data))
+            except (TypeError, ValueError) as e:
+                self._send_json(400, {'error': str(e)})
+            return
+        if self.path == '/stub/reset':
+            self.stub.reset_stats()
+            self._send_json(200, {'success': True})
+            return
+        
+        model = data.get('model', '')
+        if self.path == '/api/embeddings':
+            prompt = data.get('prompt', '')
+            status, payload = self.stub.handle(
+                'embeddings', 1, lambda: {'embedding': self.stub.embed([prompt])[0]}
+            )
+        elif self.path == '/api/embed':
+            inputs = data.get('input', [])
+            inputs = [inputs] if isinstance(inputs, str) else list(inputs)
+            status, payload = self.stub.handle(
+                'embed', len(inputs), lambda: {'model': model, 'embeddings': self.stub.embed(inputs)}
+            )
+        elif self.path == '/api/generate':
+            self._generate(model, data)
+            return
+        else:
+            status, payload = 404, {'error': 'not found'}
+        self._send_json(status, payload)
+    
+    def _generate(self, model: str, data: Dict[str, Any]):
+        prompt = data.get('prompt', '')
+        words = f"Stub answer for: {' '.join(prompt.split()[:24])}".split()
+        
+        def work():
+            return {'model': model, 'response': ' '.join(words), 'done': True, 'eval_count': len(words)}
+        
+        started = time.perf_counter()
+        status, payload = self.stub.handle('generate', 0, work)
+        if status != 200 or data.get('stream') is False:
+            self._send_json(status, payload)
+            return
+        
+        # Ollama streams by default: one object per token, then a final done object
+        total_ns = int((time.perf_counter() - started) * 1e9)
+        lines = [{'model': model, 'response': word + ' ', 'done': False} for word in words]
+        lines.append({'model': model, 'response': '', 'done': True, 'eval_count': len(words), 'total_duration': total_ns})
+        self._send_ndjson(lines)
+
+
+def add_stub_arguments(parser: argparse.ArgumentParser):
+    """Simulation flags shared with the load-test driver"""
+    parser.add_argument('--latency', default=DEFAULT_SETTINGS['latency'], help='Per-request latency spec for embedding endpoints')
+    parser.add_argument('--per-item-latency', default=DEFAULT_SETTINGS['per_item_latency'], help='Extra latency per embedded input')
+    parser.add_argument('--generate-latency', default=DEFAULT_SETTINGS['generate_latency'], help='Latency spec for /api/generate')
+    parser.add_argument('--max-concurrency', type=int, default=DEFAULT_SETTINGS['max_concurrency'])
+    parser.add_argument('--max-queue', type=int, default=DEFAULT_SETTINGS['max_queue'])
+    parser.add_argument('--error-rate', type=float, default=DEFAULT_SETTINGS['error_rate'])
+    parser.add_argument('--hang-rate', type=float, default=DEFAULT_SETTINGS['hang_rate'])
+    parser.add_argument('--hang-seconds', type=float, default=DEFAULT_SETTINGS['hang_seconds'])
+    parser.add_argument('--dim', type=int, default=DEFAULT_SETTINGS['dim'])
+    parser.add_argument('--seed', type=int, default=DEFAULT_SETTINGS['seed'])
+
+
+def settings_from_args(args) -> Dict[str, Any]:
+    return {key: getattr(args, key) for key in DEFAULT_SETTINGS}
+
+
+def start_stub(host: str = '127.0.0.1', port: int = 0, **settings) -> ThreadingHTTPServer:
+    """Start the stub in a background thread; the bound port is server.server_port"""
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.daemon_threads = True
+    server.stub = OllamaStub(**settings)
+    threading.Thread(target=server.serve_forever, name='ollama-stub', daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Ollama stub server with latency and failure injection')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=11435)
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    try:
+        settings = validate_settings(settings_from_args(args))
+    except ValueError as e:
+        parser.error(str(e))
+    
+    server = ThreadingHTTPServer((args.host, args.port), StubHandler)
+    server.daemon_threads = True
+    server.stub = OllamaStub(**settings)
+    logger.info(f"Ollama stub listening on http://{args.host}:{server.server_port} with {settings}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        logger.info(f"Final stats: {json.dumps(server.stub.stats())}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+Sharded search scaling - measure exact search throughput vs number of worker processes
+
+Generates a seeded synthetic embedding matrix (or opens a vector store), then
+compares single-process exact search with ShardedSearcher at several worker
+counts on the same machine. Sharded results are checked against the
+single-process results.
+
+Usage (from the repository root):
+    python tools/sharded_search_scaling.py --n-vectors 500000 --dim 384 --workers 1,2,4,8
+    python tools/sharded_search_scaling.py --vector-store my_store --workers 2,4
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from services.embedding_set import EmbeddingSet
+from services.sharded_search import ShardedSearcher
+from services.vector_store import VectorStore
+
+
+def percentile_ms(latencies, q):
+    return round(float(np.percentile(latencies, q)) * 1000, 3)
+
+
+def measure(search, queries, top_k):
+    """Per-query latencies (seconds) and the results of each query"""
+    latencies = []
+    results = []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(search(query, top_k))
+        latencies.append(time.perf_counter() - start)
+    return latencies, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure sharded exact search scaling on one machine')
+    parser.add_argument('--n-vectors', type=int, default=200000)
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--dtype', default='float32', choices=EmbeddingSet.SUPPORTED_DTYPES)
+    parser.add_argument('--vector-store', help='Search a persistent vector store instead of synthetic data')
+    parser.add_argument('--queries', type=int, default=50)
+    parser.add_argument('--batch', type=int, default=32, help='Queries per batched round trip')
+    parser.add_argument('--top-k', type=int, default=10)
+    parser.add_argument('--workers', default='1,2,4', help='Comma-separated worker counts')
+    parser.add_argument('--start-method', default='spawn')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', help='Write results to this JSON file')
+    args = parser.parse_args()
+    
+    rng = np.random.default_rng(args.seed)
+    if args.vector_store:
+        embedding_set = VectorStore.open(args.vector_store).embedding_set()
+    else:
+        X = rng.standard_normal((args.n_vectors, args.dim), dtype=np.float32)
+        embedding_set = EmbeddingSet(X, dtype=args.dtype)
+        del X
+    queries = rng.standard_normal((args.queries, embedding_set.dim), dtype=np.float32)
+    
+    print(f"{len(embedding_set)} vectors x {embedding_set.dim} dims ({embedding_set.dtype}), "
+          f"{args.queries} queries, top_k={args.top_k}, {os.cpu_count()} CPUs")
+    
+    latencies, expected = measure(embedding_set.search, queries, args.top_k)
+    rows = [{
+        'mode': 'single-process',
+        'workers': 1,
+        'p50_ms': percentile_ms(latencies, 50),
+        'p95_ms': percentile_ms(latencies, 95),
+        'qps': round(len(queries) / sum(latencies), 1),
+        'batch_qps': None,
+        'matches_exact': True
+    }]
+    
+    for n_workers in [int(w) for w in args.workers.split(',') if w.strip()]:
+        with ShardedSearcher(embedding_set, n_shards=n_workers, start_method=args.start_method) as searcher:
+            searcher.search(queries[0], args.top_k)  # workers attach their shards
+            
+            latencies, results = measure(searcher.search, queries, args.top_k)
+            
+            start = time.perf_counter()
+            for i in range(0, len(queries), args.batch):
+                searcher.search_batch(queries[i:i + args.batch], args.top_k)
+            batch_seconds = time.perf_counter() - start
+            
+            matches = all(
+                [idx for idx, _ in got] == [idx for idx, _ in want]
+                for got, want in zip(results, expected)
+            )
+            rows.append({
+                'mode': f'sharded ({searcher.sharing})',
+                'workers': n_workers,
+                'p50_ms': percentile_ms(latencies, 50),
+                'p95_ms': percentile_ms(latencies, 95),
+                'qps': round(len(queries) / sum(latencies), 1),
+                'batch_qps': round(len(queries) / batch_seconds, 1),
+                'matches_exact': matches
+            })
+    
+    header = f"{'mode':<28}{'workers':>8}{'p50 ms':>10}{'p95 ms':>10}{'QPS':>10}{'batch QPS':>11}{'exact':>7}"
+    print(header)
+    print('-' * len(header))
+    for row in rows:
+        batch_qps = row['batch_qps'] if row['batch_qps'] is not None else '-'
+        print(f"{row['mode']:<28}{row['workers']:>8}{row['p50_ms']:>10}{row['p95_ms']:>10}"
+              f"{row['qps']:>10}{batch_qps:>11}{str(row['matches_exact']):>7}")
+    
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'config': vars(args), 'results': rows}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()